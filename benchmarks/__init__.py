@@ -0,0 +1,11 @@
+"""
+Performance benchmarks of conflagrate: the overhead of the engine per node
+and per branch, dependency resolution, graph loading, and serving.
+
+Run from the root of the repository:
+
+    python -m benchmarks [-k PATTERN] [-o results.json] [--compare old.json]
+
+Results are written as JSON, with the seconds per operation of every
+benchmark, so the results of two commits can be compared.
+"""
@@ -0,0 +1,74 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from . import dependencies, engine, loading, serve  # noqa: F401
+from .harness import (compare, format_duration, get_benchmarks, get_metadata,
+                      run_benchmark)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Run the benchmarks of conflagrate.')
+    parser.add_argument('-k', dest='patterns', action='append',
+                        metavar='PATTERN',
+                        help='only run the benchmarks of which the name '
+                             'contains the pattern (may be repeated)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of timed calls of each benchmark '
+                             '(default: %(default)s)')
+    parser.add_argument('-o', '--output', metavar='RESULTS',
+                        help='path of the JSON file to write the results to')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results to compare the results with; exits '
+                             'with status 1 if a benchmark regressed')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown of the least time beyond which '
+                             'a benchmark regressed (default: %(default)s)')
+    parser.add_argument('--list', action='store_true',
+                        help='list the benchmarks without running them')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arguments = create_parser().parse_args(argv)
+    benchmarks = get_benchmarks(arguments.patterns)
+    if arguments.list:
+        for bench in benchmarks:
+            print(bench.name)
+        return 0
+    if arguments.repeat < 1:
+        print('error: repeat must be at least 1', file=sys.stderr)
+        return 1
+
+    results = {'metadata': get_metadata(), 'results': {}}
+    for bench in benchmarks:
+        result = results['results'][bench.name] = run_benchmark(
+            bench, arguments.repeat)
+        print(f'{bench.name:<40} {format_duration(result["median"]):>10} '
+              f'per {bench.unit} (± {format_duration(result["stdev"])})')
+
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = json.load(f)
+        comparisons = compare(baseline, results, arguments.threshold)
+        print()
+        for comparison in comparisons:
+            flag = '  REGRESSED' if comparison['regressed'] else ''
+            print(f'{comparison["name"]:<40} '
+                  f'{format_duration(comparison["baseline"]):>10} -> '
+                  f'{format_duration(comparison["new"]):>10} '
+                  f'({comparison["ratio"]:.2f}x){flag}')
+        if any(comparison['regressed'] for comparison in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
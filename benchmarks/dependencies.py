@@ -0,0 +1,78 @@
+"""
+Resolution of dependencies: building them in a new dependency cache (cold),
+getting them from a cache holding them (warm), and providing them to nodes.
+"""
+from conflagrate import CacheSupport, dependency, nodetype
+from conflagrate.dependencies import DependencyCache
+from conflagrate.engine import run_graph
+
+from .engine import chain
+from .harness import benchmark
+
+
+@dependency
+async def bench_config() -> dict:
+    return {'url': 'http://localhost'}
+
+
+@dependency
+async def bench_session(bench_config) -> dict:
+    return {'config': bench_config}
+
+
+@dependency
+async def bench_client(bench_config, bench_session) -> dict:
+    return {'config': bench_config, 'session': bench_session}
+
+
+@dependency(CacheSupport.NEVER_CACHE)
+async def bench_request(bench_client) -> dict:
+    return {'client': bench_client}
+
+
+@nodetype('bench.dependencies.client')
+async def use_client(*, bench_client) -> None:
+    return None
+
+
+RESOLUTIONS = 1000
+
+
+@benchmark('dependencies.cold', RESOLUTIONS, 'resolution')
+async def cold():
+    # Three dependencies are built for every resolution.
+    for _ in range(RESOLUTIONS):
+        cache = DependencyCache()
+        await cache.call_dependencies(['bench_client'])
+        await cache.close()
+
+
+_warm_cache = DependencyCache()
+
+
+@benchmark('dependencies.warm', RESOLUTIONS, 'resolution')
+async def warm():
+    for _ in range(RESOLUTIONS):
+        await _warm_cache.call_dependencies(['bench_client'])
+
+
+_uncached_cache = DependencyCache()
+
+
+@benchmark('dependencies.never_cache', RESOLUTIONS, 'resolution')
+async def never_cache():
+    # Built anew every time, on top of a warm cache.
+    for _ in range(RESOLUTIONS):
+        lease = []
+        await _uncached_cache.call_dependencies(['bench_request'], lease)
+        _uncached_cache.release(lease)
+
+
+_chain = chain('bench.dependencies.client', 100)
+
+
+@benchmark('dependencies.node', 1000, 'node')
+async def node():
+    # Nodes provided a warm dependency.
+    for _ in range(10):
+        await run_graph(_chain, 'node0')
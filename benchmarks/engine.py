@@ -0,0 +1,103 @@
+"""
+Overhead of the engine: executing nodes of each kind, long chains of nodes,
+wide fan-outs of parallel branches, and loops through a matcher node.  The
+node types do nothing, so only the engine is measured.
+"""
+from typing import Dict, Tuple
+
+from conflagrate import BlockingBehavior, BranchingStrategy, nodetype
+from conflagrate.engine import run_graph
+from conflagrate.graph import Graph, MatcherNode, Node
+from conflagrate.registration import get_nodetypes
+
+from .harness import benchmark, register
+
+
+@nodetype('bench.engine.non_blocking',
+          blocking_behavior=BlockingBehavior.NON_BLOCKING)
+def non_blocking() -> None:
+    return None
+
+
+@nodetype('bench.engine.blocking')
+def blocking() -> None:
+    return None
+
+
+@nodetype('bench.engine.coroutine')
+async def coroutine() -> None:
+    return None
+
+
+@nodetype('bench.engine.count', BranchingStrategy.matcher,
+          BlockingBehavior.NON_BLOCKING)
+def count(remaining: int) -> Tuple[bool, int]:
+    return remaining > 1, remaining - 1
+
+
+def create_node(name: str, typename: str) -> Node:
+    nodetype = get_nodetypes()[typename]
+    if nodetype.branching_strategy is BranchingStrategy.matcher:
+        return MatcherNode(name, typename, nodetype, {})
+    return Node(name, typename, nodetype)
+
+
+def chain(typename: str, length: int) -> Graph:
+    """A graph of nodes each followed by the next, starting at node0."""
+    nodes: Dict[str, Node] = {f'node{i}': create_node(f'node{i}', typename)
+                              for i in range(length)}
+    names = list(nodes)
+    for name, next_name in zip(names, names[1:]):
+        nodes[name].edges = [nodes[next_name]]
+    return Graph(nodes)
+
+
+def fan_out(width: int) -> Graph:
+    """A start node followed by width parallel nodes."""
+    nodes = {'start': create_node('start', 'bench.engine.non_blocking')}
+    for i in range(width):
+        nodes[f'leaf{i}'] = create_node(f'leaf{i}', 'bench.engine.non_blocking')
+    nodes['start'].edges = [nodes[f'leaf{i}'] for i in range(width)]
+    return Graph(nodes)
+
+
+def register_runs(name: str, graph: Graph, start: str, runs: int,
+                  operations: int, unit: str) -> None:
+    async def run_graphs():
+        for _ in range(runs):
+            await run_graph(graph, start)
+    register(name, run_graphs, runs * operations, unit)
+
+
+# Overhead of a node of each kind, in a chain so every node but the first is
+# executed as the continuation of its branch.
+NODE_CHAIN_LENGTH = 100
+for _kind in ('non_blocking', 'blocking', 'coroutine'):
+    register_runs(f'engine.node.{_kind}',
+                  chain(f'bench.engine.{_kind}', NODE_CHAIN_LENGTH), 'node0',
+                  10, NODE_CHAIN_LENGTH, 'node')
+
+# Overhead of starting and finishing a run of a single node.
+register_runs('engine.run', chain('bench.engine.non_blocking', 1), 'node0',
+              1000, 1, 'run')
+
+# Chains of increasing lengths, about 10000 nodes per call.
+for _length in (10, 100, 1000):
+    register_runs(f'engine.chain.{_length}',
+                  chain('bench.engine.non_blocking', _length), 'node0',
+                  10000 // _length, _length, 'node')
+
+# Fan-outs of increasing widths, per branch.
+for _width in (10, 100, 1000):
+    register_runs(f'engine.fan_out.{_width}', fan_out(_width), 'start',
+                  max(1, 1000 // _width), _width, 'branch')
+
+# A matcher node looping back to itself.
+LOOP_ITERATIONS = 10000
+_loop = chain('bench.engine.count', 1)
+_loop.nodes['node0'].edges = {True: _loop.nodes['node0']}
+
+
+@benchmark('engine.matcher_loop', LOOP_ITERATIONS, 'iteration')
+async def matcher_loop():
+    await run_graph(_loop, 'node0', start_node_args=(LOOP_ITERATIONS,))
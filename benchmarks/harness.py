@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import inspect
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import conflagrate
+
+# Version of the format of the results, incremented on incompatible changes.
+RESULTS_FORMAT_VERSION = 1
+
+
+@dataclass
+class Benchmark:
+    """
+    A benchmark: a function, or coroutine function, performing a number of
+    operations every time it is called, such as running a graph with a
+    number of nodes.  Anything to set up beforehand is done outside of it.
+    """
+    name: str
+    function: Callable
+    operations: int
+    unit: str
+
+
+_benchmarks: Dict[str, Benchmark] = {}
+
+
+def register(name: str, function: Callable, operations: int = 1,
+             unit: str = 'operation') -> None:
+    if name in _benchmarks:
+        raise ValueError(f'benchmark already registered named "{name}"')
+    _benchmarks[name] = Benchmark(name, function, operations, unit)
+
+
+def benchmark(name: str, operations: int = 1,
+              unit: str = 'operation') -> Callable:
+    """
+    Register the decorated function as a benchmark (see Benchmark).
+
+    :param name: name of the benchmark, namespaced with dots
+    :param operations: number of operations performed per call
+    :param unit: what an operation is, such as "node" or "run"
+    """
+    def decorator(function):
+        register(name, function, operations, unit)
+        return function
+    return decorator
+
+
+def get_benchmarks(patterns: Optional[List[str]] = None) -> List[Benchmark]:
+    """
+    Get the registered benchmarks, in order of name, optionally only those of
+    which the name contains one of the patterns.
+    """
+    return [bench for name, bench in sorted(_benchmarks.items())
+            if not patterns or any(pattern in name for pattern in patterns)]
+
+
+def run_benchmark(bench: Benchmark, repeat: int) -> dict:
+    """
+    Time the calls of a benchmark, after a call to warm up.  A coroutine
+    function is run on an event loop of its own, shared by every call.
+
+    :return: seconds per operation over the calls, and what was measured
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        if inspect.iscoroutinefunction(bench.function):
+            def call():
+                loop.run_until_complete(bench.function())
+        else:
+            call = bench.function
+
+        call()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            times.append((time.perf_counter() - start) / bench.operations)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+    return {
+        'unit': bench.unit,
+        'operations': bench.operations,
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if repeat > 1 else 0.,
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_metadata() -> dict:
+    return {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'conflagrate_version': conflagrate.__version__,
+        'commit': get_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> List[dict]:
+    """
+    Compare the least seconds per operation of the benchmarks in both
+    results, the least affected by noise from the rest of the machine.
+
+    :param baseline: results to compare against
+    :param results: new results
+    :param threshold: relative slowdown beyond which a benchmark regressed,
+        such as 0.1 for 10%
+    :return: comparison of every benchmark in both, as its name, the baseline
+        and new times, their ratio, and whether it regressed
+    """
+    comparisons = []
+    for name, result in results['results'].items():
+        try:
+            old = baseline['results'][name]['min']
+        except KeyError:
+            continue
+        ratio = result['min'] / old
+        comparisons.append({'name': name, 'baseline': old, 'new': result['min'],
+                            'ratio': ratio, 'regressed': ratio > 1 + threshold})
+    return comparisons
+
+
+def format_duration(seconds: float) -> str:
+    for unit, scale in (('s', 1.), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
@@ -0,0 +1,94 @@
+"""
+Loading graphs: parsing graph files in the DOT language with each parser,
+loading compiled graphs, building and instantiating native graph classes,
+and compiling graphs into execution plans.
+"""
+from conflagrate.graph import Graph
+from conflagrate.parse import native
+from conflagrate.parse.compiled import dumps, loads
+from conflagrate.parse.dot import parse_dot
+from conflagrate.plan import compile_graph
+
+from . import engine  # noqa: F401  (registers the node types)
+from .harness import benchmark, register
+
+GRAPH_SIZE = 100
+LOADS = 10
+
+
+def dot_chain(length: int) -> str:
+    lines = ['digraph chain {']
+    lines += [f'    node{i} [type="bench.engine.non_blocking"];'
+              for i in range(length)]
+    lines += [f'    node{i} -> node{i + 1};' for i in range(length - 1)]
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def native_chain(length: int) -> type:
+    """Define a new native graph class of a chain of nodes."""
+    nodes = [native.Node(type='bench.engine.non_blocking')
+             for _ in range(length)]
+    for node, next_node in zip(nodes, nodes[1:]):
+        node > next_node
+    return type('Chain', (native.Graph,),
+                {f'node{i}': node for i, node in enumerate(nodes)})
+
+
+_dot = dot_chain(GRAPH_SIZE)
+
+
+@benchmark(f'loading.dot.{GRAPH_SIZE}', LOADS, 'graph')
+def parse_fast():
+    for _ in range(LOADS):
+        parse_dot(_dot)
+
+
+def parse_pydot():
+    # An order of magnitude slower, so only once per call.
+    graphviz.convert_from_dot_graph(pydot.graph_from_dot_data(_dot)[0])
+
+
+try:
+    import pydot
+except ImportError:
+    pass
+else:
+    from conflagrate.parse import graphviz
+    register(f'loading.pydot.{GRAPH_SIZE}', parse_pydot, 1, 'graph')
+
+
+_compiled = dumps(parse_dot(_dot))
+
+
+@benchmark(f'loading.compiled.{GRAPH_SIZE}', LOADS, 'graph')
+def load_compiled():
+    for _ in range(LOADS):
+        loads(_compiled)
+
+
+@benchmark(f'loading.native.build.{GRAPH_SIZE}', LOADS, 'graph')
+def build_native():
+    # Defining a class and instantiating it the first time builds its nodes
+    # and execution plan.
+    for _ in range(LOADS):
+        native_chain(GRAPH_SIZE)()
+
+
+_native_class = native_chain(GRAPH_SIZE)
+_native_class()
+
+
+@benchmark(f'loading.native.instantiate.{GRAPH_SIZE}', 1000, 'graph')
+def instantiate_native():
+    for _ in range(1000):
+        _native_class()
+
+
+_graph: Graph = parse_dot(_dot)
+
+
+@benchmark(f'loading.plan.{GRAPH_SIZE}', LOADS, 'graph')
+def compile_plan():
+    for _ in range(LOADS):
+        compile_graph(_graph)
@@ -0,0 +1,55 @@
+"""
+Throughput of serving a graph: runs completed per second by serve() for
+several concurrency limits, with a graph of three nodes whose second node
+awaits for a moment, like a node calling a service would.
+"""
+import asyncio
+
+from conflagrate import BlockingBehavior, Graph, Node, nodetype, serve
+
+from .harness import register
+
+LATENCY = 0.001
+
+
+@nodetype('bench.serve.parse', blocking_behavior=BlockingBehavior.NON_BLOCKING)
+def parse(value: int) -> int:
+    return value + 1
+
+
+@nodetype('bench.serve.call')
+async def call(value: int) -> int:
+    await asyncio.sleep(LATENCY)
+    return value
+
+
+@nodetype('bench.serve.format', blocking_behavior=BlockingBehavior.NON_BLOCKING)
+def format_value(value: int) -> str:
+    return str(value)
+
+
+class ServedGraph(Graph):
+    parse = Node(type='bench.serve.parse')
+    call = Node(type='bench.serve.call')
+    format = Node(type='bench.serve.format')
+
+    parse > call
+    call > format
+
+
+async def inputs(runs: int):
+    for value in range(runs):
+        yield value
+
+
+def register_serve(concurrency: int, runs: int) -> None:
+    async def serve_runs():
+        async for result in serve(ServedGraph(), 'parse', inputs(runs),
+                                  concurrency=concurrency):
+            if result.exception is not None:
+                raise result.exception
+    register(f'serve.concurrency.{concurrency}', serve_runs, runs, 'run')
+
+
+for _concurrency in (1, 10, 100, 1000):
+    register_serve(_concurrency, min(2000, 100 * _concurrency))
@@ -3,14 +3,22 @@ from .asyncutils import *
 from .controlflow import *
 from .dependencies import *
 from .engine import *
+from .instrumentation import *
 from .parse import *
+from .plan import *
+from .processes import *
 from .registration import *
+from .tracing import *
 
 __all__ = (
     asyncutils.__all__ +
     controlflow.__all__ +
     dependencies.__all__ +
     engine.__all__ +
+    instrumentation.__all__ +
     parse.__all__ +
-    registration.__all__
+    plan.__all__ +
+    processes.__all__ +
+    registration.__all__ +
+    tracing.__all__
 )
@@ -0,0 +1,68 @@
+"""
+Command line interface of conflagrate.
+
+    conflagrate compile GRAPH -o OUTPUT [-i MODULE ...]
+
+compiles a graph file, or a native graph class given as "module:Class", into a
+compiled graph (see save_compiled_graph()).  The node types of the graph must
+be registered, so the modules defining them are imported first.
+"""
+import argparse
+import importlib
+import os
+import sys
+from typing import List, Optional
+
+from .graph import Graph
+from .parse.compiled import save_compiled_graph
+from .parse.graphviz import parse
+
+
+def load_source_graph(source: str) -> Graph:
+    module_name, separator, class_name = source.partition(':')
+    if not separator:
+        return parse(source)
+    graph_class = getattr(importlib.import_module(module_name), class_name)
+    return graph_class()
+
+
+def compile_command(arguments: argparse.Namespace) -> None:
+    for module_name in arguments.imports:
+        importlib.import_module(module_name)
+    graph = load_source_graph(arguments.graph)
+    save_compiled_graph(graph, arguments.output)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='conflagrate')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser(
+        'compile', help='compile a graph for loading without parsing')
+    compile_parser.add_argument(
+        'graph', help='path of a graph file, or native graph class as '
+                      '"module:Class"')
+    compile_parser.add_argument(
+        '-o', '--output', required=True, help='path of the compiled graph')
+    compile_parser.add_argument(
+        '-i', '--import', dest='imports', action='append', default=[],
+        metavar='MODULE', help='module registering node types of the graph '
+                               '(can be repeated)')
+    compile_parser.set_defaults(run=compile_command)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arguments = create_parser().parse_args(argv)
+    # Like "python -m", make modules in the working directory importable.
+    sys.path.insert(0, os.getcwd())
+    try:
+        arguments.run(arguments)
+    except (ImportError, AttributeError, OSError, ValueError) as e:
+        print(f'conflagrate: error: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,126 @@
 import asyncio
+import builtins
+import contextvars
+import inspect
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
 from enum import Enum, auto
 from functools import partial
-from typing import Callable
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, List,
+                    MutableMapping, Optional, Sequence, Set, Union)
 
-__all__ = ['BlockingBehavior']
+from .controlflow import ErrorPolicy
+from .instrumentation import mark_running, new_id
+
+__all__ = ['BlockingBehavior', 'DeadlineExceeded', 'ExceptionGroup',
+           'register_executor', 'shutdown_executors']
+
+ExecutorSpec = Union[None, str, Executor]
+
+# Default executor for blocking node types without an executor of their own,
+# set by the graph run.  Without one, the event loop's default executor is used.
+executor_ctx_var = contextvars.ContextVar("executor")
+
+
+def create_process_pool() -> Executor:
+    # Process pools pull in multiprocessing, which is slow to import, so it is
+    # only imported when a process pool is first used.
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor()
+
+
+# Executors available by name, or factories creating them on first use.
+_executors: Dict[str, Union[Executor, Callable[[], Executor]]] = {
+    'thread': ThreadPoolExecutor,
+    'process': create_process_pool,
+}
+# Executors created from the registered factories.  Only these are owned, and
+# shut down, by conflagrate; registered executor instances belong to the caller.
+_created_executors: Dict[str, Executor] = {}
+
+
+if hasattr(builtins, 'ExceptionGroup'):
+    ExceptionGroup = builtins.ExceptionGroup
+else:
+    class ExceptionGroup(Exception):
+        """
+        Stand-in for the exception group built into Python 3.11 and later.
+        """
+        def __init__(self, message: str, exceptions: Sequence[Exception]):
+            super().__init__(message, tuple(exceptions))
+            self.message = message
+            self.exceptions = tuple(exceptions)
+
+        def __str__(self):
+            return (f'{self.message} ({len(self.exceptions)} sub-exception'
+                    f'{"s" if len(self.exceptions) > 1 else ""})')
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+    Raised by a graph run still executing when its deadline passed.
+    """
+
+
+class _Join:
+    """
+    Inputs arriving at a join node, in a queue per incoming branch, until one
+    has arrived from every branch.
+    """
+    __slots__ = ('queues', 'waiting')
+
+    def __init__(self, size: int):
+        self.queues: List[deque] = [deque() for _ in range(size)]
+        # Number of incoming branches from which no input is queued.
+        self.waiting = size
+
+    def arrive(self, index: int, item) -> Optional[List]:
+        queue = self.queues[index]
+        if not queue:
+            self.waiting -= 1
+        queue.append(item)
+        if self.waiting:
+            return None
+        items = []
+        for queue in self.queues:
+            items.append(queue.popleft())
+            if not queue:
+                self.waiting += 1
+        return items
 
 
 class BranchTracker:
-    def __init__(self, num_starting_branches=1):
+    def __init__(self, num_starting_branches=1, max_in_flight=None,
+                 instrumentation=None, collect=False,
+                 error_policy=ErrorPolicy.FINISH):
         self.branches = num_starting_branches
         self._future = asyncio.Future()
         self._last_node_return_value = None
+        # Outputs of the nodes ending branches, by node name, if collected.
+        self.outputs: Optional[Dict[str, List]] = {} if collect else None
+        # Exceptions raised by nodes, in order.  Those the run doesn't raise
+        # are passed to the exception handler of the event loop, so they
+        # aren't lost.
+        self.error_policy = error_policy
+        self._exceptions: List[Exception] = []
+        # Whether the run failed fast, in which case its remaining branches
+        # are being cancelled.
+        self.failed = False
+        # Tasks executing branches of the run.
+        self.tasks: Set[asyncio.Task] = set()
+        # Inputs waiting at join nodes, by node.
+        self._joins: Dict[Any, _Join] = {}
+        # Limit on the number of nodes executing at once across all branches.
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError('in-flight limit must be at least 1')
+        self.in_flight_limit = (asyncio.Semaphore(max_in_flight)
+                                if max_in_flight is not None else None)
+        # Instrumentation timing the nodes of the run, and identifier of the
+        # run in its events, None if uninstrumented.
+        self.instrumentation = instrumentation
+        self.run_id = new_id() if instrumentation is not None else None
 
     def _check_done(self):
         if self._future.done():
@@ -21,21 +131,239 @@ class BranchTracker:
         self.branches += 1
 
     def remove_branch(self):
+        if self.failed:
+            return
         self._check_done()
         self.branches -= 1
         if self.branches <= 0:
-            if isinstance(self._last_node_return_value, Exception):
-                self._future.set_exception(self._last_node_return_value)
+            if self._exceptions and (
+                    self.error_policy is ErrorPolicy.COLLECT):
+                self._future.set_exception(ExceptionGroup(
+                    'nodes of the graph run raised exceptions',
+                    self._exceptions))
+                return
+            raised = None
+            if self.outputs is not None:
+                if self._exceptions:
+                    raised = self._exceptions[0]
+                    self._future.set_exception(raised)
+                else:
+                    self._future.set_result(self.outputs)
+            elif isinstance(self._last_node_return_value, Exception):
+                raised = self._last_node_return_value
+                self._future.set_exception(raised)
             else:
                 self._future.set_result(self._last_node_return_value)
+            for exception in self._exceptions:
+                if exception is not raised:
+                    self._report(exception)
+
+    def _report(self, exception: Exception):
+        self._future.get_loop().call_exception_handler({
+            'message': 'exception raised by a node was not raised by the '
+                       'graph run',
+            'exception': exception,
+        })
 
     def set_last_node_return_value(self, value):
         self._last_node_return_value = value
 
+    def add_output(self, node_name: str, value):
+        """
+        Record the output of a node ending a branch.
+        """
+        self._last_node_return_value = value
+        if self.outputs is not None:
+            try:
+                self.outputs[node_name].append(value)
+            except KeyError:
+                self.outputs[node_name] = [value]
+
+    def set_exception(self, exception: Exception):
+        """
+        Record the exception raised by a node, ending its branch.  If the run
+        fails fast, it fails at once with the first exception.  Exceptions
+        the run doesn't raise are reported to the exception handler of the
+        event loop.
+        """
+        if self.failed:
+            self._report(exception)
+            return
+        self._last_node_return_value = exception
+        self._exceptions.append(exception)
+        if self.error_policy is ErrorPolicy.FAIL_FAST:
+            self.failed = True
+            self._future.set_exception(exception)
+
+    def expire(self) -> None:
+        """
+        Fail the run at once with DeadlineExceeded, whatever its error policy,
+        if it is still executing.
+        """
+        if self._future.done():
+            return
+        self.failed = True
+        self._future.set_exception(DeadlineExceeded(
+            'graph run exceeded its deadline'))
+
+    def track(self, task: asyncio.Task) -> None:
+        """
+        Keep track of a task executing a branch of the run, until it is done.
+        """
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def cancel(self) -> None:
+        """
+        Cancel the tasks of the branches still executing, and wait for them to
+        finish, so they release everything they hold.
+        """
+        while True:
+            pending = [task for task in self.tasks if not task.done()]
+            if not pending:
+                return
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+
+    def join(self, node, size: int, index: int, item) -> Optional[List]:
+        """
+        Deliver an input to a join node from one of its incoming branches.
+
+        :param node: the join node
+        :param size: number of incoming branches of the node
+        :param index: index of the branch delivering the input
+        :param item: the input
+        :return: the inputs from every incoming branch, in order, once one has
+            arrived from each, otherwise None
+        """
+        try:
+            join = self._joins[node]
+        except KeyError:
+            join = self._joins[node] = _Join(size)
+        return join.arrive(index, item)
+
     async def wait(self):
         return await self._future
 
 
+class ConcurrencyLimit:
+    """
+    A limit on the number of concurrent executions of something, enforced with
+    a semaphore for each event loop it is used in.
+    """
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError('concurrency limit must be at least 1')
+        self.limit = limit
+        self._semaphores: MutableMapping[asyncio.AbstractEventLoop,
+                                         asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary())
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return self._semaphores[loop]
+        except KeyError:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+            return semaphore
+
+
+class _Batch:
+    __slots__ = ('items', 'futures', 'kwargs', 'timer')
+
+    def __init__(self, kwargs: Dict[str, Any]):
+        self.items = []
+        self.futures: List[asyncio.Future] = []
+        self.kwargs = kwargs
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class Batcher:
+    """
+    Coalesces concurrent calls into a single call of a batch function with the
+    list of their items, then scatters the list of results it returns back to
+    the callers, in order.
+
+    A batch is called as soon as it holds size items, or timeout seconds after
+    its first item arrived.  Without a timeout, a batch holds the items that
+    arrive until the event loop has run every callback ready when its first
+    item arrived.  Batches are collected separately on each event loop.
+    """
+    def __init__(
+            self,
+            call_batch: Callable[..., Awaitable[List]],
+            size: int,
+            timeout: Optional[float] = None
+    ):
+        if size < 1:
+            raise ValueError('batch size must be at least 1')
+        if timeout is not None and timeout <= 0:
+            raise ValueError('batch timeout must be positive')
+        self.call_batch = call_batch
+        self.size = size
+        self.timeout = timeout
+        self._batches: MutableMapping[asyncio.AbstractEventLoop, _Batch] = (
+            weakref.WeakKeyDictionary())
+
+    def __call__(self, *args, **kwargs) -> asyncio.Future:
+        """
+        Add the arguments of a call to the batch being collected, as a single
+        item, or a tuple of them if there are several (see submit()).
+        """
+        return self.submit(args[0] if len(args) == 1 else args, kwargs)
+
+    def submit(self, item, kwargs: Dict[str, Any]) -> asyncio.Future:
+        """
+        Add an item to the batch being collected.  The keyword arguments of the
+        batch function are those submitted with the first item of the batch.
+
+        :param item: item to be added to the list of the batch
+        :param kwargs: keyword arguments for the batch function
+        :return: future of the result for the item
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(loop)
+        if batch is None:
+            batch = self._batches[loop] = _Batch(kwargs)
+            if self.timeout is None:
+                loop.call_soon(self._flush, loop, batch)
+            else:
+                batch.timer = loop.call_later(self.timeout, self._flush, loop,
+                                              batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.size:
+            self._flush(loop, batch)
+        return future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: _Batch):
+        if self._batches.get(loop) is not batch:
+            return
+        del self._batches[loop]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        loop.create_task(self._call(batch))
+
+    async def _call(self, batch: _Batch):
+        try:
+            results = await self.call_batch(batch.items, **batch.kwargs)
+            if len(results) != len(batch.items):
+                raise ValueError(f'batch of {len(batch.items)} items returned '
+                                 f'{len(results)} results')
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
 class BlockingBehavior(Enum):
     """
     Blocking behavior of the decorated node type definition function.
@@ -49,6 +377,216 @@ class BlockingBehavior(Enum):
     NON_BLOCKING = auto()
 
 
+def register_executor(
+        name: str,
+        executor: Union[Executor, Callable[[], Executor]]
+) -> None:
+    """
+    Make an executor available to blocking node types and graph runs by name.
+
+    Two names are available by default: "thread", a thread pool, and
+    "process", a process pool, both created on first use with the default
+    number of workers.  Registering either name replaces it, which is how their
+    sizes are configured.  For example:
+
+        register_executor('process', partial(ProcessPoolExecutor, max_workers=8))
+
+    An executor instance remains owned by the caller, who is responsible for
+    shutting it down.  An executor created from a factory is shut down when it
+    is replaced or by shutdown_executors().
+
+    :param name: name of the executor
+    :param executor: executor, or a callable creating the executor the first
+        time it is used
+    """
+    created = _created_executors.pop(name, None)
+    if created is not None:
+        created.shutdown(wait=False)
+    _executors[name] = executor
+
+
+def get_executor(name: str) -> Executor:
+    try:
+        return _created_executors[name]
+    except KeyError:
+        pass
+    try:
+        executor = _executors[name]
+    except KeyError:
+        raise ValueError(f'no executor registered named "{name}"')
+    if isinstance(executor, Executor):
+        return executor
+    executor = _created_executors[name] = executor()
+    return executor
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """
+    Shut down every executor created from a registered factory.  They are
+    created again if they are used after this.  Registered executor instances
+    are left to the caller to shut down.
+
+    :param wait: whether to wait for pending work to finish
+    """
+    while _created_executors:
+        _, executor = _created_executors.popitem()
+        executor.shutdown(wait=wait)
+
+
+def resolve_executor(executor: ExecutorSpec) -> Optional[Executor]:
+    if executor is None:
+        executor = executor_ctx_var.get(None)
+    if isinstance(executor, str):
+        return get_executor(executor)
+    return executor
+
+
+async def run_blocking(
+        executor: ExecutorSpec,
+        function: Callable,
+        *args,
+        **kwargs
+):
+    """
+    Call a blocking function in an executor and return its return value.
+
+    :param executor: executor, or the name of a registered executor, to call
+        the function in.  If None, the default executor of the graph run is
+        used, or the event loop's default executor if there is none.
+    :param function: Function to be executed.
+    :param args: Positional arguments for the function.
+    :param kwargs: Keyword arguments for the function.
+    :return: The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    executor = resolve_executor(executor)
+    # Positional arguments are passed on by the executor, so the function
+    # only needs binding to keyword arguments.
+    if kwargs:
+        function = partial(function, **kwargs)
+    return await loop.run_in_executor(executor,
+                                      mark_running(executor, function), *args)
+
+
+async def iterate_blocking(
+        executor: ExecutorSpec,
+        function: Callable,
+        *args,
+        **kwargs
+) -> AsyncIterator:
+    """
+    Iterate over a blocking generator function, producing every item of the
+    generator in an executor.  See run_blocking() for the executor used.  The
+    generator is closed when iteration stops, in the executor once it is done
+    producing an item if iteration was cancelled meanwhile.
+
+    Generators can't be sent to other processes, so the executor must not be a
+    process pool.
+
+    :param executor: executor, or the name of a registered executor, to
+        produce the items in
+    :param function: Generator function to be iterated over.
+    :param args: Positional arguments for the function.
+    :param kwargs: Keyword arguments for the function.
+    :return: An asynchronous iterator over the items of the generator.
+    """
+    loop = asyncio.get_running_loop()
+    executor = resolve_executor(executor)
+    iterator = function(*args, **kwargs)
+    exhausted = object()
+    # A generator can't be closed while it's producing an item, which it may
+    # still be doing in the executor once iteration was cancelled.
+    running = threading.Lock()
+
+    def produce():
+        with running:
+            return next(iterator, exhausted)
+
+    def close():
+        with running:
+            iterator.close()
+
+    production = None
+    try:
+        while True:
+            production = loop.run_in_executor(executor, produce)
+            item = await production
+            if item is exhausted:
+                return
+            yield item
+    finally:
+        if production is not None and production.cancelled():
+            # Closed in the executor once the item is produced, rather than
+            # waited for.
+            loop.run_in_executor(executor, close)
+        else:
+            iterator.close()
+
+
+async def iterate_non_blocking(function: Callable, *args, **kwargs):
+    for item in function(*args, **kwargs):
+        yield item
+
+
+def ensure_async_iterator(
+        function: Callable,
+        blocking_behavior: BlockingBehavior,
+        executor: ExecutorSpec,
+        *args,
+        **kwargs
+) -> AsyncIterator:
+    """
+    Build an asynchronous iterator over the items of a generator function,
+    which may be a regular or an asynchronous generator function.
+
+    :param function: Generator function to be iterated over.
+    :param blocking_behavior: Whether producing an item of a regular generator
+        blocks, in which case it is produced in the executor.
+    :param executor: executor, or the name of a registered executor, for a
+        blocking generator.  See run_blocking().
+    :param args: Positional arguments for the function.
+    :param kwargs: Keyword arguments for the function.
+    :return: An asynchronous iterator over the items of the generator.
+    """
+    if inspect.isasyncgenfunction(function):
+        return function(*args, **kwargs)
+    if blocking_behavior is BlockingBehavior.BLOCKING:
+        return iterate_blocking(executor, function, *args, **kwargs)
+    return iterate_non_blocking(function, *args, **kwargs)
+
+
+async def call_non_blocking(function: Callable, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+def make_dispatcher(
+        function: Callable,
+        blocking_behavior: BlockingBehavior,
+        executor: ExecutorSpec = None
+) -> Callable[..., Awaitable]:
+    """
+    Choose once how the function is called, and build a coroutine function
+    calling it that way.  A coroutine function is called as is.  A
+    non-blocking function is called directly in the coroutine awaiting it,
+    without going through the event loop.  A blocking function is called in
+    the executor (see run_blocking()).
+
+    :param function: Function to be called.
+    :param blocking_behavior: Whether the function is blocking or
+        non-blocking.
+    :param executor: executor, or the name of a registered executor, in which
+        a blocking function is called.  If None, the default executor of the
+        graph run, if any, at the time of the call.
+    :return: Coroutine function taking the arguments of the function and
+        returning its return value.
+    """
+    if asyncio.iscoroutinefunction(function):
+        return function
+    if blocking_behavior is BlockingBehavior.NON_BLOCKING:
+        return partial(call_non_blocking, function)
+    return partial(run_blocking, executor, function)
+
+
 def ensure_awaitable(
         function: Callable,
         blocking_behavior: BlockingBehavior,
@@ -69,13 +607,15 @@ async def make_awaitable(
 ):
     """
     Builds an awaitable object out of the function and arguments that returns
-    the actual return value of the object, unlike loop.call_soon().
+    the actual return value of the function.
     If the callable is a blocking function (the default assumed), then it is
-    awaited with loop.run_in_executor() since that function *DOES* return the
-    return value.
-    If the callable is a non-blocking function, it schedules it on the event
-    loop along with a future that is set with the result.  The future is awaited
-    and the result is returned.
+    called in an executor (see run_blocking()), the default executor of the
+    graph run, if any.
+    If the callable is a non-blocking function, it is called directly, and its
+    return value returned.
+
+    To call a function many times, make_dispatcher() chooses how it is called
+    once instead of on every call.
 
     :param function: Function to be executed on the loop (coroutine or
     otherwise).
@@ -86,23 +626,6 @@ async def make_awaitable(
     :return: An awaitable object to retrieve the output of the function upon
     completion.
     """
-    loop = asyncio.get_running_loop()
-    future = asyncio.Future()
-    wrapped_function = partial(function, *args, **kwargs)
     if blocking_behavior is BlockingBehavior.BLOCKING:
-        return await loop.run_in_executor(None, wrapped_function)
-
-    loop.call_soon(call_and_set_future, future, wrapped_function)
-    return await future
-
-
-def call_and_set_future(
-        future: asyncio.Future,
-        function: Callable
-):
-    try:
-        return_value = function()
-    except Exception as e:
-        future.set_exception(e)
-    else:
-        future.set_result(return_value)
+        return await run_blocking(None, function, *args, **kwargs)
+    return function(*args, **kwargs)
@@ -1,6 +1,9 @@
-from enum import Enum
+import random
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Tuple, Type, Union
 
-__all__ = ['BranchingStrategy']
+__all__ = ['BranchingStrategy', 'ErrorPolicy', 'RetryPolicy']
 
 
 class BranchingStrategy(str, Enum):
@@ -23,3 +26,73 @@ class BranchingStrategy(str, Enum):
     """
     parallel = 'parallel'
     matcher = 'matcher'
+
+
+class ErrorPolicy(Enum):
+    """
+    What a graph run does when a node raises an exception, which ends the
+    branch of the node.
+
+    FINISH: (Default) Let the other branches finish.  The run raises the
+        exception if it is the last output of the run (or the first exception
+        raised when collecting the outputs of every branch).  Any other
+        exception is passed to the exception handler of the event loop.
+    FAIL_FAST: Cancel the other branches at once, and raise the exception.
+    COLLECT: Let the other branches finish, then raise an ExceptionGroup of
+        every exception raised, in order.
+    """
+    FINISH = auto()
+    FAIL_FAST = auto()
+    COLLECT = auto()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How a node retries its call when it raises an exception, before the
+    exception ends its branch (see nodetype()).
+
+    The delay before each retry grows exponentially from backoff, by a factor
+    of multiplier per attempt, up to max_backoff.  With jitter, the delay is
+    drawn uniformly between zero and that value instead, so nodes failing
+    together don't retry together.  For example, with the defaults, the
+    second and third attempts wait up to 0.1 and 0.2 seconds.
+
+    max_attempts: Number of calls made at most, including the first one.
+    backoff: Delay in seconds before the first retry.
+    multiplier: Factor by which the delay grows on every retry.
+    max_backoff: Longest delay in seconds between two attempts.
+    jitter: Whether the delays are randomized.
+    retry_on: Exception type, or tuple of exception types, that are retried.
+        Other exceptions end the branch at once.
+    """
+    max_attempts: int = 3
+    backoff: float = 0.1
+    multiplier: float = 2.
+    max_backoff: float = 10.
+    jitter: bool = True
+    retry_on: Union[Type[Exception], Tuple[Type[Exception], ...]] = Exception
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError('max attempts must be at least 1')
+        if self.backoff < 0 or self.max_backoff < 0:
+            raise ValueError('backoff must not be negative')
+        if self.multiplier < 1:
+            raise ValueError('backoff multiplier must be at least 1')
+
+    def should_retry(self, exception: Exception, attempt: int) -> bool:
+        """
+        Whether to retry after the attempt, numbered from 1, raised the
+        exception.
+        """
+        return (attempt < self.max_attempts
+                and isinstance(exception, self.retry_on))
+
+    def delay(self, attempt: int) -> float:
+        """
+        Delay in seconds before retrying after the attempt, numbered from 1.
+        """
+        delay = min(self.backoff * self.multiplier ** (attempt - 1),
+                    self.max_backoff)
+        return random.uniform(0, delay) if self.jitter else delay
@@ -1,12 +1,49 @@
 import asyncio
+from collections import OrderedDict
 from enum import Enum, auto
 import inspect
 from dataclasses import dataclass
-from typing import Any, Callable, Collection, Dict, List, Tuple
+from contextlib import asynccontextmanager
+from functools import partial
+from time import monotonic
+from typing import (Any, AsyncContextManager, Awaitable, Callable, Collection,
+                    Dict, Hashable, List, Optional, Sequence, Set, Tuple, Union)
 
 __all__ = ['CacheSupport', 'dependency']
 
 
+@dataclass(frozen=True)
+class TimeToLive:
+    """
+    Cache policy keeping a dependency function's output value for a limited
+    time.  See CacheSupport.ttl().
+    """
+    seconds: float
+    refresh_ahead: Optional[float] = None
+
+    def __post_init__(self):
+        if self.seconds <= 0:
+            raise ValueError('time to live must be positive')
+        if self.refresh_ahead is not None and not (
+                0 < self.refresh_ahead < self.seconds):
+            raise ValueError('refresh ahead time must be positive and less '
+                             'than the time to live')
+
+
+@dataclass(frozen=True)
+class LeastRecentlyUsed:
+    """
+    Cache policy keeping a bounded number of a dependency function's output
+    values, keyed by the values of its own dependencies.  See
+    CacheSupport.lru().
+    """
+    maxsize: int
+
+    def __post_init__(self):
+        if self.maxsize < 1:
+            raise ValueError('maximum cache size must be at least 1')
+
+
 class CacheSupport(Enum):
     """
     Parameter describing the circumstances under which a dependency function's
@@ -17,20 +54,61 @@ class CacheSupport(Enum):
         only need to be invoked once, such as reading a configuration file.
     NEVER_CACHE: Call the dependency function each time it is needed by a node.
         This includes as a direct dependency or in a hierarchy.  This is useful
-        for dependencies that provide a time-limited interface, such as
+        for dependencies that must not be reused at all.
+    ttl(seconds): Store the returned value for a number of seconds, then call
+        the dependency function again the next time it is needed.  This is
+        useful for dependencies that provide a time-limited interface, such as
         external API interfaces that have an authentication session that can
         expire.
+    lru(maxsize): Store up to a number of returned values, one for each
+        combination of values of the dependency's own dependencies, discarding
+        the least recently used.  This is useful for dependencies built from
+        changing inputs, such as a client per authentication token.  The
+        dependency must have dependencies of its own, with hashable values,
+        and at least one of them must not be cached permanently for more than
+        one value to ever be stored.
     """
     CACHE_PERMANENTLY = auto()
     NEVER_CACHE = auto()
 
+    @staticmethod
+    def ttl(seconds: float, refresh_ahead: float = None) -> TimeToLive:
+        """
+        Cache the dependency function's output value for a limited time.
+
+        :param seconds: time in seconds the value is kept after it is returned
+        :param refresh_ahead: optional time in seconds before expiration at
+            which the dependency function is called again in the background
+            when the value is used, so callers don't wait for a new value
+        :return: cache policy for the dependency decorator
+        """
+        return TimeToLive(seconds, refresh_ahead)
+
+    @staticmethod
+    def lru(maxsize: int) -> LeastRecentlyUsed:
+        """
+        Cache a bounded number of the dependency function's output values.
+        Values are keyed by the values of the dependency's own dependencies,
+        which must be hashable.
+
+        :param maxsize: maximum number of values kept
+        :return: cache policy for the dependency decorator
+        """
+        return LeastRecentlyUsed(maxsize)
+
+
+CachePolicy = Union[CacheSupport, TimeToLive, LeastRecentlyUsed]
+
 
 @dataclass
 class Dependency:
     name: str
     dependencies: Tuple[str]
     callable: Callable
-    cache_support: CacheSupport
+    cache_support: CachePolicy
+    # Whether the callable returns an async context manager whose entered value
+    # is the value of the dependency, rather than returning the value itself.
+    managed: bool = False
 
     def __hash__(self):
         return hash(self.name)
@@ -39,21 +117,313 @@ class Dependency:
         return self.callable(*args, **kwargs)
 
 
+class _Entry:
+    """
+    A value provided by a call to a dependency provider that must be torn down
+    once it is no longer used: the value of a managed dependency, or a value
+    provided with the values of managed dependencies, which it holds on to.
+
+    An entry is in use while it is cached or held by a lease, and is torn down
+    once it is neither.
+    """
+    __slots__ = ('name', 'context', 'held', 'users', 'cached', 'closed')
+
+    def __init__(self, name: str, context: Optional[AsyncContextManager],
+                 held: List['_Entry']):
+        self.name = name
+        self.context = context
+        # Entries of the values of the dependencies the value was provided
+        # with.
+        self.held = held
+        # Number of leases holding the entry.
+        self.users = 0
+        self.cached = False
+        self.closed = False
+
+
+Lease = List[_Entry]
+
+
 class DependencyCache:
+    """
+    Cache of dependency values, and owner of the values of managed
+    dependencies until they are torn down.
+
+    A caller that wants the values of managed dependencies torn down as soon as
+    it is done with them passes a lease (an empty list) when calling them, and
+    releases it with release() when done.  A value held by a lease is never
+    torn down before the lease is released, even if it expires, is evicted or
+    is replaced in the meantime: its teardown is deferred until the last lease
+    holding it is released.  A value that is never cached is torn down as soon
+    as the lease it was provided to is released.  Without a lease, such a value
+    is kept until the cache is closed.
+    """
     def __init__(self):
         self._dependency_registry: Dict[str, Dependency] = _dependencies.copy()
-        self._dependency_cache: Dict[Dependency, Any] = {}
-
-    async def call_dependency(self, name):
+        # Values are keyed by dependency name, or by a tuple of the name and
+        # the values of its own dependencies for least-recently-used caching.
+        self._dependency_cache: Dict[Hashable, Any] = {}
+        # Expiration times of the values cached with a time to live.
+        self._expiry: Dict[str, float] = {}
+        # Keys of the values cached as least recently used, oldest first.
+        self._lru_keys: Dict[str, OrderedDict] = {}
+        # Resolutions of cachable dependencies currently underway, shared by
+        # all callers requesting the dependency until it is in the cache.
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        # Entries of the cached values that must be torn down, keyed like the
+        # values.
+        self._entries: Dict[Hashable, _Entry] = {}
+        # Entries not torn down yet, cached or not, in order of creation.
+        self._open: Dict[_Entry, None] = {}
+        # Teardowns of entries no longer in use.
+        self._closing: Set[asyncio.Future] = set()
+
+    async def call_dependency(self, name, lease: Optional[Lease] = None):
         if self._is_in_cache(name):
+            self._hold(self._entries.get(name), lease)
             return self._get_from_cache(name)
 
+        cache_support = self._get_dependency(name).cache_support
+        if cache_support is CacheSupport.NEVER_CACHE:
+            value, entry = await self._resolve_dependency(name)
+        elif isinstance(cache_support, LeastRecentlyUsed):
+            value, entry = await self._call_keyed_dependency(name)
+        else:
+            # Shield the resolution so a cancelled caller doesn't cancel it
+            # for every other caller waiting on it.
+            value, entry = await asyncio.shield(self._start_resolution(
+                name, partial(self._resolve_dependency, name)))
+        self._hold(entry, lease)
+        return value
+
+    async def call_dependencies(
+            self,
+            names: Sequence[str],
+            lease: Optional[Lease] = None
+    ) -> List[Any]:
+        """
+        Get the values of several dependencies, resolving those not in the
+        cache concurrently.  If one fails, the others are cancelled.
+
+        :param names: names of the dependencies
+        :param lease: optional lease to hold the values of managed dependencies
+            with until it is released (see release())
+        :return: values of the dependencies in the same order as the names
+        """
+        if all(self._is_in_cache(name) for name in names):
+            if lease is not None and self._entries:
+                for name in names:
+                    self._hold(self._entries.get(name), lease)
+            return [self._get_from_cache(name) for name in names]
+        if len(names) == 1:
+            return [await self.call_dependency(names[0], lease)]
+        loop = asyncio.get_running_loop()
+        calls = [loop.create_task(self.call_dependency(name, lease))
+                 for name in names]
+        try:
+            await asyncio.wait(calls, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # When one fails, or the caller is cancelled, the others are
+            # cancelled and waited for, so none adds a value to the lease
+            # after the caller released it.
+            pending = [call for call in calls if not call.done()]
+            for call in pending:
+                call.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        exceptions = [call.exception() for call in calls
+                      if not call.cancelled()]
+        for exception in exceptions:
+            if exception is not None:
+                raise exception
+        return [call.result() for call in calls]
+
+    def release(self, lease: Lease) -> None:
+        """
+        Release the values held by a lease.  Those no longer cached or held by
+        another lease are torn down in the background.
+
+        :param lease: lease passed to call_dependency() or call_dependencies()
+        """
+        for entry in lease:
+            entry.users -= 1
+            self._close_if_unused(entry)
+        lease.clear()
+
+    async def close(self):
+        """
+        Tear down the values of all managed dependencies and empty the cache.
+
+        Values are torn down in reverse dependency order: a dependency is torn
+        down before any of the dependencies it depends on.  Values still held
+        by a lease are torn down as well.  Every teardown is attempted, after
+        which the first error raised by one, if any, is raised.
+        """
+        for resolution in list(self._in_flight.values()):
+            resolution.cancel()
+
+        entries = list(reversed(self._open))
+        depths = {}
+        entries.sort(key=lambda entry: -self._get_depth(entry.name, depths))
+        closing = list(self._closing)
+
+        self._dependency_cache.clear()
+        self._expiry.clear()
+        self._lru_keys.clear()
+        self._entries.clear()
+        self._open.clear()
+        self._closing.clear()
+
+        errors = []
+        for entry in entries:
+            entry.closed = True
+            if entry.context is None:
+                continue
+            try:
+                await entry.context.__aexit__(None, None, None)
+            except Exception as e:
+                errors.append(e)
+        results = await asyncio.gather(*closing, return_exceptions=True)
+        errors.extend(result for result in results
+                      if isinstance(result, Exception))
+        if errors:
+            raise errors[0]
+
+    async def _resolve_dependency(self, name):
         dep = self._get_dependency(name)
-        args = [await self.call_dependency(name) for name in dep.dependencies]
-
-        result = await dep(*args)
-        self._save_in_cache(name, result)
-        return result
+        held = []
+        try:
+            args = await self.call_dependencies(dep.dependencies, held)
+            value, entry = await self._call_provider(dep, args, held)
+        except BaseException:
+            self.release(held)
+            raise
+        self._save_in_cache(name, value, entry)
+        return value, entry
+
+    async def _call_provider(self, dep: Dependency, args, held: Lease):
+        if dep.managed:
+            context = dep(*args)
+            value = await context.__aenter__()
+        else:
+            context = None
+            value = await dep(*args)
+
+        if context is None and not held:
+            return value, None
+        entry = _Entry(dep.name, context, held)
+        self._open[entry] = None
+        return value, entry
+
+    def _hold(self, entry: Optional[_Entry], lease: Optional[Lease]):
+        if entry is None:
+            return
+        if lease is not None:
+            entry.users += 1
+            lease.append(entry)
+        elif not entry.cached:
+            # Nothing would ever release it, so keep it until the cache is
+            # closed.
+            entry.users += 1
+
+    def _drop_entry(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.cached = False
+            self._close_if_unused(entry)
+
+    def _close_if_unused(self, entry: _Entry):
+        if entry.cached or entry.users or entry.closed:
+            return
+        entry.closed = True
+        del self._open[entry]
+        if entry.context is None:
+            self.release(entry.held)
+            return
+        closing = asyncio.ensure_future(self._close_entry(entry))
+        closing.add_done_callback(self._closing.discard)
+        self._closing.add(closing)
+
+    async def _close_entry(self, entry: _Entry):
+        try:
+            await entry.context.__aexit__(None, None, None)
+        finally:
+            self.release(entry.held)
+
+    def _get_depth(self, name, depths: Dict[str, int]) -> int:
+        try:
+            return depths[name]
+        except KeyError:
+            # Guard against cycles, which can't have been resolved anyway.
+            depths[name] = 0
+            subdependencies = self._get_dependency(name).dependencies
+            depths[name] = 1 + max(
+                (self._get_depth(subdep, depths) for subdep in subdependencies),
+                default=0)
+            return depths[name]
+
+    async def _call_keyed_dependency(self, name):
+        dep = self._get_dependency(name)
+        held = []
+        args = await self.call_dependencies(dep.dependencies, held)
+        key = (name, *args)
+        try:
+            hash(key)
+        except TypeError:
+            self.release(held)
+            raise TypeError(f'the values of the dependencies of "{name}" must '
+                            f'be hashable to cache it as least recently '
+                            f'used') from None
+
+        if key in self._dependency_cache:
+            # The cached value holds the values it was provided with.
+            self.release(held)
+            self._lru_keys[name].move_to_end(key)
+            return self._dependency_cache[key], self._entries.get(key)
+
+        if key in self._in_flight:
+            self.release(held)
+        return await asyncio.shield(self._start_resolution(
+            key, partial(self._resolve_keyed_dependency, dep, args, key, held)))
+
+    async def _resolve_keyed_dependency(self, dep: Dependency, args, key,
+                                        held: Lease):
+        try:
+            value, entry = await self._call_provider(dep, args, held)
+        except BaseException:
+            self.release(held)
+            raise
+
+        lru_keys = self._lru_keys.setdefault(dep.name, OrderedDict())
+        self._dependency_cache[key] = value
+        if entry is not None:
+            entry.cached = True
+            self._entries[key] = entry
+        lru_keys[key] = None
+        if len(lru_keys) > dep.cache_support.maxsize:
+            oldest_key, _ = lru_keys.popitem(last=False)
+            del self._dependency_cache[oldest_key]
+            self._drop_entry(oldest_key)
+        return value, entry
+
+    def _start_resolution(
+            self,
+            key: Hashable,
+            resolve: Callable[[], Awaitable]
+    ) -> asyncio.Future:
+        try:
+            return self._in_flight[key]
+        except KeyError:
+            resolution = asyncio.ensure_future(resolve())
+            resolution.add_done_callback(partial(self._finish_resolution, key))
+            self._in_flight[key] = resolution
+            return resolution
+
+    def _finish_resolution(self, key, resolution: asyncio.Future):
+        del self._in_flight[key]
+        # Mark a failure as retrieved; it is raised to every waiting caller.
+        if not resolution.cancelled():
+            resolution.exception()
 
     def _get_dependency(self, name) -> Dependency:
         return self._dependency_registry[name]
@@ -63,14 +433,44 @@ class DependencyCache:
                 for subdep in dependency.dependencies]
 
     def _is_in_cache(self, name):
-        return name in self._dependency_cache
+        if name not in self._dependency_cache:
+            return False
+        try:
+            expiry = self._expiry[name]
+        except KeyError:
+            return True
+        return self._check_expiry(name, expiry)
+
+    def _check_expiry(self, name, expiry):
+        now = monotonic()
+        if now >= expiry:
+            del self._dependency_cache[name]
+            del self._expiry[name]
+            self._drop_entry(name)
+            return False
+
+        refresh_ahead = self._get_dependency(name).cache_support.refresh_ahead
+        if refresh_ahead is not None and now >= expiry - refresh_ahead:
+            # Keep serving the current value while a new one is fetched.
+            self._start_resolution(name,
+                                   partial(self._resolve_dependency, name))
+        return True
 
     def _get_from_cache(self, name):
         return self._dependency_cache[name]
 
-    def _save_in_cache(self, name, value):
+    def _save_in_cache(self, name, value, entry: Optional[_Entry] = None):
         if self._is_cachable(name):
+            # A refreshed value replaces the current one, which is torn down
+            # once no longer in use.
+            self._drop_entry(name)
             self._dependency_cache[name] = value
+            if entry is not None:
+                entry.cached = True
+                self._entries[name] = entry
+            cache_support = self._get_dependency(name).cache_support
+            if isinstance(cache_support, TimeToLive):
+                self._expiry[name] = monotonic() + cache_support.seconds
 
     def _is_cachable(self, name):
         return (self._get_dependency(name).cache_support is not
@@ -93,6 +493,36 @@ def get_direct_dependencies(dependency_names: Collection[str]):
     return [_dependencies[name] for name in dependency_names]
 
 
+def check_dependencies_registered(dependency_names: Collection[str]) -> None:
+    """
+    Verify that every named dependency, and every dependency they depend on in
+    turn, is registered, and that no dependency depends on itself.
+
+    :param dependency_names: names of the dependencies to verify
+    :raises ValueError: if a dependency is not registered or is part of a cycle
+    """
+    checked = set()
+
+    def check(name, path: List[str]):
+        if name in path:
+            cycle = ' -> '.join(path[path.index(name):] + [name])
+            raise ValueError(f'dependency cycle: {cycle}')
+        if name in checked:
+            return
+        try:
+            subdependencies = _dependencies[name].dependencies
+        except KeyError:
+            raise ValueError(f'no dependency registered named "{name}"')
+        path.append(name)
+        for subdependency in subdependencies:
+            check(subdependency, path)
+        path.pop()
+        checked.add(name)
+
+    for dependency_name in dependency_names:
+        check(dependency_name, [])
+
+
 def get_recursive_dependencies(dependency: Dependency) -> List[Dependency]:
     all_deps = get_direct_dependencies(dependency.dependencies)
     for dep in all_deps.copy():
@@ -100,6 +530,20 @@ def get_recursive_dependencies(dependency: Dependency) -> List[Dependency]:
     return all_deps
 
 
+def is_context_manager_provider(function) -> bool:
+    """
+    Whether the function is an async generator function, or was made into an
+    async context manager factory from one (with contextlib's
+    asynccontextmanager decorator).
+    """
+    return inspect.isasyncgenfunction(inspect.unwrap(function))
+
+
+def is_provider(function) -> bool:
+    return (asyncio.iscoroutinefunction(function)
+            or is_context_manager_provider(function))
+
+
 def dependency(arg, /):
     """
     Declare the coroutine function is a dependency provider.
@@ -124,17 +568,31 @@ def dependency(arg, /):
     configuration specification from file, while another dependency
     "username(config)" can provide just the username out of the configuration.
 
+    Dependencies holding resources that must be released, such as connection
+    pools, sockets or files, can be provided by an async generator function
+    (or an async context manager function) instead.  The value yielded by the
+    generator is the value of the dependency, and the code after the yield is
+    run to tear it down.  The values of these dependencies are torn down when
+    the graph run owning the dependency cache finishes, in reverse dependency
+    order, or when they are dropped from the cache before then.  A value
+    dropped from the cache while a node is still executing with it is only torn
+    down once the node finishes.  Values that are never cached are torn down
+    when the node they were provided to finishes.
+
     The dependency decorator can be provided a CacheSupport argument to specify
-    whether it can be cached.  See the CacheSupport class for details.
+    whether it can be cached, or a cache policy from CacheSupport.ttl() or
+    CacheSupport.lru() to specify for how long.  See the CacheSupport class for
+    details.
 
     :param arg: When used as a decorator without arguments, this is the
         decorated function.  When called with arguments this is the cache
         support parameter.  See the CacheSupport enum.
     :return: Decorated function.
     """
-    if inspect.isfunction(arg) and not inspect.iscoroutinefunction(arg):
+    if inspect.isfunction(arg) and not is_provider(arg):
         raise TypeError(f'dependency "{arg.__name__}" must be a coroutine '
-                        f'function (must be defined with "async def")')
+                        f'function or an async generator function (must be '
+                        f'defined with "async def")')
 
     if inspect.isfunction(arg):
         called_with_function_argument = True
@@ -147,13 +605,21 @@ def dependency(arg, /):
         name = function.__name__
         if name in _dependencies:
             raise ValueError(f'dependency already defined named "{name}"')
-        if not asyncio.iscoroutinefunction(function):
+        if not is_provider(function):
             raise TypeError(f'dependency "{name}" must be a coroutine function '
-                            f'(must be defined with "async def")')
+                            f'or an async generator function (must be defined '
+                            f'with "async def")')
 
+        managed = is_context_manager_provider(function)
+        provider = (asynccontextmanager(function)
+                    if inspect.isasyncgenfunction(function) else function)
         subdependencies = get_direct_dependency_names(function)
-        _dependencies[name] = Dependency(name, subdependencies, function,
-                                         cache_support)
+        if (isinstance(cache_support, LeastRecentlyUsed)
+                and not subdependencies):
+            raise ValueError(f'dependency "{name}" cached as least recently '
+                             f'used must have dependencies to key its values')
+        _dependencies[name] = Dependency(name, subdependencies, provider,
+                                         cache_support, managed)
         return function
 
     if called_with_function_argument:
@@ -1,17 +1,31 @@
 import asyncio
 import contextvars
+from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Any, Dict, List, Union, Tuple
-
-from .asyncutils import BranchTracker
-from .dependencies import DependencyCache
-from .graph import Graph, Node
-from .parse.graphviz import parse
-from .parse.native import Graph
-
-__all__ = ['run', 'run_graph']
+from time import perf_counter
+from typing import (Any, AsyncIterable, AsyncIterator, Dict, Optional,
+                    Sequence, Tuple, Union)
+
+from .asyncutils import BranchTracker, ExecutorSpec, executor_ctx_var
+from .controlflow import ErrorPolicy
+from .dependencies import DependencyCache, Lease
+from .graph import Graph
+from .instrumentation import (Instrumentation, NodeEvent,
+                              instrumentation_ctx_var, new_id,
+                              node_event_ctx_var)
+from .parse.cache import get_cached_graph, load_graph
+from .plan import (NodeRecord, OutputUnpacking, get_execution_plan,
+                   unpack_matcher_output)
+
+__all__ = ['RunResult', 'run', 'run_graph', 'serve']
 
 dependency_cache_ctx_var = contextvars.ContextVar("dependency_cache")
+# Time of the event loop by which the graph run must finish, inherited by the
+# subgraphs it runs.
+deadline_ctx_var = contextvars.ContextVar("deadline")
+
+# Number of nodes a branch executes in a row before yielding to the event loop.
+INLINE_HOPS_BEFORE_YIELD = 64
 
 
 class CacheUsage(Enum):
@@ -32,88 +46,485 @@ def get_context_dependency_cache():
 
 
 def convert_output_to_input(output_data):
-    if output_data is None or output_data == (None,):
+    if output_data is None:
         return tuple()
-    elif not isinstance(output_data, tuple):
-        return output_data,
+    elif isinstance(output_data, tuple):
+        return tuple() if output_data == (None,) else output_data
     else:
-        return output_data
+        return output_data,
 
 
 async def get_dependencies(
         dependency_cache: DependencyCache,
-        dependency_names: List[str]
+        dependency_names: Sequence[str],
+        lease: Optional[Lease] = None
 ) -> Dict[str, Any]:
-    return {
-        name: await dependency_cache.call_dependency(name)
-        for name in dependency_names
-    }
+    values = await dependency_cache.call_dependencies(dependency_names, lease)
+    return dict(zip(dependency_names, values))
+
+
+async def acquire_slots(
+        record: NodeRecord,
+        branch_tracker: BranchTracker
+) -> None:
+    """
+    Wait until the node of the record can execute within the concurrency limits
+    of the graph run and of its node type.
+    """
+    if branch_tracker.in_flight_limit is not None:
+        await branch_tracker.in_flight_limit.acquire()
+    if record.concurrency_limit is not None:
+        try:
+            await record.concurrency_limit.get_semaphore().acquire()
+        except BaseException:
+            if branch_tracker.in_flight_limit is not None:
+                branch_tracker.in_flight_limit.release()
+            raise
+
+
+def release_slots(record: NodeRecord, branch_tracker: BranchTracker) -> None:
+    if record.concurrency_limit is not None:
+        record.concurrency_limit.get_semaphore().release()
+    if branch_tracker.in_flight_limit is not None:
+        branch_tracker.in_flight_limit.release()
+
+
+def route_output(
+        record: NodeRecord,
+        raw_node_output
+) -> Tuple[Any, Tuple[NodeRecord, ...]]:
+    """
+    Split the raw output of the node of the record into the data passed to the
+    following nodes and the records of those nodes.
+    """
+    # The Matcher node requires the return value to have a certain form,
+    # and the value used for branch matching should not be passed to the
+    # next node.
+    if record.unpacking is OutputUnpacking.MATCHER:
+        return (unpack_matcher_output(raw_node_output),
+                record.match_table.get(raw_node_output[0],
+                                       record.match_default))
+    return raw_node_output, record.successors
+
+
+def is_limited(record: NodeRecord, branch_tracker: BranchTracker) -> bool:
+    # A streaming node only holds slots while producing an item (see
+    # stream_node()), so it isn't admitted like other nodes.
+    return not record.streaming and (
+        record.concurrency_limit is not None
+        or branch_tracker.in_flight_limit is not None)
+
+
+def arrive_at_join(
+        record: NodeRecord,
+        source: NodeRecord,
+        branch_tracker: BranchTracker,
+        input_data: Tuple
+) -> Optional[Tuple]:
+    """
+    Deliver the input from the node of the source to the join node of the
+    record.
+
+    :return: input data of the join node once an input arrived from every node
+        preceding it, otherwise None
+    """
+    item = (input_data[0] if len(input_data) == 1
+            else input_data if input_data else None)
+    inputs = branch_tracker.join(record, len(record.join_slots),
+                                 record.join_slots[source.index], item)
+    return None if inputs is None else (inputs,)
+
+
+async def start_branch(
+        record: NodeRecord,
+        branch_tracker: BranchTracker,
+        input_data: Tuple,
+        parent: Optional[int] = None,
+        source: Optional[NodeRecord] = None
+) -> Optional[asyncio.Task]:
+    """
+    Start a new branch of the graph at the node of the record, in its own task.
+    In an instrumented run, parent identifies the execution of the node forking
+    the branch.
+
+    A branch reaching a join node from the node of the source is only started
+    once every input of the join node arrived, otherwise None is returned, as
+    it is once the run failed fast.
+    """
+    if branch_tracker.failed:
+        return None
+    if record.join_slots is not None and source is not None:
+        input_data = arrive_at_join(record, source, branch_tracker, input_data)
+        if input_data is None:
+            return None
+    admit = is_limited(record, branch_tracker)
+    if admit:
+        await acquire_slots(record, branch_tracker)
+    if branch_tracker.failed:
+        # The run failed while waiting for the slots.
+        if admit:
+            release_slots(record, branch_tracker)
+        return None
+    branch_tracker.add_branch()
+    task = asyncio.get_running_loop().create_task(
+        execute_node(record, branch_tracker, input_data, admit, parent))
+    branch_tracker.track(task)
+    return task
 
 
 async def execute_node(
-        node: Node,
+        record: NodeRecord,
         branch_tracker: BranchTracker,
-        input_data: Tuple = ()
+        input_data: Tuple = (),
+        admitted: bool = False,
+        parent: Optional[int] = None
 ) -> None:
-    loop = asyncio.get_running_loop()
-    dependency_cache = get_context_dependency_cache()
+    """
+    Execute a branch of the graph starting at the node of the record.
+
+    A node followed by a single node continues the branch in the same coroutine
+    rather than scheduling a new task.  New tasks are only created for the
+    additional branches forked off when a node is followed by several nodes.
+
+    When concurrency is limited, a node only executes once it holds a slot of
+    the limits (see acquire_slots()), and releases it when done.  The slots
+    for a new branch are acquired before its task is created, which is
+    indicated by the admitted flag, so a node forking branches waits while the
+    limits are reached instead of piling up waiting tasks.
+
+    In an instrumented run, every node is timed (see Instrumentation), and
+    the branch gets an identifier.  The parent identifies the execution that
+    led to the branch (see NodeEvent).
+
+    A branch continuing to a join node ends there until every input of the
+    join node arrived (see nodetype()).
+
+    An exception raised by a node ends the branch, and is handed to the
+    branch tracker, which applies the error policy of the run.  A node that
+    exceeds its timeout is cancelled and raises asyncio.TimeoutError.  A node
+    with a retry policy retries its call in place, in the same task, with
+    its dependencies resolved again (see nodetype()).
+    """
+    hops = 0
+    source = None
+    instrumentation = branch_tracker.instrumentation
+    event = None
+    branch = None
+    if instrumentation is not None:
+        branch = new_id()
+        # The start node of a subgraph is linked to the node running it.
+        enclosing_event = node_event_ctx_var.get(None)
+        if parent is None and enclosing_event is not None:
+            parent = enclosing_event.span
+
+    while True:
+        if record.join_slots is not None and source is not None:
+            input_data = arrive_at_join(record, source, branch_tracker,
+                                        input_data)
+            if input_data is None:
+                branch_tracker.remove_branch()
+                return
+
+        if record.streaming:
+            await stream_node(record, branch_tracker, input_data, branch,
+                              parent)
+            return
+
+        if instrumentation is not None:
+            event = NodeEvent(record.name, record.typename,
+                              branch_tracker.run_id, branch, parent)
+        limited = is_limited(record, branch_tracker)
+        if admitted:
+            admitted = False
+        elif limited:
+            await acquire_slots(record, branch_tracker)
+
+        # Values of managed dependencies provided to the node, held until it
+        # finishes.
+        lease = None
+        try:
+            if event is not None:
+                event.admitted = perf_counter()
+            try:
+                attempt = 1
+                while True:
+                    try:
+                        # Construct full input for the node.
+                        # This is positional arguments created from the output
+                        # of the previous node, as well as keyword arguments
+                        # pulled from the dependency injector.
+                        if record.dependencies:
+                            dependency_cache = get_context_dependency_cache()
+                            lease = []
+                            dependencies = await get_dependencies(
+                                dependency_cache, record.dependencies, lease)
+                        else:
+                            dependencies = {}
+
+                        # Call the node.
+                        if event is None:
+                            call = record.call(*input_data, **dependencies)
+                        else:
+                            call = call_instrumented(record, event, input_data,
+                                                     dependencies)
+                        if record.timeout is None:
+                            raw_node_output = await call
+                        else:
+                            raw_node_output = await asyncio.wait_for(
+                                call, record.timeout)
+                        break
+                    except Exception as e:
+                        if record.retry is None or not (
+                                record.retry.should_retry(e, attempt)):
+                            raise
+                        # The dependencies are provided again for the next
+                        # attempt, so values never cached are provided anew.
+                        if lease:
+                            dependency_cache.release(lease)
+                        await asyncio.sleep(record.retry.delay(attempt))
+                        attempt += 1
+                        if event is not None:
+                            event.attempts = attempt
+            except asyncio.CancelledError as e:
+                # The run was cancelled, failed fast or exceeded its deadline.
+                if event is not None:
+                    instrumentation.finish(event, e)
+                raise
+            except Exception as e:
+                # Any exception, from the node or from providing its
+                # dependencies, kills the branch.  We can't make any
+                # assumptions, so we can't handle the exception, except to hand
+                # it to the tracker, which raises it from the run as the error
+                # policy dictates.
+                if event is not None:
+                    instrumentation.finish(event, e)
+                branch_tracker.set_exception(e)
+                branch_tracker.remove_branch()
+                return
+        finally:
+            if lease:
+                dependency_cache.release(lease)
+            if limited:
+                release_slots(record, branch_tracker)
+        if event is not None:
+            instrumentation.finish(event)
+
+        try:
+            output_data, next_records = route_output(record, raw_node_output)
+        except Exception as e:
+            # The output of a matcher node can't be split into a match value
+            # and the data passed on, or the match value can't be looked up.
+            branch_tracker.set_exception(e)
+            branch_tracker.remove_branch()
+            return
+
+        if not next_records:
+            # With no following node, this branch ends, so remove it from the
+            # tracker to ensure the graph coroutine returns when all work is
+            # done.
+            branch_tracker.add_output(record.name, output_data)
+            branch_tracker.remove_branch()
+            return
+
+        # Prepare positional input arguments for the trailing node(s).
+        input_data = convert_output_to_input(output_data)
+        if event is not None:
+            parent = event.span
+
+        # The first trailing node is a continuation of this branch and runs
+        # in this coroutine.  The rest, if any, are new branches that need to
+        # be tracked and run in their own tasks.
+        if len(next_records) > 1:
+            for next_record in next_records[1:]:
+                await start_branch(next_record, branch_tracker, input_data,
+                                   parent, record)
+        source = record
+        record = next_records[0]
+
+        # A long (or endless, in the case of a loop) chain of nodes that never
+        # suspend would otherwise starve every other task on the event loop.
+        hops += 1
+        if hops == INLINE_HOPS_BEFORE_YIELD:
+            hops = 0
+            await asyncio.sleep(0)
+
+
+async def call_instrumented(
+        record: NodeRecord,
+        event: NodeEvent,
+        input_data: Tuple,
+        dependencies: Dict[str, Any]
+) -> Any:
+    """
+    Call the node of the record, recording in its event when its dependencies
+    were resolved, and when it started running if it is called in an executor.
+    """
+    event.resolved = perf_counter()
+    token = node_event_ctx_var.set(event)
+    try:
+        return await record.call(*input_data, **dependencies)
+    finally:
+        node_event_ctx_var.reset(token)
 
-    # Construct full input for the node.
-    # This is positional arguments created from the output of the previous node,
-    # as well as keyword arguments pulled from the dependency injector.
-    dependencies = await get_dependencies(dependency_cache,
-                                          node.get_dependencies())
 
-    # Call the node.
+async def stream_node(
+        record: NodeRecord,
+        branch_tracker: BranchTracker,
+        input_data: Tuple = (),
+        branch: Optional[int] = None,
+        parent: Optional[int] = None
+) -> None:
+    """
+    Execute a branch of the graph starting at the streaming node of the record.
+
+    Every item produced by the node starts a new branch for each of the nodes
+    following it, and the branch of the node itself ends once it is exhausted.
+    At most buffer_size of those branches run at once: the node is only
+    resumed once one finishes, so the node's producer pauses when consumers
+    lag.  Items without following nodes are output of the graph.
+
+    The node holds the values of its dependencies until it is exhausted, but
+    only holds slots of the concurrency limits while producing an item.  In an
+    instrumented run, the production of every item is timed as an execution of
+    the node, from which the branches processing the item are forked.
+    """
+    instrumentation = branch_tracker.instrumentation
+    event = None
+    buffer = asyncio.Semaphore(record.buffer_size)
+    limited = (record.concurrency_limit is not None
+               or branch_tracker.in_flight_limit is not None)
+    lease = None
+    items = None
     try:
-        raw_node_output = await node(*input_data, **dependencies)
+        if record.dependencies:
+            dependency_cache = get_context_dependency_cache()
+            lease = []
+            dependencies = await get_dependencies(
+                dependency_cache, record.dependencies, lease)
+        else:
+            dependencies = {}
+
+        items = record.call(*input_data, **dependencies)
+        while True:
+            if instrumentation is not None:
+                event = NodeEvent(record.name, record.typename,
+                                  branch_tracker.run_id, branch, parent)
+            if limited:
+                await acquire_slots(record, branch_tracker)
+            if event is not None:
+                event.admitted = event.resolved = perf_counter()
+            try:
+                if record.timeout is None:
+                    raw_node_output = await items.__anext__()
+                else:
+                    raw_node_output = await asyncio.wait_for(
+                        items.__anext__(), record.timeout)
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                if event is not None:
+                    instrumentation.finish(event, e)
+                raise
+            finally:
+                if limited:
+                    release_slots(record, branch_tracker)
+            if event is not None:
+                instrumentation.finish(event)
+
+            output_data, next_records = route_output(record, raw_node_output)
+            if not next_records:
+                branch_tracker.add_output(record.name, output_data)
+                continue
+
+            next_input_data = convert_output_to_input(output_data)
+            for next_record in next_records:
+                await buffer.acquire()
+                task = await start_branch(
+                    next_record, branch_tracker, next_input_data,
+                    event.span if event is not None else None, record)
+                if task is None:
+                    buffer.release()
+                else:
+                    task.add_done_callback(lambda _: buffer.release())
     except Exception as e:
-        # Any exception skips everything below, so it effectively kills the
-        # branch.  We can't make any assumptions, so we can't handle the
-        # exception, except to keep track of the branch terminating.
-        branch_tracker.set_last_node_return_value(e)
-        branch_tracker.remove_branch()
-        raise
-
-    # Process the return value.
-    # The Matcher node requires the return value to have a certain form, and
-    # the value used for branch matching should not be passed to the next node.
-    output_data = node.get_output_data(raw_node_output)
-    next_nodes = node.get_next_node(raw_node_output)
-
-    if not next_nodes:
-        # With no following node, this branch ends, so remove it from the
-        # tracker to ensure the graph coroutine returns when all work is done.
-        branch_tracker.set_last_node_return_value(output_data)
+        branch_tracker.set_exception(e)
         branch_tracker.remove_branch()
         return
+    finally:
+        if items is not None:
+            await items.aclose()
+        if lease:
+            dependency_cache.release(lease)
 
-    # Prepare positional input arguments for the trailing node(s).
-    input_data = convert_output_to_input(output_data)
-
-    # The first node kicked off is a continuation of this branch.
-    # The rest, if any, are new branches that need to be tracked.
-    add_branch = False
-    for next_node in next_nodes:
-        loop.create_task(execute_node(next_node, branch_tracker, input_data))
-        if add_branch:
-            branch_tracker.add_branch()
-        add_branch = True
+    branch_tracker.remove_branch()
 
 
 async def start_graph(
-        first_node: Node,
+        first_record: NodeRecord,
         cache_usage: CacheUsage,
-        input_data: Tuple = ()
+        input_data: Tuple = (),
+        executor: ExecutorSpec = None,
+        max_in_flight: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        collect: bool = False,
+        error_policy: ErrorPolicy = ErrorPolicy.FINISH,
+        deadline: Optional[float] = None
 ) -> Any:
     loop = asyncio.get_running_loop()
-    branch_tracker = BranchTracker()
-
-    if cache_usage == CacheUsage.INDEPENDENT:
-        set_new_context_dependency_cache()
 
-    loop.create_task(execute_node(first_node, branch_tracker, input_data))
-    return await branch_tracker.wait()
+    if executor is not None:
+        executor_ctx_var.set(executor)
+    if instrumentation is not None:
+        instrumentation_ctx_var.set(instrumentation)
+    else:
+        instrumentation = instrumentation_ctx_var.get(None)
+    # A subgraph can't outlive the deadline of the run it was started from.
+    deadline_time = deadline_ctx_var.get(None)
+    if deadline is not None and (deadline_time is None
+                                 or loop.time() + deadline < deadline_time):
+        deadline_time = loop.time() + deadline
+        deadline_ctx_var.set(deadline_time)
+
+    branch_tracker = BranchTracker(max_in_flight=max_in_flight,
+                                   instrumentation=instrumentation,
+                                   collect=collect,
+                                   error_policy=error_policy)
+
+    # A run that creates the dependency cache, rather than sharing the one of
+    # the graph it was started from, tears it down when it finishes.
+    owns_dependency_cache = (cache_usage == CacheUsage.INDEPENDENT
+                             or dependency_cache_ctx_var.get(None) is None)
+    if owns_dependency_cache:
+        dependency_cache = set_new_context_dependency_cache()
+
+    expiry = (loop.call_at(deadline_time, branch_tracker.expire)
+              if deadline_time is not None else None)
+    try:
+        branch_tracker.track(loop.create_task(
+            execute_node(first_record, branch_tracker, input_data)))
+        return await branch_tracker.wait()
+    finally:
+        if expiry is not None:
+            expiry.cancel()
+        # Branches still executing once the run failed fast, expired, or was
+        # itself cancelled, are cancelled, before the dependencies they hold
+        # are torn down.
+        await branch_tracker.cancel()
+        if owns_dependency_cache:
+            await dependency_cache.close()
+
+
+async def get_start_record(
+        graph: Union[str, Graph],
+        start_node_name: str
+) -> NodeRecord:
+    if isinstance(graph, str):
+        path = graph
+        graph: Graph = get_cached_graph(path)
+        if graph is None:
+            loop = asyncio.get_running_loop()
+            graph = await loop.run_in_executor(None, load_graph, path)
+    return get_execution_plan(graph).nodes[start_node_name]
 
 
 async def run_graph(
@@ -121,51 +532,265 @@ async def run_graph(
         start_node_name: str,
         cache_usage: CacheUsage = CacheUsage.SHARED,
         *,
-        start_node_args: Tuple = ()
+        start_node_args: Tuple = (),
+        executor: ExecutorSpec = None,
+        max_in_flight: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        collect: bool = False,
+        error_policy: ErrorPolicy = ErrorPolicy.FINISH,
+        deadline: Optional[float] = None
 ) -> Any:
     """
     Execute the graph defined in the file starting at the specified node.
     Safe for running subgraphs.
 
     :param graph: path from the current working directory to a graph file
-        (currently only the Graphviz format is supported) OR a native graph
-        class object
+        (in the Graphviz format, or compiled with save_compiled_graph()) OR a
+        native graph class object.  A graph file is only parsed the first time
+        it is run (see set_hot_reload() and invalidate_graphs()).
     :param start_node_name: name of the node (NOT type) in the graph to start
     :param cache_usage: if run from within another graph, whether to share the
-        dependency cache with the parent graph or use its own
+        dependency cache with the parent graph or use its own.  A dependency
+        cache that is not shared with a parent graph is torn down when the run
+        finishes (see the dependency decorator).
     :param start_node_args: optional tuple of input arguments for the first node
-    :return: return value of the last node executed in the graph
+    :param executor: optional default executor (or name of a registered
+        executor) for the blocking node types of the graph that don't specify
+        their own.  Subgraphs run from within the graph inherit it unless they
+        are given their own.  If not given, the default executor of the parent
+        graph, if any, or of the event loop is used.
+    :param max_in_flight: optional maximum number of nodes of the graph
+        executing at once.  A node forking new branches waits while the limit
+        is reached.  The limit does not extend to subgraphs run from within the
+        graph.
+    :param instrumentation: optional instrumentation timing every node
+        executed (see Instrumentation), to find where the time of the run
+        goes.  Subgraphs run from within the graph inherit it unless they are
+        given their own.
+    :param collect: whether to return the output of every node ending a
+        branch, rather than that of the last one.  The output of a node is
+        its return value, without the match value for a matcher node.  If a
+        node raises an exception, the first one raised is raised once every
+        branch ended.
+    :param error_policy: what the run does when a node raises an exception
+        (see ErrorPolicy): let the other branches finish (the default),
+        cancel them and raise the exception at once, or let them finish and
+        raise an ExceptionGroup of every exception raised.  Subgraphs run from
+        within the graph have their own error policy, but are cancelled along
+        with the branch running them.  Exceptions raised by nodes that the
+        run doesn't raise are passed to the exception handler of the event
+        loop, which logs them by default.
+    :param deadline: optional number of seconds the run may take, after
+        which the nodes still executing are cancelled, and it raises
+        DeadlineExceeded.  Subgraphs run from within the graph are bound by the
+        deadline, and can only be given an earlier one.  Nodes can also be
+        given a timeout each (see nodetype()).
+    :return: return value of the last node executed in the graph, or if
+        collected, the outputs of the nodes ending branches, as a dictionary
+        of the list of outputs of each of those nodes, by node name, in the
+        order they ended
     """
     loop = asyncio.get_running_loop()
-    if isinstance(graph, str):
-        graph: Graph = await loop.run_in_executor(None, parse, graph)
-    start_node: Node = graph.nodes[start_node_name]
+    start_record = await get_start_record(graph, start_node_name)
+
+    return await loop.create_task(start_graph(start_record, cache_usage,
+                                              start_node_args, executor,
+                                              max_in_flight, instrumentation,
+                                              collect, error_policy,
+                                              deadline))
+
+
+@dataclass
+class RunResult:
+    """
+    Outcome of a run of a graph served by serve(): the return value of the
+    last node executed, or the outputs of the nodes ending branches if
+    collected, or the exception the run raised.
+    """
+    start_node_args: Tuple
+    value: Any = None
+    exception: Optional[Exception] = None
+
 
-    return await loop.create_task(start_graph(start_node, cache_usage,
-                                              start_node_args))
+# Input pulled from a served source that has been exhausted.
+_NO_MORE_INPUTS = object()
+
+
+async def next_input(inputs: Union[AsyncIterator, asyncio.Queue]):
+    if isinstance(inputs, asyncio.Queue):
+        return await inputs.get()
+    try:
+        return await inputs.__anext__()
+    except StopAsyncIteration:
+        return _NO_MORE_INPUTS
+
+
+async def serve(
+        graph: Union[str, Graph],
+        start_node_name: str,
+        source: Union[AsyncIterable, asyncio.Queue],
+        *,
+        concurrency: int = 1,
+        cache_usage: CacheUsage = CacheUsage.SHARED,
+        executor: ExecutorSpec = None,
+        max_in_flight: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        collect: bool = False,
+        error_policy: ErrorPolicy = ErrorPolicy.FINISH,
+        deadline: Optional[float] = None
+) -> AsyncIterator[RunResult]:
+    """
+    Run the graph once for every input pulled from the source, and produce the
+    result of every run as it completes.
+
+    Up to concurrency runs execute at once, and the next input is only pulled
+    once a run completes while that many are executing.  The runs share the
+    graph, which is parsed and compiled once, and the dependency cache.  Every
+    input is passed to the start node as the output of a previous node would
+    be: a tuple is unpacked into several arguments.  For example:
+
+        async for result in serve('graph.gv', 'start', queue, concurrency=8):
+            if result.exception is not None:
+                log.error('failed on %s', result.start_node_args)
+
+    An exception raised by a run doesn't stop the others, and is produced as
+    its result.  Results are produced in the order the runs complete.  An
+    asynchronous iterable source is served until it is exhausted and every run
+    completed.  A queue is served until the iteration over the results
+    stops, at which point any runs still executing are cancelled.  Every
+    input taken from a queue is marked as done (see asyncio.Queue.task_done())
+    once its run completed or was cancelled, so a producer can wait for its
+    inputs to be processed with join().
+
+    :param graph: path from the current working directory to a graph file OR
+        a native graph class object (see run_graph())
+    :param start_node_name: name of the node (NOT type) in the graph to start
+    :param source: asynchronous iterable or queue of the inputs
+    :param concurrency: maximum number of runs executing at once
+    :param cache_usage: if served from within another graph, whether to share
+        the dependency cache with the parent graph or use a cache of its own.
+        A dependency cache of its own is torn down when serving stops.
+    :param executor: optional default executor of the runs (see run_graph())
+    :param max_in_flight: optional maximum number of nodes of each run
+        executing at once (see run_graph())
+    :param instrumentation: optional instrumentation of the runs (see
+        run_graph()), gathering the timings of all of them
+    :param collect: whether the value of a result is the outputs of the nodes
+        ending branches (see run_graph())
+    :param error_policy: what each run does when a node raises an exception
+        (see run_graph())
+    :param deadline: optional number of seconds each run may take from the
+        moment it starts (see run_graph())
+    :return: asynchronous iterator over the results of the runs
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    loop = asyncio.get_running_loop()
+    start_record = await get_start_record(graph, start_node_name)
+    queued = isinstance(source, asyncio.Queue)
+    inputs = source if queued else source.__aiter__()
+
+    # The runs execute in a context of their own, holding the dependency
+    # cache they share, rather than in the context of the caller.
+    context = contextvars.copy_context()
+    owns_dependency_cache = (cache_usage == CacheUsage.INDEPENDENT
+                             or dependency_cache_ctx_var.get(None) is None)
+    if owns_dependency_cache:
+        dependency_cache = context.run(set_new_context_dependency_cache)
+
+    runs: Dict[asyncio.Task, Tuple] = {}
+    fetch: Optional[asyncio.Task] = None
+    exhausted = False
+    try:
+        while runs or not exhausted:
+            if fetch is None and not exhausted and len(runs) < concurrency:
+                fetch = loop.create_task(next_input(inputs))
+            pending = set(runs)
+            if fetch is not None:
+                pending.add(fetch)
+            done, _ = await asyncio.wait(pending,
+                                         return_when=asyncio.FIRST_COMPLETED)
+
+            if fetch in done:
+                item = fetch.result()
+                fetch = None
+                if item is _NO_MORE_INPUTS:
+                    exhausted = True
+                else:
+                    start_node_args = convert_output_to_input(item)
+                    run = context.run(loop.create_task, start_graph(
+                        start_record, CacheUsage.SHARED, start_node_args,
+                        executor, max_in_flight, instrumentation, collect,
+                        error_policy, deadline))
+                    runs[run] = start_node_args
+
+            for run in done:
+                if run not in runs:
+                    continue
+                start_node_args = runs.pop(run)
+                if queued:
+                    inputs.task_done()
+                exception = run.exception()
+                if exception is None:
+                    yield RunResult(start_node_args, run.result())
+                else:
+                    yield RunResult(start_node_args, exception=exception)
+    finally:
+        if fetch is not None:
+            fetch.cancel()
+            if queued and fetch.done() and not fetch.cancelled():
+                # An input taken from the queue that will never be run.
+                inputs.task_done()
+        for run in runs:
+            run.cancel()
+            if queued:
+                inputs.task_done()
+        if runs:
+            await asyncio.wait(runs)
+        if owns_dependency_cache:
+            await dependency_cache.close()
 
 
 def run(
         graph: Union[str, Graph],
         start_node_name: str,
         cache_usage: CacheUsage = CacheUsage.SHARED,
-        start_node_args: Tuple = ()
+        start_node_args: Tuple = (),
+        *,
+        executor: ExecutorSpec = None,
+        max_in_flight: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        error_policy: ErrorPolicy = ErrorPolicy.FINISH,
+        deadline: Optional[float] = None
 ) -> None:
     """
     Execute the graph defined in the file starting at the specified node.
     NOT SAFE for running subgraphs.
 
     :param graph: path from the current working directory to a graph file
-        (currently only the Graphviz format is supported) OR a native graph
-        class object
+        (in the Graphviz format, or compiled with save_compiled_graph()) OR a
+        native graph class object
     :param start_node_name: name of the node (NOT type) in the graph to start
     :param cache_usage: if run from within another graph, whether to share the
         dependency cache with the parent graph or use its own
     :param start_node_args: optional tuple of input arguments for the first node
+    :param executor: optional default executor (or name of a registered
+        executor) for the blocking node types of the graph that don't specify
+        their own
+    :param max_in_flight: optional maximum number of nodes of the graph
+        executing at once
+    :param instrumentation: optional instrumentation timing every node
+        executed
+    :param error_policy: what the run does when a node raises an exception
+    :param deadline: optional number of seconds the run may take
     :return: None
     """
     try:
         asyncio.run(run_graph(graph, start_node_name, cache_usage,
-                              start_node_args=start_node_args))
+                              start_node_args=start_node_args,
+                              executor=executor, max_in_flight=max_in_flight,
+                              instrumentation=instrumentation,
+                              error_policy=error_policy,
+                              deadline=deadline))
     except KeyboardInterrupt:
         pass
@@ -1,9 +1,15 @@
 from dataclasses import dataclass, field
-from inspect import signature
-from typing import Callable, Dict, List, Tuple, Union
+from inspect import isasyncgenfunction, isgeneratorfunction, signature
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional, Tuple,
+                    Union)
 
-from .asyncutils import BlockingBehavior, ensure_awaitable
-from .controlflow import BranchingStrategy
+from .asyncutils import (Batcher, BlockingBehavior, ConcurrencyLimit,
+                         ExecutorSpec, ensure_async_iterator, make_dispatcher)
+from .controlflow import BranchingStrategy, RetryPolicy
+
+# Number of items of a streaming node type that may be waiting on or moving
+# through the rest of the graph before the node stops producing more.
+DEFAULT_STREAM_BUFFER_SIZE = 16
 
 
 @dataclass
@@ -18,15 +24,65 @@ class NodeType:
     blocking_behavior: BlockingBehavior
     input_datatype: Tuple
     output_datatype: Tuple
+    # Names of the keyword-only arguments of the callable, read from its
+    # signature once rather than on every execution of the node.
+    dependencies: Tuple[str, ...] = field(init=False, repr=False)
+    # Executor (or name of a registered executor) for blocking node types.
+    # If None, the default executor of the graph run is used.
+    executor: ExecutorSpec = None
+    # Maximum number of nodes of this type executing at once, if limited.
+    max_concurrency: Optional[int] = None
+    concurrency_limit: Optional[ConcurrencyLimit] = field(
+        init=False, repr=False, compare=False)
+    # Maximum number of items of a streaming node type in the rest of the
+    # graph at once.
+    buffer_size: Optional[int] = None
+    # Whether the callable is a generator function, every item of which is
+    # passed on to the following nodes as it is produced.
+    streaming: bool = field(init=False, repr=False)
+    # Maximum number of concurrent inputs passed to the callable at once as a
+    # list, and how long to wait for a batch to fill up, if batched.
+    batch_size: Optional[int] = None
+    batch_timeout: Optional[float] = None
+    # Whether nodes of this type wait for an input from every node preceding
+    # them, and are called with the list of those inputs.
+    join: bool = False
+    # How long in seconds a node of this type may take, if limited.
+    timeout: Optional[float] = None
+    # How nodes of this type retry their call when it raises, if they do.
+    retry: Optional[RetryPolicy] = None
+    batcher: Optional[Batcher] = field(init=False, repr=False, compare=False)
+    # Coroutine function calling the callable the way its blocking behavior
+    # requires, chosen once rather than on every call.
+    dispatch: Callable = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        sig = signature(self.callable)
+        self.dependencies = tuple(name for name, param in sig.parameters.items()
+                                  if param.kind == param.KEYWORD_ONLY)
+        self.concurrency_limit = (ConcurrencyLimit(self.max_concurrency)
+                                  if self.max_concurrency is not None else None)
+        self.streaming = (isgeneratorfunction(self.callable)
+                          or isasyncgenfunction(self.callable))
+        if self.streaming and self.buffer_size is None:
+            self.buffer_size = DEFAULT_STREAM_BUFFER_SIZE
+        self.dispatch = make_dispatcher(self.callable, self.blocking_behavior,
+                                        self.executor)
+        self.batcher = (Batcher(self.dispatch, self.batch_size,
+                                self.batch_timeout)
+                        if self.batch_size is not None else None)
 
     def __call__(self, *args, **kwargs):
-        return ensure_awaitable(self.callable, self.blocking_behavior,
-                                *args, **kwargs)
+        if self.batcher is not None:
+            return self.batcher(*args, **kwargs)
+        return self.dispatch(*args, **kwargs)
 
-    def get_dependencies(self) -> List[str]:
-        sig = signature(self.callable)
-        return [name for name, param in sig.parameters.items()
-                if param.kind == param.KEYWORD_ONLY]
+    def stream(self, *args, **kwargs) -> AsyncIterator:
+        return ensure_async_iterator(self.callable, self.blocking_behavior,
+                                     self.executor, *args, **kwargs)
+
+    def get_dependencies(self) -> Tuple[str, ...]:
+        return self.dependencies
 
 
 @dataclass
@@ -64,7 +120,7 @@ class Node:
     def get_next_node(self, callable_output):
         return self.edges
 
-    def get_dependencies(self) -> List[str]:
+    def get_dependencies(self) -> Tuple[str, ...]:
         return self.nodetype.get_dependencies()
 
 
@@ -97,3 +153,5 @@ class MatcherNode(Node):
 @dataclass
 class Graph:
     nodes: Dict[str, Node]
+    # Execution plan compiled from the nodes on first execution of the graph.
+    _plan: Any = field(default=None, init=False, repr=False, compare=False)
@@ -0,0 +1,282 @@
+import asyncio
+import contextvars
+import itertools
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+__all__ = ['ExecutionStats', 'Instrumentation', 'NodeEvent', 'NodeStats']
+
+# Instrumentation of the graph run, inherited by the subgraphs it runs.
+instrumentation_ctx_var = contextvars.ContextVar("instrumentation")
+# Event of the node being executed, in which a blocking node type called in an
+# executor records when it started running.
+node_event_ctx_var = contextvars.ContextVar("node_event")
+
+# Upper bounds, in seconds, of the buckets of the latency histograms: powers of
+# two from a microsecond to about a minute.  The last bucket is unbounded.
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(2 ** exponent / 1e6
+                                           for exponent in range(27))
+
+NodeHook = Callable[['NodeEvent'], None]
+
+# Identifiers of the runs, branches and node executions of instrumented runs,
+# unique within the process.
+_ids = itertools.count(1)
+
+
+def new_id() -> int:
+    return next(_ids)
+
+
+class NodeEvent:
+    """
+    A single execution of a node, its place in the run and its timings, in
+    seconds of the performance counter (see time.perf_counter()).
+
+    span: Identifier of this execution.
+    run: Identifier of the graph run.
+    branch: Identifier of the branch of the run executing the node.
+    parent: Identifier of the execution that led to this one: the previous
+        node of the branch, the node that forked the branch, or for the start
+        node of a subgraph, the node that ran it.  None for the start node of
+        a run.
+    start: When the node was reached.
+    admitted: When the node obtained the slots of its concurrency limits.
+    resolved: When the values of its dependencies were resolved.
+    running: When a blocking node type started running in its executor, or
+        None if it wasn't called in one.
+    end: When the node returned or raised.
+    exception: Exception raised by the node, if any.
+    attempts: Number of times the node was called, more than one if it
+        retried (see RetryPolicy).  The calls before the last one, and the
+        delays before retrying, count as time resolving the dependencies.
+    """
+    __slots__ = ('node', 'typename', 'span', 'run', 'branch', 'parent',
+                 'start', 'admitted', 'resolved', 'running', 'end',
+                 'exception', 'attempts')
+
+    def __init__(self, node: str, typename: str, run: Optional[int] = None,
+                 branch: Optional[int] = None, parent: Optional[int] = None):
+        self.node = node
+        self.typename = typename
+        self.span = new_id()
+        self.run = run
+        self.branch = branch
+        self.parent = parent
+        self.start = self.admitted = self.resolved = perf_counter()
+        self.running: Optional[float] = None
+        self.end: Optional[float] = None
+        self.exception: Optional[BaseException] = None
+        self.attempts = 1
+
+    def __repr__(self):
+        return (f'NodeEvent({self.node!r}, {self.typename!r}, '
+                f'latency={self.latency})')
+
+    @property
+    def latency(self) -> float:
+        """Time from reaching the node until it returned or raised."""
+        return self.end - self.start
+
+    @property
+    def queued(self) -> float:
+        """Time waiting for the slots of the concurrency limits."""
+        return self.admitted - self.start
+
+    @property
+    def resolving(self) -> float:
+        """Time resolving the values of the dependencies."""
+        return self.resolved - self.admitted
+
+    @property
+    def executor_wait(self) -> float:
+        """Time queued in the executor before running, if called in one."""
+        return self.running - self.resolved if self.running is not None else 0.
+
+    @property
+    def executing(self) -> float:
+        """Time running, excluding the time queued in the executor."""
+        return self.end - (self.running if self.running is not None
+                           else self.resolved)
+
+
+class NodeStats:
+    """
+    Statistics of the executions of a node, or of all nodes of a type.
+    Durations are totals in seconds, see NodeEvent for their meaning.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.latency = 0.
+        self.min_latency = float('inf')
+        self.max_latency = 0.
+        self.queued = 0.
+        self.resolving = 0.
+        self.executor_wait = 0.
+        self.executing = 0.
+        # Numbers of latencies up to each bound of LATENCY_BUCKETS, plus the
+        # number of larger latencies.
+        self.histogram: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        # Numbers of exceptions raised, by name of their type.
+        self.exceptions: Counter = Counter()
+        # Number of calls retried.
+        self.retries = 0
+
+    def __repr__(self):
+        return (f'NodeStats(calls={self.calls}, '
+                f'mean_latency={self.mean_latency})')
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.calls if self.calls else 0.
+
+    def record(self, event: NodeEvent) -> None:
+        latency = event.latency
+        self.calls += 1
+        self.latency += latency
+        self.min_latency = min(self.min_latency, latency)
+        self.max_latency = max(self.max_latency, latency)
+        self.queued += event.queued
+        self.resolving += event.resolving
+        self.executor_wait += event.executor_wait
+        self.executing += event.executing
+        self.histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        if event.exception is not None:
+            self.exceptions[type(event.exception).__name__] += 1
+        self.retries += event.attempts - 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Estimate a latency percentile from the histogram, as the upper bound
+        of the bucket it falls in.
+
+        :param fraction: percentile as a fraction, such as 0.99
+        :return: latency in seconds, infinite if beyond the last bound
+        """
+        rank = fraction * self.calls
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, self.histogram):
+            count += bucket
+            if count >= rank:
+                return bound
+        return float('inf')
+
+    def as_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'latency': self.latency,
+            'min_latency': self.min_latency if self.calls else 0.,
+            'max_latency': self.max_latency,
+            'mean_latency': self.mean_latency,
+            'queued': self.queued,
+            'resolving': self.resolving,
+            'executor_wait': self.executor_wait,
+            'executing': self.executing,
+            'histogram': list(self.histogram),
+            'exceptions': dict(self.exceptions),
+            'retries': self.retries,
+        }
+
+
+class ExecutionStats:
+    """
+    In-process statistics of node executions, by node name and by node type.
+    """
+    def __init__(self):
+        self.nodes: Dict[str, NodeStats] = {}
+        self.nodetypes: Dict[str, NodeStats] = {}
+
+    def __call__(self, event: NodeEvent) -> None:
+        try:
+            node_stats = self.nodes[event.node]
+        except KeyError:
+            node_stats = self.nodes[event.node] = NodeStats()
+        try:
+            nodetype_stats = self.nodetypes[event.typename]
+        except KeyError:
+            nodetype_stats = self.nodetypes[event.typename] = NodeStats()
+        node_stats.record(event)
+        nodetype_stats.record(event)
+
+    def slowest(self, count: int = 10) -> List[Tuple[str, NodeStats]]:
+        """
+        Get the nodes that took the most time in total, slowest first.
+        """
+        return sorted(self.nodes.items(), key=lambda item: -item[1].latency)[
+            :count]
+
+    def as_dict(self) -> dict:
+        return {
+            'nodes': {name: stats.as_dict()
+                      for name, stats in self.nodes.items()},
+            'nodetypes': {name: stats.as_dict()
+                          for name, stats in self.nodetypes.items()},
+        }
+
+
+class Instrumentation:
+    """
+    Instrumentation of graph runs: every execution of a node is timed, and the
+    resulting NodeEvent is passed to each hook, such as an exporter.  The
+    statistics of the executions are gathered in stats.
+
+    A graph run is instrumented when given an instrumentation (see
+    run_graph()), as are the subgraphs it runs.  Uninstrumented runs skip
+    all of this.  Hooks are called on the event loop as each node finishes, so
+    they must be quick.  An exception raised by a hook doesn't affect the run:
+    it is passed to the exception handler of the event loop.
+    """
+    def __init__(self, *hooks: NodeHook, stats: bool = True):
+        """
+        :param hooks: callables called with the event of every node execution
+        :param stats: whether to gather statistics in stats
+        """
+        self.stats: Optional[ExecutionStats] = (ExecutionStats() if stats
+                                                else None)
+        self.hooks: List[NodeHook] = ([self.stats] if stats else []) + list(
+            hooks)
+
+    def add_hook(self, hook: NodeHook) -> None:
+        self.hooks.append(hook)
+
+    def finish(self, event: NodeEvent,
+               exception: Optional[BaseException] = None) -> None:
+        event.end = perf_counter()
+        event.exception = exception
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                asyncio.get_running_loop().call_exception_handler({
+                    'message': f'instrumentation hook {hook!r} failed',
+                    'exception': e,
+                })
+
+
+def mark_running(
+        executor: Optional[Executor],
+        function: Callable
+) -> Callable:
+    """
+    Wrap a function about to be called in an executor by an instrumented node
+    so it records in the event of the node when it started running.  Functions
+    sent to another process can't record anything, so they are left as is, as
+    are those called outside of instrumented nodes.
+
+    :param executor: executor the function is called in, None for the default
+        executor of the event loop
+    :param function: function to be called
+    :return: function to call in the executor
+    """
+    event = node_event_ctx_var.get(None)
+    if event is None or not (executor is None
+                             or isinstance(executor, ThreadPoolExecutor)):
+        return function
+
+    def run(*args):
+        event.running = perf_counter()
+        return function(*args)
+    return run
@@ -1,3 +1,6 @@
+from .cache import *
+from .compiled import *
+from .graphviz import *
 from .native import *
 
-__all__ = native.__all__
+__all__ = cache.__all__ + compiled.__all__ + graphviz.__all__ + native.__all__
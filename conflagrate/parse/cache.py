@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..graph import Graph
+from .compiled import is_compiled_graph, loads
+from .graphviz import parse_dot
+
+__all__ = ['invalidate_graphs', 'set_hot_reload']
+
+# Modification time and size of a graph file, checked before its contents.
+FileStamp = Tuple[int, int]
+
+
+@dataclass
+class CachedGraph:
+    stamp: FileStamp
+    digest: bytes
+    graph: Graph
+
+
+# Graphs parsed from files, keyed by the absolute paths of the files.
+_graphs: Dict[str, CachedGraph] = {}
+_graphs_lock = threading.Lock()
+# Whether cached graphs are checked for changes to their files before use.
+_hot_reload = False
+
+
+def set_hot_reload(enabled: bool) -> None:
+    """
+    Enable or disable hot reloading of graph files.
+
+    Graphs run from a file are parsed once and cached for the lifetime of the
+    process, so running the same graph again costs no parsing.  With hot
+    reloading enabled, the modification time and size of the file are checked
+    every time the graph is run, and the graph is parsed again if the contents
+    of the file changed.  Runs already underway finish with the graph they
+    started with.
+
+    :param enabled: whether to hot reload graph files
+    """
+    global _hot_reload
+    _hot_reload = enabled
+
+
+def invalidate_graphs(path: Optional[str] = None) -> None:
+    """
+    Drop parsed graphs from the cache, so they are parsed again from their
+    files the next time they are run.
+
+    :param path: path of the graph file to drop.  If not given, every graph is
+        dropped.
+    """
+    with _graphs_lock:
+        if path is None:
+            _graphs.clear()
+        else:
+            _graphs.pop(os.path.abspath(path), None)
+
+
+def get_cached_graph(path: str) -> Optional[Graph]:
+    """
+    Get the cached graph parsed from the file without touching the file
+    system, if it can be used as is.  Never the case with hot reloading, since
+    the file has to be checked for changes (see load_graph()).
+    """
+    if _hot_reload:
+        return None
+    try:
+        return _graphs[os.path.abspath(path)].graph
+    except KeyError:
+        return None
+
+
+def get_file_stamp(path: str) -> FileStamp:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_graph(path: str) -> Graph:
+    """
+    Get the graph parsed from the file, parsing it only if it isn't cached, or
+    if hot reloading is enabled and the contents of the file changed.  Blocks
+    on the file system.
+
+    :param path: path of the graph file, in the Graphviz format or compiled
+        (see save_compiled_graph())
+    :return: graph parsed from the file
+    """
+    key = os.path.abspath(path)
+    cached = _graphs.get(key)
+    if cached is not None and not _hot_reload:
+        return cached.graph
+
+    stamp = get_file_stamp(key)
+    if cached is not None and cached.stamp == stamp:
+        return cached.graph
+
+    with open(key, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).digest()
+    if cached is not None and cached.digest == digest:
+        # Touched, but not changed.
+        cached.stamp = stamp
+        return cached.graph
+
+    graph = (loads(data) if is_compiled_graph(data)
+             else parse_dot(data.decode()))
+    with _graphs_lock:
+        _graphs[key] = CachedGraph(stamp, digest, graph)
+    return graph
@@ -0,0 +1,130 @@
+import marshal
+from typing import Dict, List
+
+from ..graph import Graph, MatcherNode, MatcherNodeType, Node, NodeType
+from ..registration import get_nodetypes
+
+__all__ = ['load_compiled_graph', 'save_compiled_graph']
+
+# Leading bytes of every compiled graph, identifying the file format.
+MAGIC = b'CFGC'
+FORMAT_VERSION = 1
+# Version of the marshal format used, fixed so artifacts don't depend on the
+# Python version that wrote them.
+MARSHAL_VERSION = 4
+
+
+def is_compiled_graph(data: bytes) -> bool:
+    return data.startswith(MAGIC)
+
+
+def dumps(graph: Graph) -> bytes:
+    """
+    Serialize the topology of a graph.
+
+    Nodes are numbered in order, and referenced by their number.  The graph is
+    stored as parallel arrays: the names of the nodes, the indices of their
+    type names in a table of type names, whether they are matcher nodes, and
+    their edges, as the numbers of the following nodes, or as pairs of a match
+    value and a node number for matcher nodes.
+    """
+    index: Dict[str, int] = {name: i for i, name in enumerate(graph.nodes)}
+    typenames: Dict[str, int] = {}
+    node_typenames: List[int] = []
+    matchers = bytearray()
+    edges: List[tuple] = []
+    for node in graph.nodes.values():
+        node_typenames.append(
+            typenames.setdefault(node.typename, len(typenames)))
+        if isinstance(node, MatcherNode):
+            matchers.append(1)
+            edges.append(tuple((value, index[destination.name])
+                               for value, destination in node.edges.items()))
+        else:
+            matchers.append(0)
+            edges.append(tuple(index[destination.name]
+                               for destination in node.edges))
+
+    payload = (FORMAT_VERSION, tuple(index), tuple(typenames),
+               tuple(node_typenames), bytes(matchers), tuple(edges))
+    return MAGIC + marshal.dumps(payload, MARSHAL_VERSION)
+
+
+def loads(data: bytes) -> Graph:
+    """
+    Load a graph serialized by dumps(), verifying that its node types are
+    registered as node types of the same kind.
+
+    :raises ValueError: if the data isn't a compiled graph of this version, or
+        a node type is not registered or is of another kind
+    """
+    if not is_compiled_graph(data):
+        raise ValueError('not a compiled graph')
+    try:
+        (version, names, typenames, node_typenames, matchers,
+         edges) = marshal.loads(data[len(MAGIC):])
+    except (EOFError, TypeError, ValueError):
+        raise ValueError('corrupted compiled graph') from None
+    if version != FORMAT_VERSION:
+        raise ValueError(f'unsupported compiled graph format version '
+                         f'{version}')
+
+    registered = get_nodetypes()
+    nodetypes: List[NodeType] = []
+    for typename in typenames:
+        try:
+            nodetypes.append(registered[typename])
+        except KeyError:
+            raise ValueError(f'no nodetype associated with graphed node type '
+                             f'"{typename}"') from None
+
+    nodes: List[Node] = []
+    for name, typename_index, matcher in zip(names, node_typenames, matchers):
+        typename = typenames[typename_index]
+        nodetype = nodetypes[typename_index]
+        if isinstance(nodetype, MatcherNodeType) != bool(matcher):
+            raise ValueError(f'node type "{typename}" of node "{name}" is not '
+                             f'of the kind it was compiled with')
+        node_class = MatcherNode if matcher else Node
+        nodes.append(node_class(name, typename, nodetype))
+
+    for node, node_edges in zip(nodes, edges):
+        if isinstance(node, MatcherNode):
+            node.edges = {value: nodes[destination]
+                          for value, destination in node_edges}
+        else:
+            node.edges = [nodes[destination] for destination in node_edges]
+    return Graph({node.name: node for node in nodes})
+
+
+def save_compiled_graph(graph: Graph, filename: str) -> None:
+    """
+    Save a graph parsed from a file, or an instance of a native graph class,
+    as a compiled graph.  Running a compiled graph skips parsing altogether:
+    run_graph() accepts the path of a compiled graph like that of a graph
+    file.
+
+    Only the topology of the graph is saved: the names of its nodes, the names
+    of their types and their edges.  The node types are looked up when the
+    compiled graph is loaded, and must be registered by then.
+
+    :param graph: graph to save
+    :param filename: path of the compiled graph file, conventionally with the
+        ".cfgc" extension
+    """
+    data = dumps(graph)
+    with open(filename, 'wb') as f:
+        f.write(data)
+
+
+def load_compiled_graph(filename: str) -> Graph:
+    """
+    Load a graph saved with save_compiled_graph().
+
+    :param filename: path of the compiled graph file
+    :return: graph with the registered node types of its nodes
+    :raises ValueError: if the file isn't a compiled graph, or a node type
+        is not registered or is no longer of the same kind (matcher or not)
+    """
+    with open(filename, 'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,225 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Pattern, Tuple, Type, Union
+
+from ..controlflow import BranchingStrategy
+from ..graph import Graph, MatcherNode, MatcherNodeType, Node, NodeType
+from ..registration import get_nodetypes
+
+MATCH_VALUE_ATTRIBUTE = 'value'
+NODE_TYPE_ATTRIBUTE = 'type'
+
+_nodetype_to_node_type: Dict[Type[NodeType], Type[Node]] = {
+    NodeType: Node,
+    MatcherNodeType: MatcherNode
+}
+
+# Tokens of the subset of the DOT language supported.  Anything else, such as
+# subgraphs, ports or HTML strings, is a syntax error.
+_TOKENS = r'''
+      (?P<space>\s+|//[^\n]*|/\*.*?\*/|^[ \t]*\#[^\n]*)
+    | (?P<id>[A-Za-z_\x80-\U0010ffff][\w\x80-\U0010ffff]*
+        |-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<edge>->)
+    | (?P<punctuation>[{}\[\];,=])
+'''
+
+_KEYWORDS = frozenset(('strict', 'graph', 'digraph', 'node', 'edge',
+                       'subgraph'))
+
+Attributes = Dict[str, str]
+Token = Tuple[str, str]
+
+
+class DotSyntaxError(ValueError):
+    """
+    The graph description is not valid DOT, or uses a part of the language not
+    supported by the DOT parser of conflagrate.
+    """
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_token_pattern() -> Pattern:
+    # Compiled on first use rather than on import, since it takes a while.
+    return re.compile(_TOKENS, re.VERBOSE | re.DOTALL | re.MULTILINE)
+
+
+def tokenize(data: str) -> Iterator[Token]:
+    tokens = get_token_pattern()
+    position = 0
+    end = len(data)
+    while position < end:
+        match = tokens.match(data, position)
+        if match is None:
+            line = data.count('\n', 0, position) + 1
+            raise DotSyntaxError(f'unsupported DOT syntax on line {line}: '
+                                 f'{data[position:position + 20]!r}')
+        position = match.end()
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        text = match.group()
+        if kind == 'id':
+            keyword = text.lower()
+            yield (keyword if keyword in _KEYWORDS else 'id'), text
+        elif kind == 'string':
+            # IDs keep their quotes, as with pydot.
+            yield 'id', text
+        else:
+            yield text, text
+
+
+class DotParser:
+    """
+    Parser of the DOT subset describing conflagrate graphs: a (strict)
+    digraph of node and edge statements with attributes, and default
+    attributes of the nodes and edges following "node [...]" and "edge [...]"
+    statements.
+
+    Only nodes declared with a node statement are nodes of the graph, as with
+    pydot.  Edges of a strict graph are merged.
+    """
+    def __init__(self, data: str):
+        self._tokens: List[Token] = list(tokenize(data))
+        self._position = 0
+        self.strict = False
+        self.nodes: Dict[str, Attributes] = {}
+        self.edges: Dict[Union[Tuple[str, str], int],
+                         Tuple[str, str, Attributes]] = {}
+
+    def parse(self) -> 'DotParser':
+        if self._accept('strict'):
+            self.strict = True
+        if not self._accept('digraph'):
+            raise self._error('expected "digraph"')
+        self._accept('id')
+        self._expect('{')
+        node_defaults: Attributes = {}
+        edge_defaults: Attributes = {}
+        while not self._accept('}'):
+            self._parse_statement(node_defaults, edge_defaults)
+            self._accept(';')
+        if self._position != len(self._tokens):
+            raise self._error('expected the end of the graph')
+        return self
+
+    def _parse_statement(self, node_defaults: Attributes,
+                         edge_defaults: Attributes):
+        if self._accept('node'):
+            node_defaults.update(self._parse_attributes())
+        elif self._accept('edge'):
+            edge_defaults.update(self._parse_attributes())
+        elif self._accept('graph'):
+            self._parse_attributes()
+        else:
+            name = self._expect('id')
+            if self._accept('='):
+                # Graph attribute.
+                self._expect('id')
+            elif self._peek() == '->':
+                self._parse_edges(name, edge_defaults)
+            else:
+                attributes = self.nodes.setdefault(name, dict(node_defaults))
+                attributes.update(self._parse_attributes())
+
+    def _parse_edges(self, source: str, edge_defaults: Attributes):
+        endpoints = [source]
+        while self._accept('->'):
+            endpoints.append(self._expect('id'))
+        attributes = self._parse_attributes()
+        for source, destination in zip(endpoints, endpoints[1:]):
+            key = ((source, destination) if self.strict
+                   else len(self.edges))
+            _, _, edge_attributes = self.edges.setdefault(
+                key, (source, destination, dict(edge_defaults)))
+            edge_attributes.update(attributes)
+
+    def _parse_attributes(self) -> Attributes:
+        attributes = {}
+        while self._accept('['):
+            while not self._accept(']'):
+                name = self._expect('id')
+                self._expect('=')
+                attributes[name] = self._expect('id')
+                if not self._accept(','):
+                    self._accept(';')
+        return attributes
+
+    def _peek(self) -> str:
+        try:
+            return self._tokens[self._position][0]
+        except IndexError:
+            return ''
+
+    def _accept(self, kind: str) -> str:
+        if self._peek() == kind:
+            self._position += 1
+            return self._tokens[self._position - 1][1]
+        return ''
+
+    def _expect(self, kind: str) -> str:
+        text = self._accept(kind)
+        if not text:
+            raise self._error(f'expected {kind!r}')
+        return text
+
+    def _error(self, message: str) -> DotSyntaxError:
+        try:
+            found = repr(self._tokens[self._position][1])
+        except IndexError:
+            found = 'the end of the data'
+        return DotSyntaxError(f'{message}, found {found}')
+
+
+def create_node(
+        name: str,
+        attributes: Attributes,
+        nodetypes: Dict[str, NodeType]
+) -> Node:
+    typename = attributes[NODE_TYPE_ATTRIBUTE].strip('"')
+    try:
+        nodetype: NodeType = nodetypes[typename]
+    except KeyError:
+        raise ValueError(f'no nodetype associated with graphed node type '
+                         f'"{typename}"')
+    node_class = _nodetype_to_node_type[type(nodetype)]
+    return node_class(name, typename, nodetype,
+                      {} if node_class is MatcherNode else [])
+
+
+def parse_dot(data: str) -> Graph:
+    """
+    Parse a graph described in the DOT language without going through pydot.
+
+    :param data: DOT description of the graph
+    :return: graph of execution nodes
+    :raises DotSyntaxError: if the description is not valid DOT, or uses a
+        part of the language not supported (see DotParser)
+    """
+    parser = DotParser(data).parse()
+    nodetypes = get_nodetypes()
+
+    nodes: Dict[str, Node] = {
+        name: create_node(name, attributes, nodetypes)
+        for name, attributes in parser.nodes.items()
+        if NODE_TYPE_ATTRIBUTE in attributes
+    }
+    for source_name, destination_name, attributes in parser.edges.values():
+        try:
+            source = nodes[source_name]
+        except KeyError:
+            raise ValueError(f'no node definition found for edge source '
+                             f'"{source_name}"')
+        try:
+            destination = nodes[destination_name]
+        except KeyError:
+            raise ValueError(f'no node definition found for edge destination '
+                             f'"{destination_name}"')
+        if source.nodetype.branching_strategy == BranchingStrategy.matcher:
+            source.edges[attributes.get(MATCH_VALUE_ATTRIBUTE)] = destination
+        else:
+            source.edges.append(destination)
+
+    return Graph(nodes)
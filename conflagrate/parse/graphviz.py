@@ -1,20 +1,47 @@
-import pydot
-from typing import Dict, List, Tuple, Type, Union
+from enum import Enum, auto
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
 
 from ..controlflow import BranchingStrategy
-from ..graph import Graph, MatcherNode, MatcherNodeType, Node, NodeType
+from ..graph import Graph, Node, NodeType
 from ..registration import get_nodetypes
+from . import dot
+from .dot import (MATCH_VALUE_ATTRIBUTE, NODE_TYPE_ATTRIBUTE, DotSyntaxError,
+                  _nodetype_to_node_type)
 
-MATCH_VALUE_ATTRIBUTE = 'value'
-NODE_TYPE_ATTRIBUTE = 'type'
+if TYPE_CHECKING:
+    import pydot
 
-_nodetype_to_node_type: Dict[Type[NodeType], Type[Node]] = {
-    NodeType: Node,
-    MatcherNodeType: MatcherNode
-}
+__all__ = ['ParserBackend', 'set_parser_backend']
 
 
-def convert_from_dot_graph(dot_graph: pydot.Graph):
+class ParserBackend(Enum):
+    """
+    Parser of graph files in the DOT language.
+
+    FAST: The DOT parser of conflagrate, which supports the subset of the
+        language used to describe conflagrate graphs and parses large graphs
+        an order of magnitude faster than pydot.  Graphs using other parts of
+        the language are parsed with pydot instead.
+    PYDOT: pydot, which supports the whole language.
+    """
+    FAST = auto()
+    PYDOT = auto()
+
+
+_backend = ParserBackend.FAST
+
+
+def set_parser_backend(backend: ParserBackend) -> None:
+    """
+    Select the parser of graph files.  See the ParserBackend class for details
+    and values.  Graphs already parsed and cached are not parsed again (see
+    invalidate_graphs()).
+    """
+    global _backend
+    _backend = backend
+
+
+def convert_from_dot_graph(dot_graph: 'pydot.Graph'):
     dot_nodes = dot_graph.get_nodes()
     dot_edges = dot_graph.get_edges()
 
@@ -31,7 +58,7 @@ def convert_from_dot_graph(dot_graph: pydot.Graph):
 
 
 def convert_from_dot_node(
-        dot_node: pydot.Node,
+        dot_node: 'pydot.Node',
         nodetypes: Dict[str, NodeType]
 ) -> Node:
     name = dot_node.get_name()
@@ -45,7 +72,7 @@ def convert_from_dot_node(
 
 
 def add_edges_to_nodes(
-        dot_edges: List[pydot.Edge],
+        dot_edges: List['pydot.Edge'],
         nodes: Dict[str, Node]
 ) -> None:
     node_to_edge_dict: Dict[Node, Union[List[Node], Dict[str, Node]]] = {}
@@ -75,7 +102,7 @@ def add_edges_to_nodes(
 
 
 def get_source_destination_nodes_from_edge(
-        dot_edge: pydot.Edge,
+        dot_edge: 'pydot.Edge',
         nodes: Dict[str, Node]
 ) -> Tuple[Node, Node]:
     source_name = dot_edge.get_source()
@@ -95,6 +122,19 @@ def get_source_destination_nodes_from_edge(
     return source, destination
 
 
-def parse(graph_filename):
-    dot_graph = pydot.graph_from_dot_file(graph_filename)[0]
+def parse_dot(data: str) -> Graph:
+    if _backend is ParserBackend.FAST:
+        try:
+            return dot.parse_dot(data)
+        except DotSyntaxError:
+            pass
+    # pydot, and pyparsing with it, is slow to import, so it is only imported
+    # when needed.
+    import pydot
+    dot_graph = pydot.graph_from_dot_data(data)[0]
     return convert_from_dot_graph(dot_graph)
+
+
+def parse(graph_filename):
+    with open(graph_filename) as f:
+        return parse_dot(f.read())
@@ -1,10 +1,13 @@
-import pydot
-from typing import Type
+from typing import TYPE_CHECKING, Dict, Tuple, Type
 
 from ..graph import (Node as ExecutionNode, MatcherNode as ExecutionMatcherNode,
                      Graph as ExecutionGraph)
+from ..plan import ExecutionPlan, compile_graph
 from ..registration import get_nodetypes
 
+if TYPE_CHECKING:
+    import pydot
+
 __all__ = ['Graph', 'Node']
 
 
@@ -90,18 +93,42 @@ def add_edges_to_nodes(nodes, display_nodes):
 
 
 class Graph(ExecutionGraph, metaclass=MetaGraph):
+    """
+    Base class of graphs defined natively in Python.
+
+    The execution nodes and the execution plan of a graph class are built the
+    first time it is instantiated, once its node types are registered, and
+    shared by all of its instances, so instantiating a graph per run costs
+    nothing.  They hold no state of the runs, so any number of runs can use
+    them at once.  They must not be modified.
+    """
     def __init__(self):
+        cls = type(self)
+        # Looked up on the class itself, as subclasses have nodes of their own.
+        try:
+            nodes, plan = cls.__dict__['_topology']
+        except KeyError:
+            nodes, plan = cls._topology = cls._build_topology()
+        super().__init__(nodes)
+        self._plan = plan
+
+    @classmethod
+    def _build_topology(cls) -> Tuple[Dict[str, ExecutionNode], ExecutionPlan]:
         nodetypes = get_nodetypes()
         nodes = {
             name: create_node(name, display_node, nodetypes)
-            for name, display_node in self.display_nodes.items()
+            for name, display_node in cls.display_nodes.items()
             if display_node._typename is not None
         }
-        add_edges_to_nodes(nodes, self.display_nodes)
-        super().__init__(nodes)
+        add_edges_to_nodes(nodes, cls.display_nodes)
+        return nodes, compile_graph(ExecutionGraph(nodes))
 
     @classmethod
-    def _to_dot_object(cls) -> pydot.Dot:
+    def _to_dot_object(cls) -> 'pydot.Dot':
+        # pydot, and pyparsing with it, is slow to import, so it is only
+        # imported when needed.
+        import pydot
+
         graph = pydot.Dot(cls.__name__)
         nodes = {name: cls._display_node_to_pydot_node(name, node)
                  for name, node in cls.display_nodes.items()}
@@ -115,7 +142,9 @@ class Graph(ExecutionGraph, metaclass=MetaGraph):
         return graph
 
     @classmethod
-    def _display_node_to_pydot_node(cls, name, node: Node):
+    def _display_node_to_pydot_node(cls, name, node: Node) -> 'pydot.Node':
+        import pydot
+
         attributes = node._attributes.copy()
         if node._typename is not None:
             attributes['type'] = node._typename
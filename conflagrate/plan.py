@@ -0,0 +1,169 @@
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .asyncutils import ConcurrencyLimit
+from .controlflow import RetryPolicy
+from .dependencies import check_dependencies_registered
+from .graph import Graph, MatcherNode, Node, NodeType
+
+__all__ = ['ExecutionPlan', 'compile_graph']
+
+
+class OutputUnpacking(Enum):
+    """
+    Strategy for splitting the raw return value of a node into the data passed
+    to the following node(s) and the information used to select them.
+
+    PASSTHROUGH: The return value is passed as is to every following node.
+    MATCHER: The first element of the returned collection is the match value
+        used to select the following node.  The remaining elements are passed
+        to it.
+    """
+    PASSTHROUGH = auto()
+    MATCHER = auto()
+
+
+@dataclass(eq=False)
+class NodeRecord:
+    """
+    Precomputed execution information for a single node of a graph.  Everything
+    the engine needs to run the node and move on to the next one is resolved
+    ahead of time, so executing a node only involves attribute, tuple and
+    dictionary lookups.
+    """
+    index: int
+    name: str
+    typename: str
+    # Coroutine function calling the node type, or for a streaming node type,
+    # function returning the asynchronous iterator over its items.
+    call: Callable
+    dependencies: Tuple[str, ...]
+    unpacking: OutputUnpacking
+    concurrency_limit: Optional[ConcurrencyLimit] = None
+    # Whether the node streams its output, and how many of its items may be in
+    # the rest of the graph at once.
+    streaming: bool = False
+    buffer_size: Optional[int] = None
+    # For a join node, the index of the input of each node preceding it, by
+    # the index of that node, otherwise None.
+    join_slots: Optional[Dict[int, int]] = None
+    # How long in seconds the node may take, if limited.
+    timeout: Optional[float] = None
+    # How the node retries its call when it raises, if it does.
+    retry: Optional[RetryPolicy] = None
+    successors: Tuple['NodeRecord', ...] = ()
+    match_table: Dict[Any, Tuple['NodeRecord', ...]] = field(
+        default_factory=dict)
+    match_default: Tuple['NodeRecord', ...] = ()
+
+    def __repr__(self):
+        return f'NodeRecord({self.index}, {self.name!r}, {self.typename!r})'
+
+
+@dataclass
+class ExecutionPlan:
+    """
+    A graph compiled into node records.  Records reference their successors
+    directly, so no name lookups are performed while traversing the graph.
+    """
+    records: Tuple[NodeRecord, ...]
+    nodes: Dict[str, NodeRecord]
+
+
+def unpack_matcher_output(callable_output):
+    output = *callable_output[1:],
+    return output[0] if len(output) == 1 else output
+
+
+def resolve_call(nodetype: NodeType) -> Callable:
+    # Bypass NodeType.__call__, which chooses between these on every call.
+    if nodetype.streaming:
+        return nodetype.stream
+    if nodetype.batcher is not None:
+        return nodetype.batcher
+    return nodetype.dispatch
+
+
+def create_record(index: int, node: Node) -> NodeRecord:
+    unpacking = (OutputUnpacking.MATCHER if isinstance(node, MatcherNode)
+                 else OutputUnpacking.PASSTHROUGH)
+    dependencies = tuple(node.get_dependencies())
+    # Fail when the graph is loaded rather than when the node first runs,
+    # which may be on a rarely used branch long after startup.
+    try:
+        check_dependencies_registered(dependencies)
+    except ValueError as e:
+        raise ValueError(f'cannot resolve dependencies of node "{node.name}": '
+                         f'{e}') from None
+    return NodeRecord(index, node.name, node.typename,
+                      resolve_call(node.nodetype), dependencies, unpacking,
+                      node.nodetype.concurrency_limit,
+                      node.nodetype.streaming, node.nodetype.buffer_size,
+                      {} if node.nodetype.join else None,
+                      node.nodetype.timeout, node.nodetype.retry)
+
+
+def link_record(
+        record: NodeRecord,
+        node: Node,
+        records: Dict[str, NodeRecord]
+) -> None:
+    if record.unpacking is OutputUnpacking.MATCHER:
+        record.match_table = {
+            match_value: (records[destination.name],)
+            for match_value, destination in node.edges.items()
+        }
+        record.match_default = record.match_table.get(None, ())
+    else:
+        record.successors = tuple(records[destination.name]
+                                  for destination in node.edges)
+
+
+def link_joins(records: Tuple[NodeRecord, ...]) -> None:
+    # Inputs of a join node are ordered like the nodes preceding it.
+    for record in records:
+        destinations = record.successors + tuple(
+            destination for destinations in record.match_table.values()
+            for destination in destinations)
+        for destination in destinations:
+            slots = destination.join_slots
+            if slots is not None and record.index not in slots:
+                slots[record.index] = len(slots)
+
+
+def compile_graph(graph: Graph) -> ExecutionPlan:
+    """
+    Compile a graph into an execution plan.
+
+    The plan holds one record per node with its node type callable, the names
+    of its dependencies, how its output is unpacked, and direct references to
+    the records of the nodes that follow it (as a tuple for parallel
+    branching, or as a table of match values for matcher branching).  The
+    nodes preceding a join node are numbered in order.
+
+    All dependencies of the nodes are verified to be registered, so a missing
+    dependency is reported when the graph is loaded.
+
+    :param graph: graph parsed from a file or instantiated from a native graph
+        class
+    :return: execution plan for the graph
+    """
+    records: Dict[str, NodeRecord] = {
+        name: create_record(index, node)
+        for index, (name, node) in enumerate(graph.nodes.items())
+    }
+    for name, node in graph.nodes.items():
+        link_record(records[name], node, records)
+    link_joins(tuple(records.values()))
+
+    return ExecutionPlan(tuple(records.values()), records)
+
+
+def get_execution_plan(graph: Graph) -> ExecutionPlan:
+    """
+    Get the execution plan of the graph, compiling it on first use.
+    """
+    if graph._plan is None:
+        graph._plan = compile_graph(graph)
+    return graph._plan
@@ -0,0 +1,201 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import importlib
+import signal
+from typing import (Any, Iterable, Iterator, List, Optional, Sequence, Set,
+                    Tuple, Type, Union)
+
+from .asyncutils import ExecutorSpec
+from .engine import run_graph, set_new_context_dependency_cache
+from .graph import Graph
+
+__all__ = ['ProcessRunner']
+
+# Graph given to a process runner: path of a graph file, or a native graph
+# class (or instance of one), which is instantiated in each worker process.
+GraphSpec = Union[str, Graph, Type[Graph]]
+
+
+class WorkerState:
+    """
+    State of a worker process of a process runner, kept for the lifetime of
+    the process: its event loop, and the context holding its dependency cache,
+    in which every run of the graph executes.
+    """
+    def __init__(self, graph: Union[str, Graph], start_node_name: str,
+                 executor: ExecutorSpec, max_in_flight: Optional[int]):
+        self.graph = graph
+        self.start_node_name = start_node_name
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.context = contextvars.copy_context()
+        self.dependency_cache = self.context.run(
+            set_new_context_dependency_cache)
+
+    def run(self, start_node_args: Tuple) -> Any:
+        return self.context.run(self.loop.run_until_complete, run_graph(
+            self.graph, self.start_node_name, start_node_args=start_node_args,
+            executor=self.executor, max_in_flight=self.max_in_flight))
+
+    def close(self) -> None:
+        try:
+            self.context.run(self.loop.run_until_complete,
+                             self.dependency_cache.close())
+        finally:
+            self.loop.close()
+
+
+_worker: Optional[WorkerState] = None
+
+
+def initialize_worker(
+        graph: Union[str, Type[Graph]],
+        start_node_name: str,
+        modules: Sequence[str],
+        executor: ExecutorSpec,
+        max_in_flight: Optional[int]
+) -> None:
+    global _worker
+    from multiprocessing.util import Finalize
+
+    # Interrupts are handled by the parent process, which shuts the workers
+    # down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module_name in modules:
+        importlib.import_module(module_name)
+    if not isinstance(graph, str):
+        graph = graph()
+    _worker = WorkerState(graph, start_node_name, executor, max_in_flight)
+    # Tear down the dependency cache when the worker process exits.
+    Finalize(_worker, _worker.close, exitpriority=10)
+
+
+def run_in_worker(start_node_args: Tuple) -> Any:
+    return _worker.run(start_node_args)
+
+
+class ProcessRunner:
+    """
+    Runs a graph in a pool of worker processes, to spread CPU-bound work across
+    cores.
+
+    Every worker process has its own event loop and dependency cache, which
+    are kept for the lifetime of the process and shared by the runs of the
+    graph it executes.  Runs are started with the arguments of their start
+    node through a work queue, from which each idle worker takes the next run.
+    A worker executes one run at a time.  The values of the dependencies of a
+    worker are torn down when the runner shuts down.
+
+    The return value of every run, or the exception it raised, is sent back to
+    the parent process, so both must be picklable, as must the start node
+    arguments.  The node types of the graph must be registered in the worker
+    processes: with the "fork" start method, the default on Linux, those
+    registered in the parent process are.  Otherwise, the modules registering
+    them must be given to be imported by each worker.
+
+    A runner is used as a context manager, which shuts it down on exit:
+
+        with ProcessRunner('graph.gv', 'start', processes=4) as runner:
+            results = list(runner.map([(message,) for message in messages]))
+
+    From a coroutine, the future of a run is awaited with asyncio.wrap_future().
+    """
+    def __init__(
+            self,
+            graph: GraphSpec,
+            start_node_name: str,
+            *,
+            processes: Optional[int] = None,
+            modules: Sequence[str] = (),
+            executor: ExecutorSpec = None,
+            max_in_flight: Optional[int] = None,
+            mp_context=None
+    ):
+        """
+        :param graph: path of a graph file, or native graph class (or instance
+            of one, of which the class is used).  A native graph class must be
+            importable by the worker processes.
+        :param start_node_name: name of the node (NOT type) in the graph to
+            start the runs at
+        :param processes: number of worker processes.  Defaults to the number
+            of processors.
+        :param modules: names of the modules registering the node types and
+            dependencies of the graph, imported by each worker process
+        :param executor: default executor of the runs (see run_graph()).  An
+            executor instance can't be sent to the worker processes, so this
+            is usually the name of a registered executor.
+        :param max_in_flight: maximum number of nodes of a run executing at
+            once (see run_graph())
+        :param mp_context: multiprocessing context of the worker processes,
+            for a specific start method
+        """
+        if isinstance(graph, Graph):
+            graph = type(graph)
+        if processes is not None and processes < 1:
+            raise ValueError('number of processes must be at least 1')
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            processes, mp_context, initializer=initialize_worker,
+            initargs=(graph, start_node_name, tuple(modules), executor,
+                      max_in_flight))
+        self._pending: Set[concurrent.futures.Future] = set()
+
+    def __enter__(self) -> 'ProcessRunner':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # On an error, including an interrupt, don't wait for runs that
+        # haven't started.
+        self.shutdown(cancel_pending=exc_type is not None)
+
+    def submit(self, *start_node_args) -> concurrent.futures.Future:
+        """
+        Queue a run of the graph.
+
+        :param start_node_args: input arguments for the start node
+        :return: future of the return value of the last node executed in the
+            run
+        """
+        future = self._executor.submit(run_in_worker, start_node_args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def map(
+            self,
+            inputs: Iterable[Tuple],
+            return_exceptions: bool = False
+    ) -> Iterator[Any]:
+        """
+        Queue a run of the graph for each tuple of start node arguments, and
+        iterate over their results, in order.
+
+        :param inputs: input arguments for the start node of each run
+        :param return_exceptions: whether an exception raised by a run is
+            produced as its result, rather than raised
+        :return: iterator over the results of the runs
+        """
+        futures: List[concurrent.futures.Future] = [
+            self.submit(*start_node_args) for start_node_args in inputs]
+        for future in futures:
+            try:
+                yield future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                yield e
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        Shut the worker processes down once they finish the runs queued.
+
+        :param wait: whether to wait for the worker processes to exit
+        :param cancel_pending: whether to cancel the queued runs that haven't
+            started rather than execute them
+        """
+        if cancel_pending:
+            for future in list(self._pending):
+                future.cancel()
+        self._executor.shutdown(wait=wait)
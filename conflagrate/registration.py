@@ -1,10 +1,10 @@
 import inspect
 
-from typing import Any, Callable, Dict, Tuple, Type
+from typing import Any, Callable, Dict, Optional, Tuple, Type
 
-from .controlflow import BranchingStrategy
+from .controlflow import BranchingStrategy, RetryPolicy
 from .graph import MatcherNodeType, NodeType
-from .asyncutils import BlockingBehavior
+from .asyncutils import BlockingBehavior, ExecutorSpec
 
 __all__ = ['nodetype']
 
@@ -14,7 +14,16 @@ _node_types: Dict[str, NodeType] = {}
 def nodetype(
         name: str,
         branching_strategy: BranchingStrategy = BranchingStrategy.parallel,
-        blocking_behavior: BlockingBehavior = BlockingBehavior.BLOCKING
+        blocking_behavior: BlockingBehavior = BlockingBehavior.BLOCKING,
+        *,
+        executor: ExecutorSpec = None,
+        max_concurrency: Optional[int] = None,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_timeout: Optional[float] = None,
+        join: bool = False,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None
 ) -> Callable:
     """
     Identify a function as the implementation of a type of node on graphs.
@@ -30,6 +39,33 @@ def nodetype(
     functions should indicate if they are non-blocking, as otherwise they
     will be called in a dedicated thread, which incurs some overhead.
 
+    A node type can also be a generator function or an async generator
+    function, making it a streaming node type.  Every item it yields is passed
+    on to the following nodes as soon as it is produced, in a new branch, as if
+    returned by a node of its own.  Items of a blocking generator are produced
+    in the executor one at a time.  When buffer_size items are in the rest of
+    the graph, the generator is not resumed until one of their branches
+    finishes, so an arbitrarily long stream is processed in bounded memory.
+    The return annotation is that of the generator, such as Iterator[str].
+
+    A node type given a batch size is batched: the inputs of the nodes of this
+    type executing concurrently, across branches and graph runs, are collected
+    into a list and the function is called once with the list.  It must return
+    a list of the same length, the elements of which are the outputs of the
+    respective nodes.  Each input in the list is the positional argument of its
+    node, or the tuple of its positional arguments if there are several.
+    Dependencies are those of the node that arrived first.
+
+    A join node type gathers the parallel branches leading to its nodes.  A
+    node of this type waits, within a graph run, for an input from every node
+    preceding it in the graph, then is called once with the list of those
+    inputs, ordered like the preceding nodes are in the graph.  Each input in
+    the list is the positional argument of its node, the tuple of them if
+    there are several, or None if there are none.  The branches delivering
+    the other inputs end there.  Inputs arriving again from the same node
+    before the others are queued for the next call.  A join node following a
+    matcher node that selects another branch never executes.
+
     :param name: The value of the "type" attribute annotated on nodes of the
         graph for which this function should be called.
     :param branching_strategy: How nodes following this node type should be
@@ -37,15 +73,82 @@ def nodetype(
         BranchingStrategy class for details and values.
     :param blocking_behavior: Whether the function is blocking or non-blocking.
         See the BlockingBehavior class for details and values.
+    :param executor: The executor in which a blocking function is called, or
+        the name of an executor made available with register_executor().  If
+        not given, the default executor of the graph run is used (see
+        run_graph()).  CPU-bound functions can be given a process pool, such as
+        the one named "process", so they don't hold the interpreter lock.  The
+        function and its arguments must then be picklable.
+    :param max_concurrency: Maximum number of nodes of this type executing at
+        once, across all graph runs on the event loop.  Branches reaching a
+        node of this type while the limit is reached wait for one to finish.
+        Unlimited if not given.  Since the limit is shared by every graph run
+        on the event loop, a limited node that runs a subgraph containing a
+        node of the same type (see run_graph()) holds one of the slots while
+        the subgraph waits for one, and deadlocks once all slots are held this
+        way.  The limit of a streaming node type applies to producing each
+        item.
+    :param buffer_size: Maximum number of items of a streaming node type moving
+        through the rest of the graph at once.  Defaults to 16.
+    :param batch_size: Maximum number of inputs of a batched node type passed
+        to the function at once.  Not batched if not given.  Since waiting
+        nodes hold the slots of their concurrency limits, a max_concurrency or
+        run max_in_flight lower than the batch size makes batches smaller.
+    :param batch_timeout: How long in seconds a batch waits for more inputs
+        after the first one arrives before the function is called with a
+        partial batch.  If not given, a batch only collects the inputs
+        arriving in the same iteration of the event loop.
+    :param join: Whether this is a join node type, called with the inputs of
+        the branches leading to its nodes.
+    :param timeout: How long in seconds a node of this type may take once its
+        dependencies are resolved, after which it is cancelled and raises
+        asyncio.TimeoutError, ending its branch like any other exception (see
+        run_graph()).  The time a streaming node type takes to produce each
+        item is limited.  A blocking function can't be interrupted: its
+        branch moves on, but it keeps its thread of the executor until it
+        returns.  Unlimited if not given.
+    :param retry: How a node of this type retries its call when it raises
+        one of the exceptions of the policy, such as a timeout, before the
+        exception ends its branch.  See the RetryPolicy class for details.  The
+        node keeps the slots of its concurrency limits while it waits to
+        retry.  Its dependencies are resolved again for every retry: cached
+        values are reused, and those never cached, such as a client that may
+        have been left broken, are provided anew.  An exception raised while
+        providing them is a failed attempt like one raised by the node.
+        Streaming node types can't be retried.  Not retried if not given.
     :return: Decorated function.
     """
     def decorator(function):
         blocking_flag = get_blocking_behavior(blocking_behavior, function)
+        streaming = is_streaming(function)
         if name in _node_types:
             raise ValueError(f'node type already associated with name "{name}"')
+        if (executor is not None
+                and blocking_flag is not BlockingBehavior.BLOCKING):
+            raise ValueError('only blocking node types can be given an '
+                             'executor')
+        if buffer_size is not None:
+            if not streaming:
+                raise ValueError('only streaming node types can be given a '
+                                 'buffer size')
+            if buffer_size < 1:
+                raise ValueError('buffer size must be at least 1')
+        if batch_size is not None and streaming:
+            raise ValueError('streaming node types cannot be batched')
+        if batch_timeout is not None and batch_size is None:
+            raise ValueError('only batched node types can be given a batch '
+                             'timeout')
+        if timeout is not None and timeout <= 0:
+            raise ValueError('timeout must be positive')
+        if retry is not None and streaming:
+            raise ValueError('streaming node types cannot be retried')
 
         input_datatypes, output_datatypes = (
             get_input_output_datatypes_from_callable(function))
+        if streaming:
+            # The output of the node type is an item of the generator.
+            output_datatypes = getattr(output_datatypes, '__args__',
+                                       (output_datatypes,))[0]
 
         node_type_class: Type[NodeType] = NodeType
         if branching_strategy == BranchingStrategy.matcher:
@@ -57,7 +160,11 @@ def nodetype(
             node_type_class = MatcherNodeType
 
         _node_types[name] = node_type_class(function, branching_strategy, blocking_flag,
-                                            input_datatypes, output_datatypes)
+                                            input_datatypes, output_datatypes,
+                                            executor, max_concurrency,
+                                            buffer_size, batch_size,
+                                            batch_timeout, join, timeout,
+                                            retry)
 
         return function
 
@@ -85,11 +192,17 @@ def get_blocking_behavior(
         function: Callable
 ) -> BlockingBehavior:
     if (blocking_flag is BlockingBehavior.NON_BLOCKING
-            or inspect.iscoroutinefunction(function)):
+            or inspect.iscoroutinefunction(function)
+            or inspect.isasyncgenfunction(function)):
         return BlockingBehavior.NON_BLOCKING
     else:
         return BlockingBehavior.BLOCKING
 
 
+def is_streaming(function: Callable) -> bool:
+    return (inspect.isgeneratorfunction(function)
+            or inspect.isasyncgenfunction(function))
+
+
 def get_nodetypes() -> Dict[str, NodeType]:
     return _node_types.copy()
@@ -0,0 +1,121 @@
+import json
+from time import perf_counter
+from typing import Any, Dict, List
+
+from .instrumentation import NodeEvent
+
+__all__ = ['ChromeTrace']
+
+# Phases of a node execution drawn inside its span, by the attributes of the
+# node event at which they start and end.
+_PHASES = (
+    ('waiting for slots', 'start', 'admitted'),
+    ('resolving dependencies', 'admitted', 'resolved'),
+    ('queued in executor', 'resolved', 'running'),
+)
+
+
+class ChromeTrace:
+    """
+    Instrumentation hook recording a trace of graph runs in the Chrome Trace
+    Event format, which can be viewed in Perfetto (https://ui.perfetto.dev) or
+    about://tracing in Chrome:
+
+        trace = ChromeTrace()
+        await run_graph('graph.gv', 'start',
+                        instrumentation=Instrumentation(trace))
+        trace.save('run.json')
+
+    Every run is shown as a process and every branch of a run as a thread of
+    it, holding a span for each node executed, within which the time waiting
+    for slots of the concurrency limits, resolving dependencies and queued in
+    the executor are shown.  Arrows link the node forking a branch, or running
+    a subgraph, to the first node of the branch or subgraph.
+    """
+    def __init__(self):
+        # Every timestamp is relative to the creation of the trace.
+        self.origin = perf_counter()
+        self.events: List[NodeEvent] = []
+
+    def __call__(self, event: NodeEvent) -> None:
+        self.events.append(event)
+
+    def _timestamp(self, time: float) -> float:
+        # Microseconds, the unit of the trace event format.
+        return (time - self.origin) * 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Build the trace as a JSON object of the trace event format.
+        """
+        trace = []
+        spans: Dict[int, NodeEvent] = {event.span: event
+                                       for event in self.events}
+        runs = set()
+        branches = set()
+        for event in self.events:
+            if event.run not in runs:
+                runs.add(event.run)
+                trace.append({'name': 'process_name', 'ph': 'M',
+                              'pid': event.run, 'tid': 0,
+                              'args': {'name': f'run {event.run}'}})
+            if (event.run, event.branch) not in branches:
+                branches.add((event.run, event.branch))
+                trace.append({'name': 'thread_name', 'ph': 'M',
+                              'pid': event.run, 'tid': event.branch,
+                              'args': {'name': f'branch {event.branch}'}})
+
+            args = {'type': event.typename, 'span': event.span,
+                    'parent': event.parent}
+            if event.exception is not None:
+                args['exception'] = repr(event.exception)
+            trace.append({
+                'name': event.node, 'cat': event.typename, 'ph': 'X',
+                'ts': self._timestamp(event.start),
+                'dur': event.latency * 1e6,
+                'pid': event.run, 'tid': event.branch, 'args': args,
+            })
+            for name, start, end in _PHASES:
+                start, end = getattr(event, start), getattr(event, end)
+                if end is not None and end > start:
+                    trace.append({
+                        'name': name, 'cat': 'phase', 'ph': 'X',
+                        'ts': self._timestamp(start),
+                        'dur': (end - start) * 1e6,
+                        'pid': event.run, 'tid': event.branch,
+                    })
+
+            # Continuations of a branch follow each other on the same thread,
+            # so only forks and subgraphs are linked.
+            parent = spans.get(event.parent)
+            if parent is not None and (parent.run, parent.branch) != (
+                    event.run, event.branch):
+                # The flow starts within the span of the parent, which is
+                # still executing in the case of a subgraph.
+                trace.append({
+                    'name': 'fork', 'cat': 'flow', 'ph': 's',
+                    'id': event.span,
+                    'ts': self._timestamp(min(parent.end, event.start)),
+                    'pid': parent.run, 'tid': parent.branch,
+                })
+                trace.append({
+                    'name': 'fork', 'cat': 'flow', 'ph': 'f', 'bp': 'e',
+                    'id': event.span, 'ts': self._timestamp(event.start),
+                    'pid': event.run, 'tid': event.branch,
+                })
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename: str) -> None:
+        """
+        Write the trace to a JSON file.
+
+        :param filename: path of the trace file
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    def clear(self) -> None:
+        """
+        Discard the events recorded so far.
+        """
+        self.events.clear()
@@ -86,19 +86,25 @@ class DatagramReceiverProtocol(DatagramBaseProtocol):
 @dependency
 async def send_datagram_interface(config):
     loop = asyncio.get_running_loop()
-    _, protocol = await loop.create_datagram_endpoint(
+    transport, protocol = await loop.create_datagram_endpoint(
         lambda: DatagramSenderProtocol(),
         remote_addr=('localhost', config["port"])
     )
-    return protocol
+    try:
+        yield protocol
+    finally:
+        transport.close()
 
 
 @dependency
 async def receive_datagram_interface(config):
     loop = asyncio.get_running_loop()
     queue = asyncio.Queue()
-    _, protocol = await loop.create_datagram_endpoint(
+    transport, protocol = await loop.create_datagram_endpoint(
         lambda: DatagramReceiverProtocol(queue),
         local_addr=('localhost', config["port"])
     )
-    return protocol
+    try:
+        yield protocol
+    finally:
+        transport.close()
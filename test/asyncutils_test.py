@@ -1,10 +1,18 @@
 import asyncio
+import contextvars
 import pytest
+import threading
 import unittest.mock as mock
+from concurrent.futures import Executor, ThreadPoolExecutor
 
-from conflagrate.asyncutils import (BlockingBehavior, BranchTracker,
-                                    call_and_set_future, ensure_awaitable,
-                                    make_awaitable)
+from conflagrate.asyncutils import (Batcher, BlockingBehavior, BranchTracker,
+                                    DeadlineExceeded, ExceptionGroup,
+                                    ensure_awaitable, executor_ctx_var,
+                                    get_executor, make_awaitable,
+                                    make_dispatcher, register_executor,
+                                    resolve_executor, run_blocking,
+                                    shutdown_executors)
+from conflagrate.controlflow import ErrorPolicy
 
 
 @pytest.fixture
@@ -56,6 +64,101 @@ def test_branch_tracker_remove_not_last_branch(branch_tracker):
     assert branch_tracker.branches == 1
 
 
+def test_branch_tracker_collect():
+    with mock.patch('asyncio.Future'):
+        branch_tracker = BranchTracker(2, collect=True)
+    branch_tracker._future.done.return_value = False
+    branch_tracker.add_output('a', 1)
+    branch_tracker.add_output('a', 2)
+    branch_tracker.remove_branch()
+    branch_tracker.add_output('b', 3)
+    branch_tracker.remove_branch()
+
+    branch_tracker._future.set_result.assert_called_with({'a': [1, 2],
+                                                          'b': [3]})
+
+
+def test_branch_tracker_collect_exception():
+    with mock.patch('asyncio.Future'):
+        branch_tracker = BranchTracker(3, collect=True)
+    branch_tracker._future.done.return_value = False
+    first = ValueError()
+    branch_tracker.set_exception(first)
+    branch_tracker.remove_branch()
+    branch_tracker.set_exception(KeyError())
+    branch_tracker.remove_branch()
+    branch_tracker.add_output('a', 1)
+    branch_tracker.remove_branch()
+
+    branch_tracker._future.set_exception.assert_called_with(first)
+    # The other exception isn't lost.
+    handler = branch_tracker._future.get_loop().call_exception_handler
+    handler.assert_called_once()
+    assert isinstance(handler.call_args.args[0]['exception'], KeyError)
+
+
+def test_branch_tracker_fail_fast():
+    with mock.patch('asyncio.Future'):
+        branch_tracker = BranchTracker(2, error_policy=ErrorPolicy.FAIL_FAST)
+    branch_tracker._future.done.return_value = False
+    first = ValueError()
+    branch_tracker.set_exception(first)
+
+    assert branch_tracker.failed
+    branch_tracker._future.set_exception.assert_called_once_with(first)
+    # Branches ending after the failure are ignored.
+    branch_tracker.set_exception(KeyError())
+    branch_tracker.remove_branch()
+    branch_tracker.remove_branch()
+    branch_tracker._future.set_exception.assert_called_once_with(first)
+
+
+def test_branch_tracker_collect_exceptions():
+    with mock.patch('asyncio.Future'):
+        branch_tracker = BranchTracker(3, error_policy=ErrorPolicy.COLLECT)
+    branch_tracker._future.done.return_value = False
+    errors = [ValueError(), KeyError()]
+    for error in errors:
+        branch_tracker.set_exception(error)
+        branch_tracker.remove_branch()
+    branch_tracker._future.set_exception.assert_not_called()
+    branch_tracker.remove_branch()
+
+    group = branch_tracker._future.set_exception.call_args.args[0]
+    assert isinstance(group, ExceptionGroup)
+    assert list(group.exceptions) == errors
+
+
+def test_branch_tracker_expire(branch_tracker):
+    branch_tracker.expire()
+
+    assert branch_tracker.failed
+    exception = branch_tracker._future.set_exception.call_args.args[0]
+    assert isinstance(exception, DeadlineExceeded)
+
+
+@pytest.mark.asyncio
+async def test_branch_tracker_cancel():
+    branch_tracker = BranchTracker()
+    task = asyncio.get_running_loop().create_task(asyncio.sleep(1))
+    branch_tracker.track(task)
+
+    await branch_tracker.cancel()
+
+    assert task.cancelled()
+    await asyncio.sleep(0)
+    assert not branch_tracker.tasks
+
+
+def test_branch_tracker_join(branch_tracker):
+    assert branch_tracker.join('node', 2, 1, 'b1') is None
+    # A second input from the same branch waits for the next call.
+    assert branch_tracker.join('node', 2, 1, 'b2') is None
+    assert branch_tracker.join('node', 2, 0, 'a1') == ['a1', 'b1']
+    assert branch_tracker.join('node', 2, 0, 'a2') == ['a2', 'b2']
+    assert branch_tracker.join('node', 2, 0, 'a3') is None
+
+
 @mock.patch('asyncio.iscoroutinefunction', return_value=True)
 def test_ensure_awaitable_coroutine(mock_iscoroutine, mock_func):
     ensure_awaitable(mock_func, BlockingBehavior.NON_BLOCKING, None, 1, a=2)
@@ -79,33 +182,159 @@ async def test_make_awaitable_blocking(monkeypatch, mock_loop, mock_future):
                         mock.Mock(return_value=mock_loop))
     await make_awaitable(lambda: None, BlockingBehavior.BLOCKING)
     mock_loop.run_in_executor.assert_awaited()
-    mock_future.assert_not_awaited()
+    mock_future.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_make_awaitable_nonblocking(monkeypatch, mock_loop, mock_future):
+async def test_make_awaitable_nonblocking(monkeypatch, mock_loop, mock_future,
+                                          mock_func):
     monkeypatch.setattr(asyncio, 'Future', mock_future)
     monkeypatch.setattr(asyncio, 'get_running_loop',
                         mock.Mock(return_value=mock_loop))
-    await make_awaitable(lambda: None, BlockingBehavior.NON_BLOCKING)
+    result = await make_awaitable(mock_func, BlockingBehavior.NON_BLOCKING,
+                                  1, a=2)
+    assert result is mock_func.return_value
+    mock_func.assert_called_once_with(1, a=2)
     mock_loop.run_in_executor.assert_not_awaited()
-    mock_future.assert_awaited()
+    mock_loop.call_soon.assert_not_called()
+    mock_future.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_make_awaitable_nonblocking_raises(mock_func):
+    mock_func.side_effect = TypeError('test exception')
+    with pytest.raises(TypeError):
+        await make_awaitable(mock_func, BlockingBehavior.NON_BLOCKING)
+
 
+@pytest.mark.asyncio
+async def test_make_dispatcher_coroutine():
+    async def function(a, *, b) -> int:
+        return a + b
 
-def test_call_and_set_future(mock_func, mock_future):
-    call_and_set_future(mock_future, mock_func)
+    assert make_dispatcher(function, BlockingBehavior.BLOCKING) is function
 
-    mock_func.assert_called_with()
-    mock_future.set_result.assert_called_with(mock_func.return_value)
-    mock_future.set_exception.assert_not_called()
 
+@pytest.mark.asyncio
+async def test_make_dispatcher_nonblocking(mock_func):
+    dispatch = make_dispatcher(mock_func, BlockingBehavior.NON_BLOCKING)
+    with mock.patch('asyncio.get_running_loop') as get_running_loop:
+        result = await dispatch(1, a=2)
 
-def test_call_raises(mock_func, mock_future):
-    exc = TypeError('test exception')
-    mock_func.side_effect = exc
+    assert result is mock_func.return_value
+    mock_func.assert_called_once_with(1, a=2)
+    get_running_loop.assert_not_called()
 
-    call_and_set_future(mock_future, mock_func)
 
-    mock_func.assert_called_with()
-    mock_future.set_exception.assert_called_with(exc)
-    mock_future.set_result.assert_not_called()
+@pytest.mark.asyncio
+async def test_make_dispatcher_blocking(monkeypatch, mock_loop):
+    function = mock.Mock()
+    executor = mock.Mock(spec=Executor)
+    monkeypatch.setattr(asyncio, 'get_running_loop',
+                        mock.Mock(return_value=mock_loop))
+    await make_dispatcher(function, BlockingBehavior.BLOCKING, executor)(1, 2)
+
+    # Without keyword arguments, the function isn't wrapped.
+    mock_loop.run_in_executor.assert_awaited_once_with(executor, function,
+                                                       1, 2)
+
+
+@pytest.fixture
+def executors():
+    with mock.patch.dict('conflagrate.asyncutils._executors'), (
+            mock.patch.dict('conflagrate.asyncutils._created_executors')):
+        yield
+
+
+def test_register_executor_instance(executors):
+    executor = mock.Mock(spec=Executor)
+    register_executor('test', executor)
+    assert get_executor('test') is executor
+
+    shutdown_executors()
+    register_executor('test', mock.Mock(spec=Executor))
+    executor.shutdown.assert_not_called()
+
+
+def test_register_executor_factory(executors):
+    factory = mock.Mock(return_value=mock.Mock(spec=Executor))
+    register_executor('test', factory)
+
+    assert get_executor('test') is factory.return_value
+    assert get_executor('test') is factory.return_value
+    factory.assert_called_once_with()
+
+    shutdown_executors()
+    factory.return_value.shutdown.assert_called_once_with(wait=True)
+
+
+def test_get_executor_unknown(executors):
+    with pytest.raises(ValueError):
+        get_executor('unknown')
+
+
+def test_resolve_executor_run_default(executors):
+    executor = mock.Mock(spec=Executor)
+    register_executor('test', executor)
+
+    assert resolve_executor(None) is None
+    context = contextvars.copy_context()
+    context.run(executor_ctx_var.set, 'test')
+    assert context.run(resolve_executor, None) is executor
+    assert context.run(resolve_executor, 'thread') is not executor
+
+
+@pytest.mark.asyncio
+async def test_run_blocking(monkeypatch, mock_loop):
+    executor = mock.Mock(spec=Executor)
+    monkeypatch.setattr(asyncio, 'get_running_loop',
+                        mock.Mock(return_value=mock_loop))
+    await run_blocking(executor, lambda: None)
+    assert mock_loop.run_in_executor.await_args[0][0] is executor
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_thread_pool():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        thread_name = await run_blocking(
+            executor, lambda: threading.current_thread().name)
+    assert thread_name != threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_batcher_size():
+    call_batch = mock.AsyncMock(side_effect=lambda items, **_: [
+        item * 10 for item in items])
+    batcher = Batcher(call_batch, 2)
+
+    results = await asyncio.gather(*[batcher.submit(i, {'dep': 1})
+                                     for i in range(3)])
+
+    assert results == [0, 10, 20]
+    assert call_batch.await_args_list == [mock.call([0, 1], dep=1),
+                                          mock.call([2], dep=1)]
+
+
+@pytest.mark.asyncio
+async def test_batcher_timeout():
+    call_batch = mock.AsyncMock(side_effect=lambda items: items)
+    batcher = Batcher(call_batch, 10, timeout=0.01)
+
+    first = batcher.submit(1, {})
+    await asyncio.sleep(0)
+    second = batcher.submit(2, {})
+
+    assert await asyncio.gather(first, second) == [1, 2]
+    call_batch.assert_awaited_once_with([1, 2])
+
+
+@pytest.mark.asyncio
+async def test_batcher_errors():
+    batcher = Batcher(mock.AsyncMock(return_value=[]), 2)
+
+    results = await asyncio.gather(batcher.submit(1, {}), batcher.submit(2, {}),
+                                   return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    with pytest.raises(ValueError):
+        Batcher(mock.AsyncMock(), 0)
@@ -0,0 +1,39 @@
+import asyncio
+
+from benchmarks.harness import Benchmark, compare, run_benchmark
+
+
+def test_run_benchmark():
+    calls = []
+    result = run_benchmark(Benchmark('test', lambda: calls.append(None), 10,
+                                     'node'), 3)
+
+    # One call to warm up, then the timed calls.
+    assert len(calls) == 4
+    assert (result['unit'], result['operations'], result['repeat']) == (
+        'node', 10, 3)
+    assert 0 <= result['min'] <= result['median'] <= result['mean'] * 3
+
+
+def test_run_benchmark_coroutine():
+    loops = []
+
+    async def function():
+        loops.append(asyncio.get_running_loop())
+
+    run_benchmark(Benchmark('test', function, 1, 'run'), 2)
+    assert len(set(loops)) == 1
+    assert loops[0].is_closed()
+
+
+def test_compare():
+    baseline = {'results': {'fast': {'min': 1.}, 'slow': {'min': 1.},
+                            'removed': {'min': 1.}}}
+    results = {'results': {'fast': {'min': 0.5}, 'slow': {'min': 1.5},
+                           'added': {'min': 1.}}}
+
+    comparisons = {c['name']: c for c in compare(baseline, results, 0.1)}
+    assert set(comparisons) == {'fast', 'slow'}
+    assert comparisons['fast']['ratio'] == 0.5
+    assert not comparisons['fast']['regressed']
+    assert comparisons['slow']['regressed']
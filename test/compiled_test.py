@@ -0,0 +1,71 @@
+import pytest
+from unittest import mock
+
+from conflagrate import BlockingBehavior, BranchingStrategy
+from conflagrate.__main__ import main
+from conflagrate.graph import (Graph, MatcherNode, MatcherNodeType, Node,
+                               NodeType)
+from conflagrate.parse.compiled import (dumps, load_compiled_graph, loads,
+                                        save_compiled_graph)
+
+
+@pytest.fixture
+def nodetypes():
+    nodetypes = {
+        'test': NodeType(mock.Mock(), BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ()),
+        'match': MatcherNodeType(mock.Mock(), BranchingStrategy.matcher,
+                                 BlockingBehavior.BLOCKING, (), ()),
+    }
+    with mock.patch('conflagrate.registration._node_types', nodetypes):
+        yield nodetypes
+
+
+@pytest.fixture
+def graph(nodetypes):
+    start = Node('start', 'test', nodetypes['test'])
+    check = MatcherNode('check', 'match', nodetypes['match'])
+    end = Node('end', 'test', nodetypes['test'])
+    start.edges = [check]
+    check.edges = {'again': start, None: end}
+    return Graph({'start': start, 'check': check, 'end': end})
+
+
+def test_compiled_graph_round_trip(graph, tmp_path):
+    path = str(tmp_path / 'graph.cfgc')
+
+    save_compiled_graph(graph, path)
+    loaded = load_compiled_graph(path)
+
+    start, check, end = loaded.nodes.values()
+    assert [node.name for node in loaded.nodes.values()] == [
+        'start', 'check', 'end']
+    assert start.edges == [check]
+    assert isinstance(check, MatcherNode)
+    assert check.edges == {'again': start, None: end}
+    assert end.nodetype is graph.nodes['end'].nodetype
+
+
+def test_compiled_graph_validation(graph, nodetypes):
+    data = dumps(graph)
+
+    with pytest.raises(ValueError, match='not a compiled graph'):
+        loads(b'digraph {}')
+    nodetypes['match'] = nodetypes['test']
+    with pytest.raises(ValueError, match='kind'):
+        loads(data)
+    del nodetypes['match']
+    with pytest.raises(ValueError, match='"match"'):
+        loads(data)
+
+
+def test_main_compile(nodetypes, tmp_path):
+    source = tmp_path / 'graph.gv'
+    source.write_text('digraph { a [type=test]; b [type=test]; a -> b }')
+    output = str(tmp_path / 'graph.cfgc')
+
+    assert main(['compile', str(source), '-o', output]) == 0
+
+    loaded = load_compiled_graph(output)
+    assert loaded.nodes['a'].edges == [loaded.nodes['b']]
+    assert main(['compile', str(tmp_path / 'missing.gv'), '-o', output]) == 1
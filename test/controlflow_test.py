@@ -0,0 +1,35 @@
+import pytest
+from unittest import mock
+
+from conflagrate.controlflow import RetryPolicy
+
+
+def test_retry_policy_should_retry():
+    policy = RetryPolicy(max_attempts=3, retry_on=(KeyError, ValueError))
+
+    assert policy.should_retry(KeyError(), 1)
+    assert policy.should_retry(ValueError(), 2)
+    assert not policy.should_retry(ValueError(), 3)
+    assert not policy.should_retry(TypeError(), 1)
+
+
+def test_retry_policy_exponential_backoff():
+    policy = RetryPolicy(backoff=0.1, multiplier=2, max_backoff=0.3,
+                         jitter=False)
+
+    assert [policy.delay(attempt) for attempt in (1, 2, 3)] == [0.1, 0.2, 0.3]
+
+
+def test_retry_policy_jitter():
+    policy = RetryPolicy(backoff=0.1, multiplier=2)
+
+    with mock.patch('random.uniform', return_value=0.05) as uniform:
+        assert policy.delay(2) == 0.05
+    uniform.assert_called_once_with(0, 0.2)
+
+
+@pytest.mark.parametrize('options', [{'max_attempts': 0}, {'backoff': -1},
+                                     {'multiplier': 0.5}])
+def test_retry_policy_invalid(options):
+    with pytest.raises(ValueError):
+        RetryPolicy(**options)
@@ -1,7 +1,11 @@
+import asyncio
+import contextlib
 import pytest
 import unittest.mock as mock
 
 from conflagrate.dependencies import (CacheSupport, Dependency, DependencyCache,
+                                      LeastRecentlyUsed, TimeToLive,
+                                      check_dependencies_registered,
                                       dependency as con_dependency)
 
 
@@ -71,10 +75,10 @@ async def test_DependencyCache_call_dependency_not_cached_subdeps(
 
     await call_dependency(dependency.name)
 
-    dependency_cache._is_in_cache.assert_called_with(dependency.name)
+    dependency_cache._is_in_cache.assert_any_call(dependency.name)
     dependency_cache._get_from_cache.assert_not_called()
     dependency_cache.call_dependency.assert_awaited_with(
-        dependency.dependencies[0])
+        dependency.dependencies[0], [])
     dependency.callable.assert_awaited_with(
         dependency_cache.call_dependency.return_value)
     dependency_cache._dependency_cache.__setitem__.assert_called_with(
@@ -132,3 +136,381 @@ def test_dependency_registration_with_cache_flag(_dependencies):
     assert dep.dependencies == tuple()
     assert dep.callable == my_dep
     assert dep.cache_support == CacheSupport.NEVER_CACHE
+
+
+def test_check_dependencies_registered():
+    registry = {
+        'first': Dependency('first', ('second',), mock.Mock(),
+                            CacheSupport.CACHE_PERMANENTLY),
+        'second': Dependency('second', (), mock.Mock(),
+                             CacheSupport.CACHE_PERMANENTLY),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        check_dependencies_registered(['first'])
+        with pytest.raises(ValueError):
+            check_dependencies_registered(['first', 'third'])
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_call_dependency_single_flight():
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def provider():
+        started.set()
+        await release.wait()
+        return object()
+
+    dep = Dependency('shared', (), mock.AsyncMock(side_effect=provider),
+                     CacheSupport.CACHE_PERMANENTLY)
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'shared': dep}, clear=True):
+        cache = DependencyCache()
+
+    first = asyncio.ensure_future(cache.call_dependency('shared'))
+    second = asyncio.ensure_future(cache.call_dependency('shared'))
+    await started.wait()
+    release.set()
+
+    assert await first is await second
+    dep.callable.assert_awaited_once()
+    assert not cache._in_flight
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_call_dependency_single_flight_failure():
+    dep = Dependency('broken', (), mock.AsyncMock(side_effect=KeyError),
+                     CacheSupport.CACHE_PERMANENTLY)
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'broken': dep}, clear=True):
+        cache = DependencyCache()
+
+    results = await asyncio.gather(cache.call_dependency('broken'),
+                                   cache.call_dependency('broken'),
+                                   return_exceptions=True)
+
+    assert all(isinstance(result, KeyError) for result in results)
+    dep.callable.assert_awaited_once()
+    assert not cache._is_in_cache('broken')
+    assert not cache._in_flight
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_call_dependencies_concurrent():
+    running = []
+    peak = []
+
+    async def provider():
+        running.append(None)
+        peak.append(len(running))
+        await asyncio.sleep(0)
+        running.pop()
+        return len(running)
+
+    registry = {
+        name: Dependency(name, (), provider, CacheSupport.NEVER_CACHE)
+        for name in ('first', 'second')
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    values = await cache.call_dependencies(['first', 'second'])
+
+    assert len(values) == 2
+    assert max(peak) == 2
+
+
+def test_CacheSupport_policies():
+    assert CacheSupport.ttl(10) == TimeToLive(10)
+    assert CacheSupport.ttl(10, 2).refresh_ahead == 2
+    assert CacheSupport.lru(4) == LeastRecentlyUsed(4)
+    with pytest.raises(ValueError):
+        CacheSupport.ttl(0)
+    with pytest.raises(ValueError):
+        CacheSupport.ttl(10, 10)
+    with pytest.raises(ValueError):
+        CacheSupport.lru(0)
+
+
+@pytest.mark.asyncio
+@mock.patch('conflagrate.dependencies.monotonic')
+async def test_DependencyCache_ttl_expiry(monotonic):
+    monotonic.return_value = 100.0
+    dep = Dependency('session', (), mock.AsyncMock(side_effect=[1, 2]),
+                     CacheSupport.ttl(10))
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'session': dep}, clear=True):
+        cache = DependencyCache()
+
+    assert await cache.call_dependency('session') == 1
+    monotonic.return_value = 109.0
+    assert await cache.call_dependency('session') == 1
+    monotonic.return_value = 110.0
+    assert await cache.call_dependency('session') == 2
+    assert dep.callable.await_count == 2
+
+
+@pytest.mark.asyncio
+@mock.patch('conflagrate.dependencies.monotonic')
+async def test_DependencyCache_ttl_refresh_ahead(monotonic):
+    monotonic.return_value = 100.0
+    dep = Dependency('session', (), mock.AsyncMock(side_effect=[1, 2]),
+                     CacheSupport.ttl(10, refresh_ahead=2))
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'session': dep}, clear=True):
+        cache = DependencyCache()
+
+    assert await cache.call_dependency('session') == 1
+    monotonic.return_value = 108.5
+    # The current value is served while the refresh runs in the background.
+    assert await cache.call_dependency('session') == 1
+    await asyncio.gather(*cache._in_flight.values())
+    assert await cache.call_dependency('session') == 2
+    assert dep.callable.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_lru():
+    async def token_provider():
+        return tokens.pop(0)
+
+    tokens = ['a', 'b', 'a', 'c', 'c']
+    client = Dependency('client', ('token',),
+                        mock.AsyncMock(side_effect=lambda token: object()),
+                        CacheSupport.lru(2))
+    registry = {
+        'token': Dependency('token', (), token_provider,
+                            CacheSupport.NEVER_CACHE),
+        'client': client,
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    client_a = await cache.call_dependency('client')
+    client_b = await cache.call_dependency('client')
+    assert await cache.call_dependency('client') is client_a
+    # "c" evicts the least recently used "b".
+    client_c = await cache.call_dependency('client')
+    assert await cache.call_dependency('client') is client_c
+    assert client.callable.await_count == 3
+    assert set(cache._lru_keys['client']) == {('client', 'a'),
+                                              ('client', 'c')}
+    assert client_b not in cache._dependency_cache.values()
+
+
+@mock.patch('conflagrate.dependencies._dependencies')
+def test_dependency_registration_async_generator(_dependencies):
+    _dependencies.__contains__.return_value = False
+
+    @con_dependency
+    async def my_dep(config):
+        yield config
+
+    dep = _dependencies.__setitem__.mock_calls[0][1][1]
+    assert dep.managed
+    assert dep.dependencies == ('config',)
+    assert dep.callable is not my_dep
+
+
+@mock.patch('conflagrate.dependencies._dependencies')
+def test_dependency_registration_async_context_manager(_dependencies):
+    _dependencies.__contains__.return_value = False
+
+    @con_dependency
+    @contextlib.asynccontextmanager
+    async def my_dep():
+        yield
+
+    dep = _dependencies.__setitem__.mock_calls[0][1][1]
+    assert dep.managed
+    assert dep.callable is my_dep
+
+
+def managed_dependency(name, events, dependencies=(),
+                       cache_support=CacheSupport.CACHE_PERMANENTLY):
+    @contextlib.asynccontextmanager
+    async def provider(*args):
+        events.append(f'enter {name}')
+        yield name
+        events.append(f'exit {name}')
+    return Dependency(name, dependencies, provider, cache_support, True)
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_close_reverse_dependency_order():
+    events = []
+    registry = {
+        'config': managed_dependency('config', events),
+        'pool': managed_dependency('pool', events, ('config',)),
+        'client': managed_dependency('client', events, ('pool', 'config'),
+                                     CacheSupport.NEVER_CACHE),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    assert await cache.call_dependency('client') == 'client'
+    assert await cache.call_dependency('client') == 'client'
+    await cache.close()
+
+    assert events == ['enter config', 'enter pool', 'enter client',
+                      'enter client', 'exit client', 'exit client',
+                      'exit pool', 'exit config']
+    assert not cache._is_in_cache('config')
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_close_evicted_context():
+    events = []
+    tokens = ['a', 'b']
+    registry = {
+        'token': Dependency('token', (), mock.AsyncMock(side_effect=tokens),
+                            CacheSupport.NEVER_CACHE),
+        'client': managed_dependency('client', events, ('token',),
+                                     CacheSupport.lru(1)),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    await cache.call_dependency('client')
+    await cache.call_dependency('client')
+    await asyncio.sleep(0)
+    assert events == ['enter client', 'enter client', 'exit client']
+
+    await cache.close()
+    assert events[-1] == 'exit client'
+    assert len(events) == 4
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_call_dependencies_error_releases_lease():
+    events = []
+
+    @contextlib.asynccontextmanager
+    async def slow_client():
+        await asyncio.sleep(0.01)
+        events.append('enter client')
+        yield 'client'
+        events.append('exit client')
+
+    registry = {
+        'broken': Dependency('broken', (), mock.AsyncMock(
+            side_effect=ConnectionError), CacheSupport.NEVER_CACHE),
+        'client': Dependency('client', (), slow_client,
+                             CacheSupport.NEVER_CACHE, True),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    lease = []
+    with pytest.raises(ConnectionError):
+        await cache.call_dependencies(['broken', 'client'], lease)
+    cache.release(lease)
+    await asyncio.sleep(0.02)
+
+    # The client still being provided was cancelled rather than left open.
+    assert events == []
+    assert not cache._open
+
+
+def test_check_dependencies_registered_cycle():
+    registry = {
+        'a': Dependency('a', ('b',), mock.Mock(),
+                        CacheSupport.CACHE_PERMANENTLY),
+        'b': Dependency('b', ('a',), mock.Mock(),
+                        CacheSupport.CACHE_PERMANENTLY),
+        'c': Dependency('c', ('c',), mock.Mock(),
+                        CacheSupport.CACHE_PERMANENTLY),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        with pytest.raises(ValueError, match='a -> b -> a'):
+            check_dependencies_registered(['a'])
+        with pytest.raises(ValueError, match='c -> c'):
+            check_dependencies_registered(['c'])
+
+
+@mock.patch('conflagrate.dependencies._dependencies')
+def test_dependency_registration_lru_without_dependencies(_dependencies):
+    _dependencies.__contains__.return_value = False
+
+    with pytest.raises(ValueError):
+        @con_dependency(CacheSupport.lru(2))
+        async def my_dep():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_lru_unhashable():
+    registry = {
+        'config': Dependency('config', (), mock.AsyncMock(return_value={}),
+                             CacheSupport.CACHE_PERMANENTLY),
+        'client': Dependency('client', ('config',), mock.AsyncMock(),
+                             CacheSupport.lru(2)),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    with pytest.raises(TypeError, match='hashable'):
+        await cache.call_dependency('client')
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_release_never_cached():
+    events = []
+    registry = {
+        'pool': managed_dependency('pool', events),
+        'client': managed_dependency('client', events, ('pool',),
+                                     CacheSupport.NEVER_CACHE),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    lease = []
+    assert await cache.call_dependencies(['client', 'pool'], lease) == [
+        'client', 'pool']
+    assert events == ['enter pool', 'enter client']
+
+    cache.release(lease)
+    await asyncio.sleep(0)
+    assert events == ['enter pool', 'enter client', 'exit client']
+    assert not lease
+
+    await cache.close()
+    assert events[-1] == 'exit pool'
+    assert len(events) == 4
+
+
+@pytest.mark.asyncio
+async def test_DependencyCache_release_deferred_teardown():
+    events = []
+    registry = {
+        'session': managed_dependency('session', events,
+                                      cache_support=CacheSupport.ttl(10)),
+    }
+    with mock.patch.dict('conflagrate.dependencies._dependencies', registry,
+                         clear=True):
+        cache = DependencyCache()
+
+    with mock.patch('conflagrate.dependencies.monotonic', return_value=0):
+        lease = []
+        await cache.call_dependency('session', lease)
+    with mock.patch('conflagrate.dependencies.monotonic', return_value=10):
+        await cache.call_dependency('session')
+    await asyncio.sleep(0)
+    # The expired value is still held by the lease.
+    assert events == ['enter session', 'enter session']
+
+    cache.release(lease)
+    await asyncio.sleep(0)
+    assert events == ['enter session', 'enter session', 'exit session']
+
+    await cache.close()
+    assert len(events) == 4
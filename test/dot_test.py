@@ -0,0 +1,88 @@
+import pytest
+from unittest import mock
+
+from conflagrate import BlockingBehavior, BranchingStrategy
+from conflagrate.graph import MatcherNode, MatcherNodeType, NodeType
+from conflagrate.parse import graphviz
+from conflagrate.parse.dot import DotParser, DotSyntaxError, parse_dot
+
+
+@pytest.fixture(autouse=True)
+def nodetypes():
+    nodetypes = {
+        'test': NodeType(mock.Mock(), BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ()),
+        'match': MatcherNodeType(mock.Mock(), BranchingStrategy.matcher,
+                                 BlockingBehavior.BLOCKING, (), ()),
+    }
+    with mock.patch('conflagrate.parse.dot.get_nodetypes',
+                    return_value=nodetypes), (
+            mock.patch('conflagrate.parse.graphviz.get_nodetypes',
+                       return_value=nodetypes)):
+        yield
+
+
+def test_DotParser_statements():
+    parser = DotParser('''
+        /* comment */ strict digraph G {
+          node [shape=box]; edge [color=red]
+          rankdir = LR
+          a [label="A \\"quoted\\"", type=test]  // comment
+          b [type=test][label=2]
+          a -> b -> c [value=1]
+          a -> b
+        }
+    ''').parse()
+
+    assert parser.nodes == {
+        'a': {'shape': 'box', 'label': '"A \\"quoted\\""', 'type': 'test'},
+        'b': {'shape': 'box', 'type': 'test', 'label': '2'},
+    }
+    assert list(parser.edges.values()) == [
+        ('a', 'b', {'color': 'red', 'value': '1'}),
+        ('b', 'c', {'color': 'red', 'value': '1'}),
+    ]
+
+
+@pytest.mark.parametrize('data', [
+    'graph { a -- b }',
+    'digraph { subgraph s { a } }',
+    'digraph { a:port -> b }',
+    'digraph { a [label=<b>] }',
+    'digraph { a -> }',
+])
+def test_DotParser_unsupported(data):
+    with pytest.raises(DotSyntaxError):
+        DotParser(data).parse()
+
+
+def test_parse_dot():
+    graph = parse_dot('''
+        digraph {
+          start [type=test]; check [type=match]; end [type=test]
+          start -> check
+          check -> end [value=done]
+          check -> start [value=again]
+        }
+    ''')
+
+    start, check, end = graph.nodes.values()
+    assert start.edges == [check]
+    assert isinstance(check, MatcherNode)
+    assert check.edges == {'done': end, 'again': start}
+    assert end.edges == []
+
+
+def test_parse_dot_undefined_node():
+    with pytest.raises(ValueError, match='destination "b"'):
+        parse_dot('digraph { a [type=test]; a -> b }')
+
+
+def test_graphviz_parse_dot_fallback():
+    data = 'digraph { a [type=test, label=<b>]; a -> a }'
+
+    graph = graphviz.parse_dot(data)
+
+    assert list(graph.nodes) == ['a']
+    with pytest.raises(DotSyntaxError):
+        parse_dot(data)
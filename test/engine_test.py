@@ -1,22 +1,28 @@
+import asyncio
 import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
+from conflagrate import (BlockingBehavior, BranchingStrategy,
+                         DeadlineExceeded, ErrorPolicy, ExceptionGroup,
+                         Instrumentation, RetryPolicy)
+
 from conflagrate.asyncutils import BranchTracker
-from conflagrate.dependencies import DependencyCache
+from conflagrate.dependencies import CacheSupport, Dependency, DependencyCache
 from conflagrate.engine import (convert_output_to_input, get_dependencies,
                                 execute_node, get_context_dependency_cache,
-                                run_graph, CacheUsage)
-from conflagrate.graph import Node, MatcherNode
-
-
-@pytest.fixture
-def branch_tracker():
-    return BranchTracker()
+                                run_graph, serve, CacheUsage,
+                                INLINE_HOPS_BEFORE_YIELD,
+                                dependency_cache_ctx_var)
+from conflagrate.graph import Graph, MatcherNode, Node, NodeType
+from conflagrate.plan import NodeRecord, OutputUnpacking
 
 
 @pytest.fixture
 def mock_branch_tracker():
-    return mock.Mock()
+    return mock.Mock(in_flight_limit=None, instrumentation=None, failed=False)
 
 
 @pytest.fixture
@@ -26,17 +32,20 @@ def dependency_cache():
 
 @pytest.fixture
 def node():
-    return Node('test', 'test', mock.AsyncMock())
+    return NodeRecord(0, 'test', 'test', mock.AsyncMock(), (),
+                      OutputUnpacking.PASSTHROUGH)
 
 
 @pytest.fixture
-def matcher_node():
-    return MatcherNode('matcher_test', 'match_test', mock.AsyncMock())
+def next_node():
+    return NodeRecord(2, 'next', 'test', mock.AsyncMock(), (),
+                      OutputUnpacking.PASSTHROUGH)
 
 
 @pytest.fixture
-def mock_node():
-    return mock.AsyncMock()
+def matcher_node():
+    return NodeRecord(1, 'matcher_test', 'match_test', mock.AsyncMock(), (),
+                      OutputUnpacking.MATCHER)
 
 
 @pytest.fixture
@@ -107,39 +116,58 @@ async def test_execute_node_no_next_node(node, mock_branch_tracker):
             mock.patch('asyncio.get_running_loop')) as mock_loop:
         await execute_node(node, mock_branch_tracker)
 
-    node.nodetype.assert_called_with()
+    node.call.assert_called_with()
     mock_branch_tracker.remove_branch.assert_called_once()
     mock_branch_tracker.add_branch.assert_not_called()
     mock_loop.return_value.create_task.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_execute_node_one_next_node(node, mock_branch_tracker):
-    node.edges = [node]
+async def test_execute_node_one_next_node(node, next_node,
+                                          mock_branch_tracker):
+    node.successors = (next_node,)
     with mock.patch('conflagrate.engine.get_dependencies',
                     mock.AsyncMock(return_value={})) as get_deps, (
             mock.patch('asyncio.get_running_loop')) as mock_loop:
         await execute_node(node, mock_branch_tracker)
 
-    node.nodetype.assert_called_with()
-    mock_branch_tracker.remove_branch.assert_not_called()
+    node.call.assert_called_with()
+    next_node.call.assert_called_with(node.call.return_value)
+    mock_branch_tracker.remove_branch.assert_called_once()
     mock_branch_tracker.add_branch.assert_not_called()
-    mock_loop.return_value.create_task.assert_called_once()
+    mock_loop.return_value.create_task.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_execute_node_two_next_nodes(node, mock_branch_tracker):
-    node.edges = [node, node]
+async def test_execute_node_two_next_nodes(node, next_node,
+                                           mock_branch_tracker):
+    node.successors = (next_node, next_node)
     with mock.patch('conflagrate.engine.get_dependencies',
                     mock.AsyncMock(return_value={})) as get_deps, (
             mock.patch('asyncio.get_running_loop')) as mock_loop:
         await execute_node(node, mock_branch_tracker)
 
-    node.nodetype.assert_called_with()
-    mock_branch_tracker.remove_branch.assert_not_called()
+    node.call.assert_called_with()
+    next_node.call.assert_called_once()
+    mock_branch_tracker.remove_branch.assert_called_once()
     mock_branch_tracker.add_branch.assert_called_once()
-    mock_loop.return_value.create_task.assert_called()
-    assert len(mock_loop.return_value.create_task.mock_calls) == 2
+    mock_loop.return_value.create_task.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_execute_node_loop_yields(matcher_node, mock_branch_tracker):
+    iterations = 2 * INLINE_HOPS_BEFORE_YIELD + 1
+    matcher_node.call.side_effect = (
+        [('continue', None)] * (iterations - 1) + [('exit', None)])
+    matcher_node.match_table = {'continue': (matcher_node,)}
+    with mock.patch('asyncio.sleep') as mock_sleep, (
+            mock.patch('asyncio.get_running_loop')) as mock_loop:
+        await execute_node(matcher_node, mock_branch_tracker)
+
+    assert matcher_node.call.await_count == iterations
+    assert mock_sleep.await_count == 2
+    mock_branch_tracker.remove_branch.assert_called_once()
+    mock_loop.return_value.create_task.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -175,17 +203,757 @@ async def test_start_graph_independent_cache(graph):
 
 
 @pytest.mark.asyncio
-async def test_graph_output(branch_tracker, graph, mock_node):
+async def test_graph_output():
     expected_return_value = object()
-    graph.nodes.__getitem__.return_value = mock_node
-    mock_node.get_dependencies = mock.Mock(return_value=())
-    mock_node.get_output_data = mock.Mock(return_value=expected_return_value)
-    mock_node.get_next_node = mock.Mock(
-        return_value=[],
-        side_effect=lambda *_, **__:
-        branch_tracker.set_last_node_return_value(expected_return_value)
-    )
+    nodetype = mock.Mock()
+    nodetype.dispatch = mock.AsyncMock(return_value=expected_return_value)
+    nodetype.get_dependencies = mock.Mock(return_value=())
+    nodetype.concurrency_limit = None
+    nodetype.streaming = False
+    nodetype.batcher = None
+    nodetype.join = False
+    nodetype.timeout = None
+    nodetype.retry = None
+    graph = Graph({'any': Node('any', 'test', nodetype)})
 
     actual_return_value = await run_graph(graph, 'any')
 
     assert actual_return_value == expected_return_value
+
+
+@pytest.mark.asyncio
+async def test_execute_node_matcher(matcher_node, next_node,
+                                    mock_branch_tracker):
+    matcher_node.call.return_value = ('b', 1, 2)
+    matcher_node.match_table = {'a': (matcher_node,), 'b': (next_node,)}
+    with mock.patch('asyncio.get_running_loop') as mock_loop:
+        await execute_node(matcher_node, mock_branch_tracker)
+
+    next_node.call.assert_called_once_with(1, 2)
+    mock_loop.return_value.create_task.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_execute_node_matcher_no_match(matcher_node,
+                                             mock_branch_tracker):
+    matcher_node.call.return_value = ('c', 1)
+    matcher_node.match_table = {'a': (matcher_node,)}
+    with mock.patch('asyncio.get_running_loop') as mock_loop:
+        await execute_node(matcher_node, mock_branch_tracker)
+
+    mock_branch_tracker.add_output.assert_called_with('matcher_test', 1)
+    mock_branch_tracker.remove_branch.assert_called_once()
+    mock_loop.return_value.create_task.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_start_graph_closes_owned_cache(graph):
+    caches = []
+
+    def mock_execute(_, branch_tracker: BranchTracker, __):
+        caches.append(get_context_dependency_cache())
+        branch_tracker.remove_branch()
+
+    mock_execute = mock.AsyncMock(side_effect=mock_execute)
+    with mock.patch('conflagrate.engine.execute_node', mock_execute), (
+            mock.patch.object(DependencyCache, 'close')) as mock_close:
+        await run_graph(graph, 'test', CacheUsage.INDEPENDENT)
+        mock_close.assert_awaited_once()
+
+        mock_close.reset_mock()
+        get_context_dependency_cache()
+        await run_graph(graph, 'test', CacheUsage.SHARED)
+        mock_close.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_run_graph_default_executor():
+    def blocking() -> str:
+        return threading.current_thread().name
+
+    nodetype = NodeType(blocking, BranchingStrategy.parallel,
+                        BlockingBehavior.BLOCKING, (), ())
+    graph = Graph({'start': Node('start', 'test', nodetype)})
+    with ThreadPoolExecutor(thread_name_prefix='run_default') as executor:
+        thread_name = await run_graph(graph, 'start', executor=executor)
+
+    assert thread_name.startswith('run_default')
+
+
+def concurrency_probe():
+    running = []
+    peak = [0]
+
+    async def probe(*_) -> None:
+        running.append(None)
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    return probe, peak
+
+
+def fan_out_graph(leaf_nodetype, leaves=5):
+    start = NodeType(lambda: None, BranchingStrategy.parallel,
+                     BlockingBehavior.NON_BLOCKING, (), ())
+    nodes = {'start': Node('start', 'start', start)}
+    for i in range(leaves):
+        nodes[f'leaf{i}'] = Node(f'leaf{i}', 'leaf', leaf_nodetype)
+    nodes['start'].edges = [nodes[f'leaf{i}'] for i in range(leaves)]
+    return Graph(nodes)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_max_concurrency():
+    probe, peak = concurrency_probe()
+    leaf = NodeType(probe, BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), (), max_concurrency=2)
+
+    await run_graph(fan_out_graph(leaf), 'start')
+
+    assert peak[0] == 2
+
+
+@pytest.mark.asyncio
+async def test_run_graph_max_in_flight():
+    probe, peak = concurrency_probe()
+    leaf = NodeType(probe, BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), ())
+
+    await run_graph(fan_out_graph(leaf), 'start', max_in_flight=1)
+
+    assert peak[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_graph_collect():
+    leaf = NodeType(lambda: 'done', BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), ())
+
+    outputs = await run_graph(fan_out_graph(leaf, leaves=3), 'start',
+                              collect=True)
+
+    assert outputs == {'leaf0': ['done'], 'leaf1': ['done'],
+                       'leaf2': ['done']}
+
+
+@pytest.mark.asyncio
+async def test_run_graph_collect_raises_first_exception():
+    async def leaf_function(*_) -> None:
+        await asyncio.sleep(0)
+        raise ValueError()
+
+    leaf = NodeType(leaf_function, BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), ())
+
+    with pytest.raises(ValueError):
+        await run_graph(fan_out_graph(leaf, leaves=2), 'start', collect=True)
+
+
+def failing_graph(finished):
+    async def fail(*_) -> None:
+        await asyncio.sleep(0)
+        raise ValueError()
+
+    async def slow(*_) -> None:
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            finished.append('slow')
+
+    def node_type(function):
+        return NodeType(function, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+
+    nodes = {'start': Node('start', 'start', node_type(lambda: None)),
+             'fail': Node('fail', 'fail', node_type(fail)),
+             'error': Node('error', 'fail', node_type(fail)),
+             'slow': Node('slow', 'slow', node_type(slow))}
+    nodes['start'].edges = [nodes['fail'], nodes['error'], nodes['slow']]
+    return Graph(nodes)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_fail_fast_cancels_branches():
+    finished = []
+
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(
+            run_graph(failing_graph(finished), 'start',
+                      error_policy=ErrorPolicy.FAIL_FAST), 0.1)
+
+    # The slow branch was cancelled before the run raised.
+    assert finished == ['slow']
+
+
+@pytest.mark.asyncio
+async def test_run_graph_finish_lets_branches_finish():
+    finished = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    with pytest.raises(ValueError):
+        await run_graph(failing_graph(finished), 'start', collect=True)
+
+    assert finished == ['slow']
+    assert loop.time() - start >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_run_graph_finish_reports_exceptions():
+    async def fail() -> None:
+        raise ValueError()
+
+    async def slow() -> str:
+        await asyncio.sleep(0.01)
+        return 'done'
+
+    def node_type(function):
+        return NodeType(function, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+
+    nodes = {'start': Node('start', 'start', node_type(lambda: None)),
+             'fail': Node('fail', 'fail', node_type(fail)),
+             'slow': Node('slow', 'slow', node_type(slow))}
+    nodes['start'].edges = [nodes['fail'], nodes['slow']]
+    handler = mock.Mock()
+    asyncio.get_running_loop().set_exception_handler(handler)
+
+    # The output of the last node is returned, and the exception reported.
+    assert await run_graph(Graph(nodes), 'start') == 'done'
+    handler.assert_called_once()
+    assert isinstance(handler.call_args.args[1]['exception'], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_collect_exceptions():
+    finished = []
+
+    with pytest.raises(ExceptionGroup) as info:
+        await run_graph(failing_graph(finished), 'start',
+                        error_policy=ErrorPolicy.COLLECT)
+
+    assert [type(e) for e in info.value.exceptions] == [ValueError,
+                                                        ValueError]
+    assert finished == ['slow']
+
+
+async def raises_under_policy(run, error_policy, exception_type):
+    if error_policy is ErrorPolicy.COLLECT:
+        with pytest.raises(ExceptionGroup) as info:
+            await asyncio.wait_for(run, 1)
+        assert [type(e) for e in info.value.exceptions] == [exception_type]
+    else:
+        with pytest.raises(exception_type):
+            await asyncio.wait_for(run, 1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('error_policy', list(ErrorPolicy))
+async def test_run_graph_dependency_error(error_policy):
+    async def broken_client():
+        raise ConnectionError()
+
+    async def use_client(*, broken_client) -> None:
+        pass
+
+    nodetype = NodeType(use_client, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+    graph = Graph({'use': Node('use', 'use', nodetype)})
+    dependency = Dependency('broken_client', (), broken_client,
+                            CacheSupport.NEVER_CACHE)
+
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'broken_client': dependency}):
+        await raises_under_policy(
+            run_graph(graph, 'use', CacheUsage.INDEPENDENT,
+                      error_policy=error_policy),
+            error_policy, ConnectionError)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('error_policy', list(ErrorPolicy))
+async def test_run_graph_matcher_output_error(error_policy):
+    # A matcher node must return a collection starting with the match value.
+    nodetype = NodeType(lambda: 1, BranchingStrategy.matcher,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+    matcher = MatcherNode('matcher', 'matcher', nodetype)
+    matcher.edges = {}
+    graph = Graph({'matcher': matcher})
+
+    await raises_under_policy(
+        run_graph(graph, 'matcher', error_policy=error_policy), error_policy,
+        TypeError)
+
+
+def sleeping_graph(finished, **options):
+    async def sleep(*_) -> None:
+        try:
+            await asyncio.sleep(1)
+        finally:
+            finished.append('sleep')
+
+    nodetype = NodeType(sleep, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), (), **options)
+    return Graph({'sleep': Node('sleep', 'sleep', nodetype)})
+
+
+@pytest.mark.asyncio
+async def test_run_graph_node_timeout():
+    finished = []
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(
+            run_graph(sleeping_graph(finished, timeout=0.01), 'sleep'), 0.5)
+
+    assert finished == ['sleep']
+
+
+@pytest.mark.asyncio
+async def test_run_graph_deadline():
+    finished = []
+
+    with pytest.raises(DeadlineExceeded):
+        await asyncio.wait_for(
+            run_graph(sleeping_graph(finished), 'sleep', deadline=0.01), 0.5)
+
+    assert finished == ['sleep']
+
+
+@pytest.mark.asyncio
+async def test_run_graph_deadline_propagates_to_subgraph():
+    finished = []
+    subgraph = sleeping_graph(finished)
+
+    async def run_subgraph() -> None:
+        # The subgraph is given a later deadline of its own.
+        await run_graph(subgraph, 'sleep', deadline=10)
+
+    nodetype = NodeType(run_subgraph, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+    graph = Graph({'start': Node('start', 'start', nodetype)})
+
+    with pytest.raises(DeadlineExceeded):
+        await asyncio.wait_for(run_graph(graph, 'start', deadline=0.01), 0.5)
+
+    assert finished == ['sleep']
+
+
+def join_graph(join_function):
+    def node_type(function, **options):
+        return NodeType(function, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), (), **options)
+
+    async def slow(value):
+        await asyncio.sleep(0.01)
+        return value, 'slow'
+
+    nodes = {
+        'start': Node('start', 'start', node_type(lambda: 1)),
+        'slow': Node('slow', 'slow', node_type(slow)),
+        'fast': Node('fast', 'fast', node_type(lambda value: value + 1)),
+        'none': Node('none', 'none', node_type(lambda value: None)),
+        'join': Node('join', 'join', node_type(join_function, join=True)),
+    }
+    nodes['start'].edges = [nodes['slow'], nodes['fast'], nodes['none']]
+    for name in ('slow', 'fast', 'none'):
+        nodes[name].edges = [nodes['join']]
+    return Graph(nodes)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_join():
+    calls = []
+
+    def join(inputs):
+        calls.append(inputs)
+        return 'joined'
+
+    assert await run_graph(join_graph(join), 'start') == 'joined'
+    # Inputs are ordered like the nodes preceding the join node.
+    assert calls == [[(1, 'slow'), 2, None]]
+
+
+@pytest.mark.asyncio
+async def test_run_graph_max_in_flight_invalid():
+    with pytest.raises(ValueError):
+        BranchTracker(max_in_flight=0)
+
+
+@pytest.mark.asyncio
+async def test_execute_node_releases_slot_on_error(node, mock_branch_tracker):
+    mock_branch_tracker.in_flight_limit = asyncio.Semaphore(1)
+    error = ValueError()
+    node.call.side_effect = error
+
+    await execute_node(node, mock_branch_tracker)
+
+    assert not mock_branch_tracker.in_flight_limit.locked()
+    mock_branch_tracker.set_exception.assert_called_once_with(error)
+    mock_branch_tracker.remove_branch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_execute_node_admitted(node, next_node, mock_branch_tracker):
+    limit = mock_branch_tracker.in_flight_limit = asyncio.Semaphore(1)
+    node.successors = (next_node, next_node)
+    forks = []
+    acquire = limit.acquire
+
+    async def acquire_for_fork():
+        forks.append(mock_branch_tracker.add_branch.call_count)
+        await acquire()
+
+    # The slot of the first node was acquired by whoever forked it, so
+    # acquiring it again would wait forever.
+    await limit.acquire()
+    limit.acquire = acquire_for_fork
+    await asyncio.wait_for(
+        execute_node(node, mock_branch_tracker, admitted=True), 1)
+    await asyncio.sleep(0.01)
+
+    # The slot of the forked branch was acquired before the branch was added
+    # and its task created, then one more for the inline continuation.
+    assert forks == [0, 1]
+    assert not limit.locked()
+    assert next_node.call.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_execute_node_releases_dependencies(node, mock_branch_tracker,
+                                                  dependency_cache):
+    node.dependencies = ('client',)
+    lease = None
+
+    async def get_deps(cache, names, node_lease):
+        nonlocal lease
+        lease = node_lease
+        node_lease.append(mock.sentinel.entry)
+        return {'client': mock.sentinel.client}
+
+    dependency_cache.release = mock.Mock()
+    with mock.patch('conflagrate.engine.get_dependencies', get_deps), (
+            mock.patch('conflagrate.engine.get_context_dependency_cache',
+                       return_value=dependency_cache)):
+        await execute_node(node, mock_branch_tracker)
+
+    node.call.assert_awaited_with(client=mock.sentinel.client)
+    dependency_cache.release.assert_called_once_with(lease)
+
+
+@pytest.mark.asyncio
+async def test_execute_node_retries(node, mock_branch_tracker):
+    node.retry = RetryPolicy(backoff=0)
+    node.call.side_effect = [ValueError(), ValueError(), 'done']
+
+    await execute_node(node, mock_branch_tracker)
+
+    assert node.call.await_count == 3
+    mock_branch_tracker.set_exception.assert_not_called()
+    mock_branch_tracker.add_output.assert_called_once_with('test', 'done')
+
+
+@pytest.mark.asyncio
+async def test_execute_node_retries_exhausted(node, mock_branch_tracker):
+    node.retry = RetryPolicy(max_attempts=2, backoff=0)
+    error = ValueError()
+    node.call.side_effect = error
+
+    await execute_node(node, mock_branch_tracker)
+
+    assert node.call.await_count == 2
+    mock_branch_tracker.set_exception.assert_called_once_with(error)
+
+
+@pytest.mark.asyncio
+async def test_execute_node_retries_only_retry_on(node, mock_branch_tracker):
+    node.retry = RetryPolicy(backoff=0, retry_on=KeyError)
+    node.call.side_effect = ValueError()
+
+    await execute_node(node, mock_branch_tracker)
+
+    assert node.call.await_count == 1
+    mock_branch_tracker.set_exception.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_execute_node_retry_provides_dependencies_anew(
+        node, mock_branch_tracker):
+    clients = []
+
+    async def fail_once(*, client):
+        clients.append(client)
+        if len(clients) == 1:
+            raise ConnectionError()
+
+    async def new_client():
+        return object()
+
+    never_cached = Dependency('client', (), new_client,
+                              CacheSupport.NEVER_CACHE)
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'client': never_cached}):
+        dependency_cache = DependencyCache()
+    node.call = fail_once
+    node.dependencies = ('client',)
+    node.retry = RetryPolicy(backoff=0)
+    with mock.patch('conflagrate.engine.get_context_dependency_cache',
+                    return_value=dependency_cache):
+        await execute_node(node, mock_branch_tracker)
+
+    assert len(clients) == 2
+    assert clients[0] is not clients[1]
+    mock_branch_tracker.set_exception.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_execute_node_retries_dependency_error(node,
+                                                     mock_branch_tracker):
+    provided = []
+
+    async def new_client():
+        provided.append(None)
+        if len(provided) == 2:
+            raise ConnectionError()
+        return len(provided)
+
+    clients = []
+
+    async def fail_once(*, client):
+        clients.append(client)
+        if len(clients) == 1:
+            raise ConnectionError()
+
+    never_cached = Dependency('client', (), new_client,
+                              CacheSupport.NEVER_CACHE)
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'client': never_cached}):
+        dependency_cache = DependencyCache()
+    node.call = fail_once
+    node.dependencies = ('client',)
+    node.retry = RetryPolicy(backoff=0)
+    with mock.patch('conflagrate.engine.get_context_dependency_cache',
+                    return_value=dependency_cache):
+        await execute_node(node, mock_branch_tracker)
+
+    # The second attempt failed to provide the client.
+    assert clients == [1, 3]
+    mock_branch_tracker.set_exception.assert_not_called()
+    mock_branch_tracker.remove_branch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_graph_retries_timeout():
+    attempts = []
+
+    async def slow_once() -> str:
+        attempts.append(None)
+        if len(attempts) == 1:
+            await asyncio.sleep(1)
+        return 'done'
+
+    nodetype = NodeType(slow_once, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), (), timeout=0.01,
+                        retry=RetryPolicy(backoff=0))
+    graph = Graph({'slow': Node('slow', 'slow', nodetype)})
+    instrumentation = Instrumentation()
+
+    assert await run_graph(graph, 'slow',
+                           instrumentation=instrumentation) == 'done'
+    assert len(attempts) == 2
+    assert instrumentation.stats.nodes['slow'].retries == 1
+
+
+def stream_graph(source, sink, buffer_size=None):
+    nodes = {
+        'source': Node('source', 'source', NodeType(
+            source, BranchingStrategy.parallel, BlockingBehavior.BLOCKING,
+            (), (), buffer_size=buffer_size)),
+        'sink': Node('sink', 'sink', NodeType(
+            sink, BranchingStrategy.parallel, BlockingBehavior.NON_BLOCKING,
+            (), ())),
+    }
+    nodes['source'].edges = [nodes['sink']]
+    return Graph(nodes)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_streaming_buffer():
+    produced = []
+    consumed = []
+    lag = [0]
+
+    async def source(count):
+        for i in range(count):
+            produced.append(i)
+            lag[0] = max(lag[0], len(produced) - len(consumed))
+            yield i
+
+    async def sink(item) -> int:
+        await asyncio.sleep(0.001)
+        consumed.append(item)
+        return item
+
+    await run_graph(stream_graph(source, sink, buffer_size=2), 'source',
+                    start_node_args=(10,))
+
+    assert sorted(consumed) == list(range(10))
+    assert lag[0] <= 3
+
+
+@pytest.mark.asyncio
+async def test_run_graph_streaming_blocking_generator():
+    closed = []
+
+    def source():
+        try:
+            yield threading.current_thread().name
+        finally:
+            closed.append(True)
+
+    async def sink(thread_name) -> str:
+        return thread_name
+
+    with ThreadPoolExecutor(thread_name_prefix='stream') as executor:
+        thread_name = await run_graph(stream_graph(source, sink), 'source',
+                                      executor=executor)
+
+    assert thread_name.startswith('stream')
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_run_graph_streaming_blocking_generator_timeout():
+    closed = threading.Event()
+
+    def source():
+        try:
+            time.sleep(0.2)
+            yield None
+        finally:
+            closed.set()
+
+    nodetype = NodeType(source, BranchingStrategy.parallel,
+                        BlockingBehavior.BLOCKING, (), (), timeout=0.01)
+    graph = Graph({'source': Node('source', 'source', nodetype)})
+
+    with pytest.raises(asyncio.TimeoutError):
+        await run_graph(graph, 'source')
+
+    # The generator is closed once it is done producing the item.
+    assert not closed.is_set()
+    assert await asyncio.get_running_loop().run_in_executor(
+        None, closed.wait, 1)
+
+
+@pytest.mark.asyncio
+async def test_run_graph_batched():
+    batches = []
+    outputs = []
+
+    async def leaf(items) -> list:
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    async def collect(value) -> None:
+        outputs.append(value)
+
+    start = NodeType(lambda: 1, BranchingStrategy.parallel,
+                     BlockingBehavior.NON_BLOCKING, (), ())
+    batched = NodeType(leaf, BranchingStrategy.parallel,
+                       BlockingBehavior.NON_BLOCKING, (), (), batch_size=3)
+    sink = NodeType(collect, BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), ())
+    nodes = {'start': Node('start', 'start', start),
+             'sink': Node('sink', 'sink', sink)}
+    for i in range(5):
+        nodes[f'leaf{i}'] = Node(f'leaf{i}', 'leaf', batched,
+                                 [nodes['sink']])
+    nodes['start'].edges = [nodes[f'leaf{i}'] for i in range(5)]
+
+    await run_graph(Graph(nodes), 'start')
+
+    assert [len(batch) for batch in batches] == [3, 2]
+    assert outputs == [2] * 5
+
+
+def serve_graph(function):
+    nodetype = NodeType(function, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+    return Graph({'start': Node('start', 'start', nodetype)})
+
+
+async def aiterate(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_serve_iterable():
+    probe, peak = concurrency_probe()
+
+    async def double(value) -> int:
+        await probe()
+        if value < 0:
+            raise ValueError(value)
+        return value * 2
+
+    results = [result async for result in serve(
+        serve_graph(double), 'start', aiterate([1, -1, 2, (3,), 4]),
+        concurrency=2)]
+
+    assert sorted(result.value for result in results
+                  if result.exception is None) == [2, 4, 6, 8]
+    failed, = [result for result in results if result.exception is not None]
+    assert failed.start_node_args == (-1,)
+    assert isinstance(failed.exception, ValueError)
+    assert peak[0] == 2
+
+
+@pytest.mark.asyncio
+async def test_serve_queue_shares_dependency_cache():
+    caches = set()
+
+    async def record_cache(value) -> int:
+        caches.add(get_context_dependency_cache())
+        return value
+
+    queue = asyncio.Queue()
+    for value in range(3):
+        queue.put_nowait(value)
+    results = serve(serve_graph(record_cache), 'start', queue, concurrency=3)
+    values = [(await results.__anext__()).value for _ in range(3)]
+    await results.aclose()
+
+    assert sorted(values) == [0, 1, 2]
+    assert len(caches) == 1
+    assert dependency_cache_ctx_var.get(None) not in caches
+
+
+@pytest.mark.asyncio
+async def test_serve_queue_join():
+    values = []
+
+    async def consume():
+        async for result in serve(serve_graph(lambda value: value), 'start',
+                                  queue, concurrency=2):
+            values.append(result.value)
+
+    queue = asyncio.Queue()
+    consumer = asyncio.get_running_loop().create_task(consume())
+    for value in range(5):
+        await queue.put(value)
+
+    # The producer waits for its inputs to be processed.
+    await asyncio.wait_for(queue.join(), 1)
+    consumer.cancel()
+    await asyncio.wait([consumer])
+
+    assert sorted(values) == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_serve_invalid_concurrency():
+    with pytest.raises(ValueError):
+        await serve(serve_graph(lambda: None), 'start', asyncio.Queue(),
+                    concurrency=0).__anext__()
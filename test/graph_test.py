@@ -16,27 +16,53 @@ def node():
     return Node('test', 'test', mock.Mock())
 
 
-@mock.patch('conflagrate.graph.ensure_awaitable')
-def test_NodeType_call(ensure_awaitable, node_type):
+@mock.patch('conflagrate.graph.make_dispatcher')
+def test_NodeType_call(make_dispatcher):
+    node_type = NodeType(mock.Mock(), BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ())
     node_type(1, "", b=2)
-    ensure_awaitable.assert_called_with(node_type.callable,
-                                        node_type.blocking_behavior, 1, "", b=2)
+    make_dispatcher.assert_called_once_with(node_type.callable,
+                                            node_type.blocking_behavior, None)
+    make_dispatcher.return_value.assert_called_with(1, "", b=2)
 
 
-def test_NodeType_get_dependencies_no_kwargs(node_type):
+@mock.patch('conflagrate.graph.make_dispatcher')
+def test_NodeType_call_with_executor(make_dispatcher):
+    node_type = NodeType(mock.Mock(), BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), (), executor='process')
+    node_type(1, b=2)
+    make_dispatcher.assert_called_once_with(node_type.callable,
+                                            node_type.blocking_behavior,
+                                            'process')
+    make_dispatcher.return_value.assert_called_with(1, b=2)
+
+
+def test_NodeType_get_dependencies_no_kwargs():
     def my_func(posarg1, posarg2, *args) -> None:
         pass
-    node_type.callable = my_func
+    node_type = NodeType(my_func, BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ())
 
-    assert node_type.get_dependencies() == []
+    assert node_type.get_dependencies() == ()
 
 
-def test_NodeType_get_dependencies_with_kwargs(node_type):
+def test_NodeType_get_dependencies_with_kwargs():
     def my_func(posarg1, posarg2, *args, kwarg1, kwarg2=None) -> None:
         pass
-    node_type.callable = my_func
+    node_type = NodeType(my_func, BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ())
+
+    assert node_type.get_dependencies() == ('kwarg1', 'kwarg2')
+
+
+@mock.patch('conflagrate.graph.signature')
+def test_NodeType_get_dependencies_cached(mock_signature, node_type):
+    mock_signature.reset_mock()
+
+    node_type.get_dependencies()
+    node_type.get_dependencies()
 
-    assert node_type.get_dependencies() == ['kwarg1', 'kwarg2']
+    mock_signature.assert_not_called()
 
 
 def test_Node_hash(node):
@@ -52,3 +78,21 @@ def test_Node_get_output_data(node):
     mock_arg = object()
     return_value = node.get_output_data(mock_arg)
     assert return_value == mock_arg
+
+
+def test_NodeType_streaming():
+    def items() -> None:
+        yield 1
+
+    async def async_items() -> None:
+        yield 1
+
+    node_type = NodeType(items, BranchingStrategy.parallel,
+                         BlockingBehavior.BLOCKING, (), ())
+    async_node_type = NodeType(async_items, BranchingStrategy.parallel,
+                               BlockingBehavior.NON_BLOCKING, (), (),
+                               buffer_size=2)
+
+    assert node_type.streaming and async_node_type.streaming
+    assert node_type.buffer_size == 16
+    assert async_node_type.buffer_size == 2
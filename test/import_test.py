@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+# Time importing conflagrate may take on top of its standard library
+# dependencies, with a generous margin for slow machines.
+IMPORT_TIME_BUDGET = 0.15
+
+PROBE = '''
+import json, sys, time
+import asyncio, concurrent.futures
+start = time.perf_counter()
+import conflagrate
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "modules": sorted(name for name in ("pydot", "pyparsing",
+                                        "multiprocessing")
+                      if name in sys.modules),
+}))
+'''
+
+
+def import_conflagrate():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', PROBE], check=True,
+                            capture_output=True, text=True, cwd=root).stdout
+    return json.loads(output)
+
+
+def test_import_is_lazy():
+    assert import_conflagrate()['modules'] == []
+
+
+def test_import_time():
+    seconds = min(import_conflagrate()['seconds'] for _ in range(3))
+    assert seconds < IMPORT_TIME_BUDGET
@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+import time
+from unittest import mock
+
+from conflagrate import BlockingBehavior, BranchingStrategy
+from conflagrate.engine import run_graph
+from conflagrate.graph import Graph, Node, NodeType
+from conflagrate.instrumentation import (LATENCY_BUCKETS, ExecutionStats,
+                                         Instrumentation, NodeEvent, NodeStats)
+
+
+def event(node='node', typename='type', latency=0.001, exception=None):
+    event = NodeEvent(node, typename)
+    event.start = event.admitted = event.resolved = 0.
+    event.end = latency
+    event.exception = exception
+    return event
+
+
+def chain_graph(*functions):
+    nodes = {}
+    for i, (function, blocking_behavior) in enumerate(functions):
+        nodes[f'node{i}'] = Node(f'node{i}', f'type{i}', NodeType(
+            function, BranchingStrategy.parallel, blocking_behavior, (), ()))
+    names = list(nodes)
+    for name, next_name in zip(names, names[1:]):
+        nodes[name].edges = [nodes[next_name]]
+    return Graph(nodes)
+
+
+def test_NodeEvent_durations():
+    e = event()
+    e.admitted, e.resolved, e.running, e.end = 1., 3., 6., 10.
+    assert (e.latency, e.queued, e.resolving, e.executor_wait,
+            e.executing) == (10., 1., 2., 3., 4.)
+
+    e.running = None
+    assert (e.executor_wait, e.executing) == (0., 7.)
+
+
+def test_NodeStats_record():
+    stats = NodeStats()
+    stats.record(event(latency=0.001))
+    stats.record(event(latency=0.003, exception=KeyError()))
+
+    assert stats.calls == 2
+    assert stats.latency == pytest.approx(0.004)
+    assert (stats.min_latency, stats.max_latency) == (0.001, 0.003)
+    assert stats.mean_latency == pytest.approx(0.002)
+    assert sum(stats.histogram) == 2
+    assert stats.exceptions == {'KeyError': 1}
+    assert 0.001 <= stats.percentile(0.5) < 0.003
+    assert stats.percentile(1.) >= 0.003
+
+
+def test_NodeStats_percentile_beyond_buckets():
+    stats = NodeStats()
+    stats.record(event(latency=LATENCY_BUCKETS[-1] * 2))
+    assert stats.histogram[-1] == 1
+    assert stats.percentile(0.5) == float('inf')
+
+
+def test_ExecutionStats():
+    stats = ExecutionStats()
+    stats(event('a', 'fast', latency=0.001))
+    stats(event('b', 'fast', latency=0.002))
+    stats(event('b', 'fast', latency=0.002))
+
+    assert stats.nodes['a'].calls == 1
+    assert stats.nodes['b'].calls == 2
+    assert stats.nodetypes['fast'].calls == 3
+    assert [name for name, _ in stats.slowest(1)] == ['b']
+    assert stats.as_dict()['nodetypes']['fast']['calls'] == 3
+
+
+@pytest.mark.asyncio
+async def test_Instrumentation_hooks():
+    hook = mock.Mock()
+    instrumentation = Instrumentation(hook)
+    e = NodeEvent('node', 'type')
+    instrumentation.finish(e)
+
+    hook.assert_called_once_with(e)
+    assert e.end >= e.start
+    assert instrumentation.stats.nodes['node'].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_Instrumentation_failing_hook():
+    loop = asyncio.get_running_loop()
+    handler = mock.Mock()
+    loop.set_exception_handler(handler)
+    hook = mock.Mock()
+    instrumentation = Instrumentation(mock.Mock(side_effect=RuntimeError),
+                                      hook, stats=False)
+    try:
+        instrumentation.finish(NodeEvent('node', 'type'))
+    finally:
+        loop.set_exception_handler(None)
+
+    hook.assert_called_once()
+    assert isinstance(handler.call_args[0][1]['exception'], RuntimeError)
+    assert instrumentation.stats is None
+
+
+@pytest.mark.asyncio
+async def test_run_graph_instrumented():
+    def blocking(*_) -> int:
+        time.sleep(0.01)
+        return 1
+
+    def failing(*_) -> None:
+        raise ValueError()
+
+    graph = chain_graph((lambda: None, BlockingBehavior.NON_BLOCKING),
+                        (blocking, BlockingBehavior.BLOCKING),
+                        (failing, BlockingBehavior.NON_BLOCKING))
+    events = []
+    instrumentation = Instrumentation(events.append)
+    with pytest.raises(ValueError):
+        await run_graph(graph, 'node0', instrumentation=instrumentation)
+
+    assert [e.node for e in events] == ['node0', 'node1', 'node2']
+    assert events[0].running is None
+    assert events[1].running is not None
+    assert events[1].executing >= 0.01
+    assert isinstance(events[2].exception, ValueError)
+    stats = instrumentation.stats
+    assert stats.nodetypes['type1'].calls == 1
+    assert stats.nodes['node2'].exceptions == {'ValueError': 1}
+
+
+@pytest.mark.asyncio
+async def test_run_graph_instrumented_subgraph():
+    subgraph = chain_graph((lambda: 1, BlockingBehavior.NON_BLOCKING))
+
+    async def parent() -> int:
+        return await run_graph(subgraph, 'node0')
+
+    graph = chain_graph((parent, BlockingBehavior.NON_BLOCKING))
+    graph.nodes['node0'].typename = 'parent'
+    instrumentation = Instrumentation()
+    assert await run_graph(graph, 'node0',
+                           instrumentation=instrumentation) == 1
+    assert instrumentation.stats.nodetypes['parent'].calls == 1
+    assert instrumentation.stats.nodetypes['type0'].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_run_graph_instrumented_streaming():
+    def source():
+        yield from range(3)
+
+    graph = chain_graph((source, BlockingBehavior.NON_BLOCKING),
+                        (lambda item: item, BlockingBehavior.NON_BLOCKING))
+    instrumentation = Instrumentation()
+    await run_graph(graph, 'node0', instrumentation=instrumentation)
+    assert instrumentation.stats.nodes['node0'].calls == 3
+    assert instrumentation.stats.nodes['node1'].calls == 3
@@ -0,0 +1,44 @@
+import pytest
+from unittest import mock
+
+from conflagrate import BlockingBehavior, BranchingStrategy
+from conflagrate.graph import NodeType
+from conflagrate.parse.native import Graph, Node
+
+
+@pytest.fixture(autouse=True)
+def nodetypes():
+    nodetype = NodeType(lambda: None, BranchingStrategy.parallel,
+                        BlockingBehavior.NON_BLOCKING, (), ())
+    with mock.patch('conflagrate.parse.native.get_nodetypes',
+                    return_value={'test': nodetype}) as get_nodetypes:
+        yield get_nodetypes
+
+
+def test_Graph_topology_shared(nodetypes):
+    class TestGraph(Graph):
+        start = Node(type='test')
+        finish = Node(type='test')
+
+        start > finish
+
+    first = TestGraph()
+    second = TestGraph()
+
+    nodetypes.assert_called_once()
+    assert first.nodes is second.nodes
+    assert first._plan is second._plan
+    assert first.nodes['start'].edges == [first.nodes['finish']]
+    assert first._plan.nodes['start'].successors == (
+        first._plan.nodes['finish'],)
+
+
+def test_Graph_topology_per_class():
+    class TestGraph(Graph):
+        start = Node(type='test')
+
+    class OtherGraph(TestGraph):
+        other = Node(type='test')
+
+    assert list(TestGraph().nodes) == ['start']
+    assert list(OtherGraph().nodes) == ['other']
@@ -0,0 +1,67 @@
+import os
+import pytest
+from unittest import mock
+
+from conflagrate.parse import cache
+from conflagrate.parse.cache import (get_cached_graph, invalidate_graphs,
+                                     load_graph, set_hot_reload)
+
+
+@pytest.fixture(autouse=True)
+def graphs():
+    with mock.patch.dict('conflagrate.parse.cache._graphs', clear=True):
+        yield
+    set_hot_reload(False)
+
+
+@pytest.fixture
+def graph_file(tmp_path):
+    path = tmp_path / 'graph.gv'
+    path.write_text('digraph { a [type=test]; }')
+    return str(path)
+
+
+@pytest.fixture
+def parse_dot():
+    with mock.patch('conflagrate.parse.cache.parse_dot',
+                    side_effect=lambda data: mock.Mock(data=data)) as parse:
+        yield parse
+
+
+def test_load_graph_cached(graph_file, parse_dot):
+    assert get_cached_graph(graph_file) is None
+
+    graph = load_graph(graph_file)
+
+    assert load_graph(graph_file) is graph
+    assert get_cached_graph(graph_file) is graph
+    parse_dot.assert_called_once_with('digraph { a [type=test]; }')
+
+
+def test_load_graph_invalidate(graph_file, parse_dot):
+    graph = load_graph(graph_file)
+
+    invalidate_graphs(graph_file)
+    assert get_cached_graph(graph_file) is None
+    assert load_graph(graph_file) is not graph
+
+    invalidate_graphs()
+    assert not cache._graphs
+
+
+def test_load_graph_hot_reload(graph_file, parse_dot):
+    set_hot_reload(True)
+    graph = load_graph(graph_file)
+    assert get_cached_graph(graph_file) is None
+
+    # Touched without changes.
+    os.utime(graph_file, ns=(0, 0))
+    assert load_graph(graph_file) is graph
+
+    with open(graph_file, 'w') as f:
+        f.write('digraph { b [type=test]; }')
+    reloaded = load_graph(graph_file)
+
+    assert reloaded is not graph
+    assert reloaded.data == 'digraph { b [type=test]; }'
+    assert parse_dot.call_count == 2
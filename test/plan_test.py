@@ -0,0 +1,116 @@
+import pytest
+from unittest import mock
+
+from conflagrate.dependencies import CacheSupport, Dependency
+from conflagrate.graph import Graph, MatcherNode, Node
+from conflagrate.plan import OutputUnpacking, compile_graph, get_execution_plan
+
+
+@pytest.fixture
+def nodetype():
+    nodetype = mock.Mock()
+    nodetype.get_dependencies = mock.Mock(return_value=['dep'])
+    nodetype.concurrency_limit = None
+    nodetype.streaming = False
+    nodetype.join = False
+    nodetype.timeout = None
+    nodetype.batcher = None
+    nodetype.retry = None
+    return nodetype
+
+
+@pytest.fixture(autouse=True)
+def registered_dependencies():
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'dep': Dependency('dep', (), mock.Mock(),
+                                            CacheSupport.CACHE_PERMANENTLY)}):
+        yield
+
+
+@pytest.fixture
+def graph(nodetype):
+    first = Node('first', 'test', nodetype)
+    matcher = MatcherNode('matcher', 'test', nodetype)
+    last = Node('last', 'test', nodetype)
+    first.edges = [matcher, last]
+    matcher.edges = {'loop': first, None: last}
+    return Graph({'first': first, 'matcher': matcher, 'last': last})
+
+
+def test_compile_graph_records(graph, nodetype):
+    plan = compile_graph(graph)
+
+    assert [record.name for record in plan.records] == [
+        'first', 'matcher', 'last']
+    assert [record.index for record in plan.records] == [0, 1, 2]
+    for record in plan.records:
+        assert plan.nodes[record.name] is record
+        assert record.call is nodetype.dispatch
+        assert record.dependencies == ('dep',)
+
+
+def test_compile_graph_parallel_successors(graph):
+    plan = compile_graph(graph)
+    first = plan.nodes['first']
+
+    assert first.unpacking is OutputUnpacking.PASSTHROUGH
+    assert first.successors == (plan.nodes['matcher'], plan.nodes['last'])
+    assert plan.nodes['last'].successors == ()
+
+
+def test_compile_graph_matcher_table(graph):
+    plan = compile_graph(graph)
+    matcher = plan.nodes['matcher']
+
+    assert matcher.unpacking is OutputUnpacking.MATCHER
+    assert matcher.match_table == {'loop': (plan.nodes['first'],),
+                                   None: (plan.nodes['last'],)}
+    assert matcher.match_default == (plan.nodes['last'],)
+
+
+def test_get_execution_plan_cached(graph):
+    plan = get_execution_plan(graph)
+    assert get_execution_plan(graph) is plan
+
+
+def test_compile_graph_unregistered_dependency(graph, nodetype):
+    nodetype.get_dependencies.return_value = ['dep', 'missing']
+
+    with pytest.raises(ValueError, match='missing'):
+        compile_graph(graph)
+
+
+def test_compile_graph_unregistered_subdependency(graph):
+    registered = Dependency('dep', ('missing',), mock.Mock(),
+                            CacheSupport.CACHE_PERMANENTLY)
+    with mock.patch.dict('conflagrate.dependencies._dependencies',
+                         {'dep': registered}):
+        with pytest.raises(ValueError, match='missing'):
+            compile_graph(graph)
+
+
+def test_compile_graph_join_slots(graph, nodetype):
+    join = mock.Mock(wraps=nodetype, concurrency_limit=None, streaming=False,
+                     join=True)
+    join.get_dependencies = mock.Mock(return_value=[])
+    graph.nodes['last'].nodetype = join
+
+    plan = compile_graph(graph)
+
+    # Both nodes preceding the join node, in order.
+    assert plan.nodes['last'].join_slots == {0: 0, 1: 1}
+    assert plan.nodes['first'].join_slots is None
+
+
+@pytest.mark.parametrize('streaming, batched, call', [
+    (False, False, 'dispatch'), (False, True, 'batcher'),
+    (True, False, 'stream')])
+def test_compile_graph_resolves_call(graph, nodetype, streaming, batched,
+                                     call):
+    nodetype.streaming = streaming
+    if batched:
+        nodetype.batcher = mock.Mock()
+
+    plan = compile_graph(graph)
+
+    assert plan.nodes['first'].call is getattr(nodetype, call)
@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import pytest
+
+from conflagrate import ProcessRunner, dependency, nodetype
+from conflagrate.parse.native import Graph, Node
+
+
+@dependency
+async def processes_test_worker_pid():
+    return os.getpid()
+
+
+@nodetype('processes_test.square')
+def square(value: int, *, processes_test_worker_pid) -> tuple:
+    if value < 0:
+        raise ValueError(value)
+    return value * value, processes_test_worker_pid
+
+
+class SquareGraph(Graph):
+    start = Node(type='processes_test.square')
+
+
+@pytest.fixture
+def fork():
+    return multiprocessing.get_context('fork')
+
+
+def test_ProcessRunner_map(fork):
+    with ProcessRunner(SquareGraph, 'start', processes=2,
+                       mp_context=fork) as runner:
+        results = list(runner.map([(i,) for i in range(6)]))
+
+    assert [value for value, _ in results] == [0, 1, 4, 9, 16, 25]
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def test_ProcessRunner_exceptions(fork):
+    with ProcessRunner(SquareGraph(), 'start', processes=1,
+                       mp_context=fork) as runner:
+        results = list(runner.map([(2,), (-1,), (3,)],
+                                  return_exceptions=True))
+        with pytest.raises(ValueError):
+            runner.submit(-2).result()
+
+    assert results[0][0] == 4 and results[2][0] == 9
+    assert isinstance(results[1], ValueError)
+    # The dependency cache of the worker is shared by its runs.
+    assert results[0][1] == results[2][1]
+
+
+def test_ProcessRunner_invalid():
+    with pytest.raises(ValueError):
+        ProcessRunner(SquareGraph, 'start', processes=0)
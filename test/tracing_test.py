@@ -0,0 +1,78 @@
+import json
+import pytest
+
+from conflagrate import BlockingBehavior, BranchingStrategy
+from conflagrate.engine import run_graph
+from conflagrate.graph import Graph, Node, NodeType
+from conflagrate.instrumentation import Instrumentation
+from conflagrate.tracing import ChromeTrace
+
+
+def fan_out_graph(leaf_function=lambda: None, leaves=3):
+    start = NodeType(lambda: None, BranchingStrategy.parallel,
+                     BlockingBehavior.NON_BLOCKING, (), ())
+    leaf = NodeType(leaf_function, BranchingStrategy.parallel,
+                    BlockingBehavior.NON_BLOCKING, (), ())
+    nodes = {'start': Node('start', 'start', start)}
+    for i in range(leaves):
+        nodes[f'leaf{i}'] = Node(f'leaf{i}', 'leaf', leaf)
+    nodes['start'].edges = [nodes[f'leaf{i}'] for i in range(leaves)]
+    return Graph(nodes)
+
+
+async def trace_run(graph):
+    trace = ChromeTrace()
+    await run_graph(graph, 'start', instrumentation=Instrumentation(trace))
+    return trace
+
+
+@pytest.mark.asyncio
+async def test_trace_branches():
+    trace = await trace_run(fan_out_graph())
+    events = {event.node: event for event in trace.events}
+
+    start = events['start']
+    assert start.parent is None
+    assert {event.run for event in trace.events} == {start.run}
+    # The first following node continues the branch, the others are forked.
+    assert events['leaf0'].branch == start.branch
+    assert len({events[f'leaf{i}'].branch for i in range(3)}) == 3
+    assert all(events[f'leaf{i}'].parent == start.span for i in range(3))
+
+
+@pytest.mark.asyncio
+async def test_trace_subgraph():
+    subgraph = fan_out_graph(leaves=1)
+
+    async def run_subgraph():
+        await run_graph(subgraph, 'start')
+
+    trace = await trace_run(fan_out_graph(run_subgraph, leaves=1))
+    parent, child = [event for event in trace.events if event.node == 'start']
+    leaf, = [event for event in trace.events
+             if event.typename == 'leaf' and event.run == parent.run]
+
+    assert child.run != parent.run
+    assert child.parent == leaf.span
+
+
+@pytest.mark.asyncio
+async def test_ChromeTrace_to_dict(tmp_path):
+    trace = await trace_run(fan_out_graph())
+    path = tmp_path / 'trace.json'
+    trace.save(str(path))
+    trace_events = json.loads(path.read_text())['traceEvents']
+
+    spans = [e for e in trace_events if e['ph'] == 'X' and e['cat'] != 'phase']
+    assert sorted(e['name'] for e in spans) == ['leaf0', 'leaf1', 'leaf2',
+                                                'start']
+    assert all(e['dur'] >= 0 for e in spans)
+    # Only the two forked branches are linked to the start node.
+    flow_starts = [e for e in trace_events if e['ph'] == 's']
+    flow_ends = [e for e in trace_events if e['ph'] == 'f']
+    assert len(flow_starts) == len(flow_ends) == 2
+    assert {e['name'] for e in trace_events if e['ph'] == 'M'} == {
+        'process_name', 'thread_name'}
+
+    trace.clear()
+    assert trace.to_dict()['traceEvents'] == []